@@ -0,0 +1,226 @@
+"""Backtesting for Betty's weekly prediction strategies.
+
+A backtest replays history week by week: at each week's last close a
+strategy scores every asset from the trailing LOOKBACK_DAYS closes, the top_n
+by signal strength become that week's predictions, and they are scored
+against the following week's last close with Betty's accuracy formula
+(quant.score_accuracy).
+
+Each run is vectorized over all assets and weeks at once (one sliding-window
+view of the close matrix), and runs for different strategies and parameter
+grids are spread over a process pool whose workers receive the price matrix
+once, at start-up.
+"""
+import itertools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from quant import score_accuracy, score_assets
+
+LOOKBACK_DAYS = 60
+
+DEFAULT_GRIDS: Dict[str, Dict[str, list]] = {
+    "quant": {
+        "top_n": [3],
+        "momentum_window": [10, 20, 40],
+        "reversion_window": [5, 10],
+        "momentum_weight": [0.4, 0.6, 0.8],
+    },
+    "momentum": {"top_n": [3], "momentum_window": [10, 20, 40]},
+    "reversion": {"top_n": [3], "reversion_window": [5, 10, 20]},
+    "random": {"top_n": [3], "seed": [0, 1, 2]},
+}
+
+
+def _quant_strategy(windows: np.ndarray, params: dict) -> Dict[str, np.ndarray]:
+    return score_assets(
+        windows,
+        momentum_window=params.get("momentum_window", 20),
+        reversion_window=params.get("reversion_window", 5),
+        momentum_weight=params.get("momentum_weight", 0.6),
+        reversion_weight=1 - params.get("momentum_weight", 0.6),
+    )
+
+
+def _momentum_strategy(windows: np.ndarray, params: dict) -> Dict[str, np.ndarray]:
+    return score_assets(windows, momentum_window=params.get("momentum_window", 20),
+                        momentum_weight=1.0, reversion_weight=0.0)
+
+
+def _reversion_strategy(windows: np.ndarray, params: dict) -> Dict[str, np.ndarray]:
+    return score_assets(windows, reversion_window=params.get("reversion_window", 5),
+                        momentum_weight=0.0, reversion_weight=1.0)
+
+
+def _random_strategy(windows: np.ndarray, params: dict) -> Dict[str, np.ndarray]:
+    """Baseline: random directions, sized like the quant model's expected moves"""
+    signals = score_assets(windows)
+    rng = np.random.default_rng(params.get("seed", 0))
+    signals["score"] = rng.uniform(-1, 1, len(windows))
+    signals["expected_change"] = np.sign(signals["score"]) * np.abs(signals["expected_change"])
+    return signals
+
+
+STRATEGIES: Dict[str, Callable[[np.ndarray, dict], Dict[str, np.ndarray]]] = {
+    "quant": _quant_strategy,
+    "momentum": _momentum_strategy,
+    "reversion": _reversion_strategy,
+    "random": _random_strategy,
+}
+
+
+def validate_grids(grids: Dict[str, Dict[str, list]]):
+    """Raise ValueError for grids that would schedule no runs or name unknown strategies"""
+    if not grids:
+        raise ValueError("No strategies to backtest")
+    unknown = set(grids) - set(STRATEGIES)
+    if unknown:
+        raise ValueError(f"Unknown strategies: {', '.join(sorted(unknown))}")
+    for strategy, grid in grids.items():
+        if not grid:
+            raise ValueError(f"Grid for {strategy} is empty")
+        empty = sorted(name for name, values in grid.items() if not isinstance(values, list) or not values)
+        if empty:
+            raise ValueError(f"Grid for {strategy} needs a non-empty list of values for: {', '.join(empty)}")
+
+
+def expand_grid(grid: Dict[str, list]) -> List[dict]:
+    """Every combination of the grid's parameter values"""
+    names = sorted(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def week_boundaries(dates: np.ndarray) -> np.ndarray:
+    """Index of the last trading day of each calendar week (Monday-Sunday)"""
+    days = dates.astype("datetime64[D]").astype(np.int64)
+    weeks = (days + 3) // 7  # 1970-01-01 was a Thursday; shift so weeks start on Monday
+    return np.flatnonzero(np.diff(weeks)) if len(weeks) > 1 else np.array([], dtype=int)
+
+
+def simulate(closes: np.ndarray, dates: np.ndarray, strategy: str, params: dict,
+             lookback_days: int = LOOKBACK_DAYS) -> dict:
+    """Replay weekly picks for one strategy and parameter set; returns summary metrics"""
+    boundaries = week_boundaries(dates)
+    entries = boundaries[:-1]
+    exits = boundaries[1:]
+    keep = entries >= lookback_days - 1
+    entries, exits = entries[keep], exits[keep]
+    n_assets = closes.shape[0]
+    if not len(entries):
+        return {"strategy": strategy, "params": params, "weeks": 0, "predictions": 0}
+
+    # (n_assets, n_days - lookback + 1, lookback) -> rows for every (asset, decision week)
+    windows = sliding_window_view(closes, lookback_days, axis=1)[:, entries - lookback_days + 1]
+    signals = STRATEGIES[strategy](windows.reshape(-1, lookback_days), params)
+    score = signals["score"].reshape(n_assets, -1)
+    expected_change = signals["expected_change"].reshape(n_assets, -1)
+
+    # Top n assets per week by signal strength
+    top_n = min(params.get("top_n", 3), n_assets)
+    picks = np.argsort(-np.abs(score), axis=0, kind="stable")[:top_n]
+    week_index = np.broadcast_to(np.arange(len(entries)), picks.shape)
+    entry_prices = closes[picks, entries[week_index]]
+    exit_prices = closes[picks, exits[week_index]]
+    picked_score = score[picks, week_index]
+    predicted_change = np.abs(expected_change[picks, week_index]) * 100
+
+    results = score_accuracy(entry_prices, exit_prices, predicted_change, picked_score >= 0)
+    direction = np.where(picked_score >= 0, 1.0, -1.0)
+    weekly_returns = (direction * results["actual_change_percent"]).mean(axis=0)
+    weekly_accuracy = results["accuracy_score"].mean(axis=0)
+    return {
+        "strategy": strategy,
+        "params": params,
+        "weeks": int(len(entries)),
+        "predictions": int(picks.size),
+        "mean_accuracy": round(float(results["accuracy_score"].mean()), 4),
+        "direction_hit_rate": round(float(results["was_direction_correct"].mean()), 4),
+        "mean_price_difference_percent": round(float(results["price_difference_percent"].mean()), 4),
+        "best_week_accuracy": round(float(weekly_accuracy.max()), 4),
+        "worst_week_accuracy": round(float(weekly_accuracy.min()), 4),
+        "mean_weekly_return_percent": round(float(weekly_returns.mean()), 4),
+        "weekly_return_sharpe": round(float(weekly_returns.mean() / weekly_returns.std()), 4)
+        if weekly_returns.std() > 0 else 0.0,
+    }
+
+
+# Price matrix for pool workers, set once per process by the initializer
+_worker_data = {}
+
+
+def _init_worker(closes: np.ndarray, dates: np.ndarray, lookback_days: int):
+    _worker_data.update(closes=closes, dates=dates, lookback_days=lookback_days)
+
+
+def _run_job(job):
+    strategy, params = job
+    return simulate(_worker_data["closes"], _worker_data["dates"], strategy, params, _worker_data["lookback_days"])
+
+
+def run_backtests(closes: np.ndarray, dates: np.ndarray, grids: Optional[Dict[str, Dict[str, list]]] = None,
+                  max_workers: Optional[int] = None, lookback_days: int = LOOKBACK_DAYS) -> List[dict]:
+    """Simulate every strategy/parameter combination in parallel; best mean accuracy first.
+
+    Raises ValueError, before any work is scheduled, for invalid grids or a
+    lookback that leaves no week to score.
+    """
+    grids = DEFAULT_GRIDS if grids is None else grids
+    validate_grids(grids)
+    if not 2 <= lookback_days < closes.shape[1]:
+        raise ValueError(f"lookback_days must be between 2 and {closes.shape[1] - 1} for {closes.shape[1]} days of prices")
+    jobs = [(strategy, params) for strategy, grid in grids.items() for params in expand_grid(grid)]
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(jobs))
+    if max_workers <= 1:
+        results = [simulate(closes, dates, strategy, params, lookback_days) for strategy, params in jobs]
+    else:
+        # spawn rather than fork: the server process has a running loop and threads
+        with ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker, initargs=(closes, dates, lookback_days)) as pool:
+            results = list(pool.map(_run_job, jobs))
+
+    return sorted(results, key=lambda result: result.get("mean_accuracy", 0), reverse=True)
+
+
+def align_price_matrix(columns: Dict[str, Sequence[float]], dates: Sequence, min_coverage: float = 0.9):
+    """Forward-fill each series and keep the symbols with prices on at least min_coverage of the weekdays.
+
+    The date index is the union of every symbol's trading days, so it includes
+    weekends from crypto; FX and metals only trade on weekdays, so coverage is
+    measured over weekdays between the symbol's first and last price. The series
+    must also span min_coverage of the whole index, so one recently listed asset
+    can't trim the backtest to its own history.
+
+    Returns (symbols, closes, dates) trimmed to the first date where every kept symbol has a price.
+    """
+    dates = np.asarray(dates, dtype="datetime64[D]")
+    weekdays = (dates.astype(np.int64) + 3) % 7 < 5  # 1970-01-01 was a Thursday
+    symbols, rows = [], []
+    for symbol, values in columns.items():
+        values = np.asarray(values, dtype=float)
+        valid = np.isfinite(values) & (values > 0)
+        if not valid.any():
+            continue
+        first, last = int(np.argmax(valid)), len(valid) - int(np.argmax(valid[::-1]))
+        span_weekdays = weekdays[first:last]
+        if (last - first) < min_coverage * len(valid) or not span_weekdays.any() or \
+                valid[first:last][span_weekdays].mean() < min_coverage:
+            continue
+        # forward-fill gaps (weekends/holidays for non-crypto assets)
+        index = np.where(valid, np.arange(len(values)), 0)
+        np.maximum.accumulate(index, out=index)
+        filled = values[index]
+        filled[:np.argmax(valid)] = np.nan
+        symbols.append(symbol)
+        rows.append(filled)
+    if not rows:
+        return [], np.empty((0, 0)), dates[:0]
+
+    closes = np.vstack(rows)
+    start = int(np.argmax(np.isfinite(closes).all(axis=0)))
+    return symbols, closes[:, start:], dates[start:]
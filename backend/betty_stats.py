@@ -0,0 +1,203 @@
+"""Materialized accuracy statistics for Betty's predictions.
+
+One document in betty_stats holds prediction, evaluated and correct counts
+overall, per week and per asset type, so the public current-week endpoint
+reads a single document instead of counting betty_predictions.
+
+The counters are kept in step with betty_predictions by applying $inc deltas
+in the same transaction as the writes they describe (insert_predictions,
+delete_predictions, record_evaluations). Transactions need a replica set or
+mongos; on a standalone server the writes run one after another. Deltas are
+always computed from the documents each write atomically replaced or removed
+(find_one_and_update / find_one_and_delete), never from an earlier read, so
+concurrent evaluations of the same prediction can't count it twice even
+without a transaction. rebuild_stats() recomputes the document from
+betty_predictions.
+"""
+import logging
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STATS_ID = "betty_accuracy"
+
+# Fields the stats deltas are computed from
+_COUNTED_FIELDS = {"_id": 0, "id": 1, "week_start": 1, "asset_type": 1, "was_correct": 1}
+
+_transactions_supported: Optional[bool] = None
+
+
+def week_key(week_start) -> str:
+    """YYYY-MM-DD of a week_start stored as a datetime or an ISO string"""
+    if isinstance(week_start, str):
+        week_start = datetime.fromisoformat(week_start)
+    return week_start.strftime("%Y-%m-%d")
+
+
+def _counter_paths(week_start, asset_type, field: str) -> List[str]:
+    asset_type = getattr(asset_type, "value", asset_type)  # AssetType members from model dicts
+    return [field, f"weeks.{week_key(week_start)}.{field}", f"asset_types.{asset_type}.{field}"]
+
+
+def insert_increments(predictions: Iterable[dict]) -> Dict[str, int]:
+    """$inc for newly inserted predictions (and any that arrive already evaluated)"""
+    inc = defaultdict(int)
+    for pred in predictions:
+        for path in _counter_paths(pred["week_start"], pred["asset_type"], "predictions"):
+            inc[path] += 1
+        if pred.get("was_correct") is not None:
+            for path in _counter_paths(pred["week_start"], pred["asset_type"], "evaluated"):
+                inc[path] += 1
+            if pred["was_correct"]:
+                for path in _counter_paths(pred["week_start"], pred["asset_type"], "correct"):
+                    inc[path] += 1
+    return dict(inc)
+
+
+def evaluation_increments(previous: Iterable[dict], was_correct: Dict[str, bool]) -> Dict[str, int]:
+    """$inc for new results; previous holds each prediction's stored id, week_start, asset_type and was_correct"""
+    inc = defaultdict(int)
+    for pred in previous:
+        old, new = pred.get("was_correct"), was_correct[pred["id"]]
+        if old is None:
+            for path in _counter_paths(pred["week_start"], pred["asset_type"], "evaluated"):
+                inc[path] += 1
+        if bool(old) != new:
+            for path in _counter_paths(pred["week_start"], pred["asset_type"], "correct"):
+                inc[path] += 1 if new else -1
+    return {path: delta for path, delta in inc.items() if delta}
+
+
+async def apply_increments(db, inc: Dict[str, int], session=None):
+    if inc:
+        await db.betty_stats.update_one(
+            {"_id": STATS_ID},
+            {"$inc": inc, "$set": {"updated_at": datetime.now(timezone.utc)}},
+            upsert=True, session=session
+        )
+
+
+async def transactions_supported(client) -> bool:
+    """Whether the deployment is a replica set or sharded cluster (checked once per process)"""
+    global _transactions_supported
+    if _transactions_supported is None:
+        try:
+            hello = await client.admin.command("hello")
+            _transactions_supported = "setName" in hello or hello.get("msg") == "isdbgrid"
+        except Exception as e:
+            logger.warning(f"Could not determine MongoDB topology ({e}), writing stats without transactions")
+            _transactions_supported = False
+    return _transactions_supported
+
+
+async def run_in_transaction(client, operation: Callable[..., Awaitable]):
+    """Run operation(session) in a transaction (retried on transient errors), or operation(None) on a standalone server"""
+    if not await transactions_supported(client):
+        return await operation(None)
+    async with await client.start_session() as session:
+        return await session.with_transaction(operation)
+
+
+async def insert_predictions(client, db, predictions: List[dict]):
+    """Insert prediction documents and count them in the stats document"""
+    async def write(session):
+        await db.betty_predictions.insert_many(predictions, session=session)
+        await apply_increments(db, insert_increments(predictions), session)
+
+    await run_in_transaction(client, write)
+
+
+async def _for_each(session, operation: Callable[[str], Awaitable], prediction_ids: Iterable[str]) -> list:
+    """Run operation per prediction id: concurrently, or one at a time inside a transaction's session"""
+    if session is None:
+        return list(await asyncio.gather(*(operation(prediction_id) for prediction_id in prediction_ids)))
+    return [await operation(prediction_id) for prediction_id in prediction_ids]
+
+
+async def delete_predictions(client, db, prediction_ids: List[str]):
+    """Delete predictions by id and take them back out of the stats document"""
+    async def write(session):
+        async def delete(prediction_id):
+            return await db.betty_predictions.find_one_and_delete(
+                {"id": prediction_id}, projection=_COUNTED_FIELDS, session=session
+            )
+
+        removed = [doc for doc in await _for_each(session, delete, prediction_ids) if doc]
+        await apply_increments(db, {path: -count for path, count in insert_increments(removed).items()}, session)
+
+    await run_in_transaction(client, write)
+
+
+async def record_evaluations(client, db, results: Dict[str, dict], accuracy_writes: list):
+    """Store evaluation results (prediction id -> fields to set, was_correct included) and the stats deltas.
+
+    Each prediction is updated with find_one_and_update, which hands back the
+    was_correct it replaced, so the delta reflects exactly the transition this
+    call made even if another evaluation of the same week runs concurrently.
+    That is one round trip per prediction (served by the unique id index), the
+    accepted cost of exact deltas: a bulk update only reports how many
+    documents matched, not which week and asset type each one counted towards.
+    A week holds a few dozen predictions, and outside a transaction the round
+    trips run concurrently.
+    """
+    async def write(session):
+        await db.betty_accuracy.bulk_write(accuracy_writes, ordered=False, session=session)
+
+        async def update(prediction_id):
+            return await db.betty_predictions.find_one_and_update(
+                {"id": prediction_id}, {"$set": results[prediction_id]}, projection=_COUNTED_FIELDS, session=session
+            )
+
+        previous = [doc for doc in await _for_each(session, update, results) if doc]
+        was_correct = {prediction_id: fields["was_correct"] for prediction_id, fields in results.items()}
+        await apply_increments(db, evaluation_increments(previous, was_correct), session)
+
+    await run_in_transaction(client, write)
+
+
+async def get_stats(db, week_start=None) -> dict:
+    """Overall counters, plus the given week's counters under "week" (one indexed read)"""
+    projection = {"_id": 0, "predictions": 1, "evaluated": 1, "correct": 1}
+    if week_start is not None:
+        projection[f"weeks.{week_key(week_start)}"] = 1
+    stats = await db.betty_stats.find_one({"_id": STATS_ID}, projection) or {}
+    week = stats.pop("weeks", {}).get(week_key(week_start), {}) if week_start is not None else {}
+    return {
+        "predictions": stats.get("predictions", 0),
+        "evaluated": stats.get("evaluated", 0),
+        "correct": stats.get("correct", 0),
+        "week": {field: week.get(field, 0) for field in ("predictions", "evaluated", "correct")},
+    }
+
+
+async def get_weekly_stats(db) -> dict:
+    """Overall counters plus every week's counters keyed by YYYY-MM-DD"""
+    stats = await db.betty_stats.find_one({"_id": STATS_ID}, {"_id": 0, "asset_types": 0}) or {}
+    return {
+        "evaluated": stats.get("evaluated", 0),
+        "correct": stats.get("correct", 0),
+        "weeks": {
+            key: {field: week.get(field, 0) for field in ("predictions", "evaluated", "correct")}
+            for key, week in stats.get("weeks", {}).items()
+        },
+    }
+
+
+async def rebuild_stats(db):
+    """Recompute the stats document from betty_predictions"""
+    inc = insert_increments(await db.betty_predictions.find(
+        {}, {"_id": 0, "week_start": 1, "asset_type": 1, "was_correct": 1}
+    ).to_list(None))
+    doc = {"predictions": 0, "evaluated": 0, "correct": 0, "weeks": {}, "asset_types": {},
+           "updated_at": datetime.now(timezone.utc)}
+    for path, count in inc.items():
+        *parents, field = path.split(".")
+        node = doc
+        for part in parents:
+            node = node.setdefault(part, {})
+        node[field] = count
+    await db.betty_stats.replace_one({"_id": STATS_ID}, doc, upsert=True)
+    logger.info(f"Rebuilt Betty's stats from {doc['predictions']} predictions")
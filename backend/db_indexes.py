@@ -0,0 +1,169 @@
+"""Declarative MongoDB index specification.
+
+INDEX_SPECS lists, per collection, the indexes the API's query shapes rely on.
+ensure_indexes() is run at startup: it creates any missing index, leaves
+matching ones alone (so it is safe to run on every boot and from every
+worker) and logs indexes that differ from the spec or aren't in it.
+
+A spec may list obsolete index names under "replaces"; those are dropped
+only once the new index has been built, so a failed build (e.g. a unique
+index over duplicate data) leaves the old index serving queries. MongoDB
+refuses two indexes on the same keys, so a replacement must differ in its
+key pattern (direction counts) from the index it replaces.
+
+TTL indexes only expire documents whose indexed field is a BSON date, so
+migrate_expiry_dates() (migration 1) converts legacy string-typed expires_at
+values first.
+"""
+import logging
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Only enforce uniqueness where the field is present (OAuth users have no username)
+_IF_STRING = {"$type": "string"}
+
+INDEX_SPECS: Dict[str, List[dict]] = {
+    "user_sessions": [
+        # get_current_user: {session_token, expires_at: {$gt: now}}
+        {"name": "session_token_unique", "keys": [("session_token", ASCENDING)], "unique": True},
+        # Mongo deletes sessions once expires_at has passed
+        {"name": "expires_at_ttl", "keys": [("expires_at", ASCENDING)], "expireAfterSeconds": 0},
+    ],
+    "users": [
+        # register_user: {$or: [{username}, {email}]}; login_user: {username, ...}
+        {"name": "username_unique", "keys": [("username", ASCENDING)], "unique": True,
+         "partialFilterExpression": {"username": _IF_STRING}},
+        {"name": "email_unique", "keys": [("email", ASCENDING)], "unique": True,
+         "partialFilterExpression": {"email": _IF_STRING}},
+    ],
+    "email_verifications": [
+        # verify_email: {verification_token}
+        {"name": "verification_token_unique", "keys": [("verification_token", ASCENDING)], "unique": True},
+        {"name": "expires_at_ttl", "keys": [("expires_at", ASCENDING)], "expireAfterSeconds": 0},
+    ],
+    "revoked_sessions": [
+        # RevocationFilter.sync: {revoked_at: {$gte: last_sync}}
+        {"name": "revoked_at", "keys": [("revoked_at", ASCENDING)]},
+        # A revocation is only needed until the token would have expired anyway
+        {"name": "expires_at_ttl", "keys": [("expires_at", ASCENDING)], "expireAfterSeconds": 0},
+    ],
+    "rate_limits": [
+        # MongoRateLimitBackend window counters; expires_at is two windows ahead
+        {"name": "expires_at_ttl", "keys": [("expires_at", ASCENDING)], "expireAfterSeconds": 0},
+    ],
+    "prediction_cache": [
+        # get_cached_prediction looks entries up by _id (the bucketed cache key);
+        # invalidate_prediction_cache: {symbol}
+        {"name": "symbol", "keys": [("symbol", ASCENDING)], "replaces": ["symbol_asset_type_week_created_at"]},
+        {"name": "expires_at_ttl", "keys": [("expires_at", ASCENDING)], "expireAfterSeconds": 0},
+    ],
+    "betty_insights": [
+        # get_betty_premium_insights: latest {status: "ready"} by generated_at
+        {"name": "status_generated_at", "keys": [("status", ASCENDING), ("generated_at", DESCENDING)]},
+        {"name": "expires_at_ttl", "keys": [("expires_at", ASCENDING)], "expireAfterSeconds": 0},
+    ],
+    "betty_predictions": [
+        # betty_stats finds, updates and deletes single predictions by {id}; unique so a
+        # duplicated id can't be counted twice in the stats document
+        {"name": "id_unique", "keys": [("id", ASCENDING)], "unique": True},
+        # betty_history_pipeline: $match {was_correct: {$ne: None}}, $sort {week_start: 1}
+        {"name": "was_correct_week_start", "keys": [("was_correct", ASCENDING), ("week_start", DESCENDING)]},
+        # betty_history_pipeline's $sort when most predictions are evaluated
+        {"name": "week_start", "keys": [("week_start", ASCENDING)]},
+    ],
+    "betty_accuracy": [
+        # save_evaluation upserts one score per prediction so evaluation can be re-run; unique so
+        # concurrent upserts can't store two. Descending only so it differs from (and can be built
+        # next to) the ascending index it replaces; migration 6 removes duplicates first.
+        {"name": "prediction_id_unique", "keys": [("prediction_id", DESCENDING)], "unique": True,
+         "replaces": ["prediction_id"]},
+    ],
+    "betty_backtests": [
+        # get_backtest: {backtest_id} sorted by mean_accuracy desc
+        {"name": "backtest_id_mean_accuracy", "keys": [("backtest_id", ASCENDING), ("mean_accuracy", DESCENDING)]},
+    ],
+    "betty_reports": [
+        # get_betty_predictions / evaluate: {week_start}; previous reports sorted by week_start desc
+        # (walked backwards). Unique so the upserted claim document makes report creation atomic
+        # per week; migration 5 removes duplicate weeks first.
+        {"name": "week_start_unique", "keys": [("week_start", ASCENDING)], "unique": True,
+         "replaces": ["week_start"]},
+    ],
+}
+
+
+# Collections whose expires_at is covered by a TTL index
+TTL_COLLECTIONS = ["user_sessions", "email_verifications"]
+
+
+async def migrate_expiry_dates(db) -> Dict[str, int]:
+    """Convert string expires_at values to dates so the TTL indexes apply to them"""
+    converted = {}
+    for collection_name in TTL_COLLECTIONS:
+        result = await db[collection_name].update_many(
+            {"expires_at": {"$type": "string"}},
+            [{"$set": {"expires_at": {"$toDate": "$expires_at"}}}]
+        )
+        converted[collection_name] = result.modified_count
+        if result.modified_count:
+            logger.info(f"Converted {result.modified_count} string expires_at values in {collection_name}")
+    return converted
+
+
+def _index_options(spec: dict) -> dict:
+    return {k: v for k, v in spec.items() if k not in ("name", "keys", "replaces")}
+
+
+def _matches(spec: dict, existing: dict) -> bool:
+    if [tuple(k) for k in existing.get("key", [])] != [tuple(k) for k in spec["keys"]]:
+        return False
+    return all(existing.get(option) == value for option, value in _index_options(spec).items())
+
+
+async def ensure_indexes(db, specs: Dict[str, List[dict]] = None) -> dict:
+    """Create missing indexes and report drift; returns {collection: {created, mismatched, extra}}"""
+    specs = specs or INDEX_SPECS
+    report = {}
+
+    for collection_name, collection_specs in specs.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+        created, mismatched = [], []
+
+        for spec in collection_specs:
+            current = existing.get(spec["name"])
+            if current is not None:
+                if not _matches(spec, current):
+                    mismatched.append(spec["name"])
+                    logger.warning(f"Index {collection_name}.{spec['name']} differs from spec: {current}")
+                continue
+
+            try:
+                await collection.create_indexes([IndexModel(spec["keys"], name=spec["name"], **_index_options(spec))])
+                created.append(spec["name"])
+                logger.info(f"Created index {collection_name}.{spec['name']}")
+            except OperationFailure as e:
+                logger.error(f"Failed to create index {collection_name}.{spec['name']}: {e}")
+                continue
+
+            for obsolete in spec.get("replaces", []):
+                if obsolete in existing:
+                    try:
+                        await collection.drop_index(obsolete)
+                        logger.info(f"Dropped index {collection_name}.{obsolete} (replaced by {spec['name']})")
+                    except OperationFailure as e:
+                        logger.error(f"Failed to drop index {collection_name}.{obsolete}: {e}")
+
+        expected = {spec["name"] for spec in collection_specs} | {"_id_"}
+        existing = await collection.index_information()
+        extra = sorted(name for name in existing if name not in expected)
+        for name in extra:
+            logger.warning(f"Index {collection_name}.{name} is not in the index spec")
+
+        report[collection_name] = {"created": created, "mismatched": mismatched, "extra": extra}
+
+    return report
@@ -0,0 +1,312 @@
+"""Single entry point for Betty's LLM calls.
+
+Every handler that talks to GPT-4o goes through LLMGateway, which adds what
+the individual call sites used to lack:
+
+- one configured backend per process instead of per-handler client setup
+- a global concurrency cap plus per-route caps (a burst of /predict calls
+  can't starve weekly prediction generation)
+- a per-call deadline covering queueing, every attempt and backoff
+- retries with full-jitter exponential backoff
+- latency, token and outcome metrics, and an llm.chat span per call
+
+Backends implement complete() and stream(). EmergentLLMBackend is the real
+one; StubLLMBackend returns deterministic text (optionally with simulated
+latency) so tests and benchmarks run without network access or an API key.
+
+Configuration (environment):
+    LLM_BACKEND             emergent | stub (default: emergent)
+    LLM_MODEL               model name (default: gpt-4o)
+    LLM_API_BASE            OpenAI-compatible proxy URL for streamed calls. The
+                            universal EMERGENT_LLM_KEY is not a provider key, so
+                            without it streamed endpoints send each answer as a
+                            single chunk from complete() (logged at startup)
+    LLM_MAX_CONCURRENCY     calls in flight across all routes (default: 8)
+    LLM_ROUTE_CONCURRENCY   per-route caps, e.g. "predict=4,premium_insights=1"
+    LLM_TIMEOUT_SECONDS     per-call deadline (default: 60)
+    LLM_MAX_RETRIES         retries after the first attempt (default: 2)
+    LLM_STUB_LATENCY_MS     simulated latency of the stub backend (default: 0)
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import random
+import time
+from typing import AsyncIterator, Callable, Dict, Optional
+
+from metrics import metrics
+from prompts import count_tokens
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROUTE_CONCURRENCY = 4
+
+
+class LLMError(Exception):
+    """Raised when an LLM call fails after all retries"""
+
+
+class LLMNotConfigured(LLMError):
+    """Raised when no API key is configured for the real backend"""
+
+
+class LLMTimeout(LLMError):
+    """Raised when a call misses its deadline"""
+
+
+class EmergentLLMBackend:
+    """GPT-4o through emergentintegrations; streaming goes through litellm"""
+
+    def __init__(self, api_key: Optional[str], model: str = "gpt-4o", api_base: Optional[str] = None):
+        self.api_key = api_key
+        self.model = model
+        self.api_base = api_base
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.api_key)
+
+    @property
+    def streaming(self) -> bool:
+        """Whether stream() forwards tokens as they arrive (needs LLM_API_BASE)"""
+        return bool(self.api_key and self.api_base)
+
+    def _require_key(self):
+        if not self.api_key:
+            raise LLMNotConfigured("LLM key not configured")
+
+    async def complete(self, route: str, system_message: str, prompt: str) -> str:
+        self._require_key()
+        from emergentintegrations.llm.chat import LlmChat, UserMessage
+
+        # LlmChat holds one conversation, so each single-turn call gets its own session
+        chat = LlmChat(
+            api_key=self.api_key,
+            session_id=f"{route}_{time.time()}",
+            system_message=system_message
+        ).with_model("openai", self.model)
+        return await chat.send_message(UserMessage(text=prompt))
+
+    async def stream(self, route: str, system_message: str, prompt: str) -> AsyncIterator[str]:
+        self._require_key()
+        if not self.api_base:
+            # No proxy to stream through (see gateway_from_env): one chunk with the whole answer
+            yield await self.complete(route, system_message, prompt)
+            return
+        try:
+            import litellm
+            response = await litellm.acompletion(
+                model=self.model,
+                messages=[{"role": "system", "content": system_message}, {"role": "user", "content": prompt}],
+                api_key=self.api_key,
+                api_base=self.api_base,
+                stream=True
+            )
+        except Exception as e:
+            logger.error(f"LLM streaming failed for {route}: {e}")
+            raise LLMError(f"LLM streaming failed for {route}: {e}") from e
+
+        async for chunk in response:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+
+
+class StubLLMBackend:
+    """Deterministic local model for tests and benchmarks.
+
+    responders maps a route to a function building the reply from the prompt;
+    other routes get a fixed reply derived from a hash of the prompt.
+    """
+
+    def __init__(self, latency_ms: float = 0, responders: Optional[Dict[str, Callable[[str], str]]] = None):
+        self.latency_ms = latency_ms
+        self.responders = dict(responders or {})
+
+    configured = True
+
+    def reply(self, route: str, prompt: str) -> str:
+        responder = self.responders.get(route)
+        if responder is not None:
+            return responder(prompt)
+        digest = hashlib.sha256(f"{route}\n{prompt}".encode()).hexdigest()[:12]
+        return f"Betty's {route} analysis (stub {digest})"
+
+    async def complete(self, route: str, system_message: str, prompt: str) -> str:
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        return self.reply(route, prompt)
+
+    async def stream(self, route: str, system_message: str, prompt: str) -> AsyncIterator[str]:
+        words = self.reply(route, prompt).split(" ")
+        for i, word in enumerate(words):
+            if self.latency_ms:
+                await asyncio.sleep(self.latency_ms / 1000 / len(words))
+            yield word if i == 0 else f" {word}"
+
+
+def parse_route_limits(value: str) -> Dict[str, int]:
+    """Parse "route=n,route=n" into {route: n}"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        route, _, limit = item.partition("=")
+        limits[route.strip()] = int(limit)
+    return limits
+
+
+class LLMGateway:
+    """Concurrency limits, deadlines, retries and metrics around an LLM backend"""
+
+    def __init__(self, backend, max_concurrency: int = 8, route_limits: Optional[Dict[str, int]] = None,
+                 timeout_seconds: float = 60, max_retries: int = 2, retry_base_seconds: float = 0.5):
+        self.backend = backend
+        self.max_concurrency = max_concurrency
+        self.route_limits = dict(route_limits or {})
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self._global = asyncio.Semaphore(max_concurrency)
+        self._routes: Dict[str, asyncio.Semaphore] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._calls = metrics.counter("llm_calls", "LLM calls by route and outcome")
+        self._retries = metrics.counter("llm_retries", "LLM attempts retried after an error")
+        self._latency = metrics.histogram("llm_latency_ms", "LLM call latency including queueing and retries")
+        self._prompt_tokens = metrics.histogram("llm_prompt_tokens", "Prompt tokens (system message included) per LLM call")
+        self._completion_tokens = metrics.histogram("llm_completion_tokens", "Completion tokens per LLM call")
+
+    @property
+    def configured(self) -> bool:
+        return getattr(self.backend, "configured", True)
+
+    def _route_semaphore(self, route: str) -> asyncio.Semaphore:
+        semaphore = self._routes.get(route)
+        if semaphore is None:
+            limit = self.route_limits.get(route, min(DEFAULT_ROUTE_CONCURRENCY, self.max_concurrency))
+            semaphore = self._routes[route] = asyncio.Semaphore(limit)
+        return semaphore
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, self.retry_base_seconds * 2 ** attempt)
+
+    async def _attempts(self, route: str, system_message: str, prompt: str, deadline: float) -> str:
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await self.backend.complete(route, system_message, prompt)
+            except LLMNotConfigured:
+                raise
+            except Exception as e:
+                delay = self._backoff(attempt)
+                if attempt == self.max_retries or loop.time() + delay >= deadline:
+                    raise LLMError(f"LLM call for {route} failed: {e}") from e
+                logger.warning(f"LLM call for {route} failed ({e}), retrying in {delay:.2f}s")
+                self._retries.inc(route=route)
+                await asyncio.sleep(delay)
+
+    async def complete(self, route: str, system_message: str, prompt: str, timeout: Optional[float] = None,
+                       **span_attributes) -> str:
+        """Run one prompt under the route's limits; raises LLMError, LLMTimeout or LLMNotConfigured"""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + (timeout or self.timeout_seconds)
+        outcome = "error"
+
+        with tracer.span("llm.chat", route=route, model=getattr(self.backend, "model", "stub"), **span_attributes) as span:
+            async def limited():
+                async with self._route_semaphore(route), self._global:
+                    self._in_flight[route] = self._in_flight.get(route, 0) + 1
+                    try:
+                        span.set_attribute("queued_ms", round((loop.time() - started) * 1000, 1))
+                        return await self._attempts(route, system_message, prompt, deadline)
+                    finally:
+                        self._in_flight[route] -= 1
+
+            try:
+                response = await asyncio.wait_for(limited(), deadline - loop.time())
+                outcome = "ok"
+            except asyncio.TimeoutError:
+                outcome = "timeout"
+                raise LLMTimeout(f"LLM call for {route} exceeded {timeout or self.timeout_seconds}s")
+            except LLMNotConfigured:
+                outcome = "not_configured"
+                raise
+            finally:
+                self._calls.inc(route=route, outcome=outcome)
+                self._latency.observe((loop.time() - started) * 1000, route=route)
+
+            prompt_tokens, completion_tokens = count_tokens(system_message + prompt), count_tokens(response)
+            self._prompt_tokens.observe(prompt_tokens, route=route)
+            self._completion_tokens.observe(completion_tokens, route=route)
+            span.set_attributes(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        return response
+
+    async def stream(self, route: str, system_message: str, prompt: str,
+                     timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """Yield output as it arrives; timeout bounds the wait for each chunk"""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        timeout = timeout or self.timeout_seconds
+        outcome, completion = "error", []
+
+        # No span here: the generator is resumed from the response's context, not the request's
+        async with self._route_semaphore(route), self._global:
+            self._in_flight[route] = self._in_flight.get(route, 0) + 1
+            chunks = self.backend.stream(route, system_message, prompt).__aiter__()
+            try:
+                while True:
+                    try:
+                        text = await asyncio.wait_for(chunks.__anext__(), timeout)
+                    except StopAsyncIteration:
+                        break
+                    if not completion:
+                        self._latency.observe((loop.time() - started) * 1000, route=f"{route}:first_token")
+                    completion.append(text)
+                    yield text
+                outcome = "ok"
+            except asyncio.TimeoutError:
+                outcome = "timeout"
+                raise LLMTimeout(f"LLM stream for {route} stalled for {timeout}s")
+            except LLMNotConfigured:
+                outcome = "not_configured"
+                raise
+            finally:
+                await chunks.aclose()
+                self._in_flight[route] -= 1
+                self._calls.inc(route=f"{route}:stream", outcome=outcome)
+                self._latency.observe((loop.time() - started) * 1000, route=f"{route}:stream")
+                if completion:
+                    self._prompt_tokens.observe(count_tokens(system_message + prompt), route=route)
+                    self._completion_tokens.observe(count_tokens("".join(completion)), route=route)
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "max_concurrency": self.max_concurrency,
+            "route_limits": self.route_limits,
+            "in_flight": {route: n for route, n in self._in_flight.items() if n},
+        }
+
+
+def gateway_from_env() -> LLMGateway:
+    """Build the gateway from the environment (call after .env has been loaded)"""
+    name = os.environ.get("LLM_BACKEND", "emergent").lower()
+    if name == "stub":
+        backend = StubLLMBackend(latency_ms=float(os.environ.get("LLM_STUB_LATENCY_MS", "0")))
+    else:
+        if name != "emergent":
+            logger.error(f"Unknown LLM_BACKEND {name!r}, using emergent")
+        backend = EmergentLLMBackend(
+            os.environ.get("EMERGENT_LLM_KEY"), os.environ.get("LLM_MODEL", "gpt-4o"), os.environ.get("LLM_API_BASE")
+        )
+        if backend.configured and not backend.streaming:
+            logger.warning("LLM_API_BASE is not set: streamed endpoints will send each answer as a single chunk")
+
+    return LLMGateway(
+        backend,
+        max_concurrency=int(os.environ.get("LLM_MAX_CONCURRENCY", "8")),
+        route_limits=parse_route_limits(os.environ.get("LLM_ROUTE_CONCURRENCY", "")),
+        timeout_seconds=float(os.environ.get("LLM_TIMEOUT_SECONDS", "60")),
+        max_retries=int(os.environ.get("LLM_MAX_RETRIES", "2")),
+    )
@@ -0,0 +1,400 @@
+"""Versioned, run-once database migrations and seed data.
+
+MIGRATIONS is an ordered list of (version, name, step) where step(client, db)
+is an idempotent coroutine. run_migrations() applies every step whose
+version has no record in schema_migrations yet, in version order, and
+records each one as it completes. A failed step stops the run; it is
+retried (from that step) next time.
+
+Only one process migrates at a time: the runner holds a lease-based lock
+document in schema_migrations, and other workers wait for it to be released
+before carrying on, so they never serve a half-migrated database.
+
+Runs at server startup; run `python migrations.py` to migrate at deploy time.
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, List, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+from betty_stats import insert_predictions, rebuild_stats
+from db_indexes import migrate_expiry_dates
+
+logger = logging.getLogger(__name__)
+
+LOCK_ID = "lock"
+MIGRATION_LOCK_SECONDS = 600  # lease, renewed before each step
+MIGRATION_WAIT_SECONDS = 600  # how long a worker waits for another worker's run
+
+
+class MigrationLockTimeout(Exception):
+    """Raised when another process holds the migration lock for too long"""
+
+
+async def seed_betty_history(client, db) -> dict:
+    """Create Betty's historical performance data if there are no predictions yet"""
+    if await db.betty_predictions.find_one({}, {"_id": 1}):
+        return {"seeded": 0}
+
+    now = datetime.now(timezone.utc)
+    current_monday = (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    # Create Week 1 (2 weeks ago) - 3/3 correct predictions
+    week1_monday = current_monday - timedelta(days=14)
+    week1_predictions = [
+        {
+            "id": str(uuid.uuid4()),
+            "week_start": week1_monday,
+            "asset_symbol": "BTC",
+            "asset_name": "Bitcoin",
+            "asset_type": "crypto",
+            "current_price": 118500.0,
+            "direction": "up",
+            "predicted_change_percent": 3.2,
+            "predicted_target_price": 122300.0,
+            "confidence_level": 0.78,
+            "reasoning": "Strong institutional adoption and ETF inflows creating upward pressure.",
+            "created_at": week1_monday,
+            # Results - CORRECT
+            "final_price": 123150.0,
+            "actual_change_percent": 3.92,
+            "was_correct": True,
+            "evaluated_at": week1_monday + timedelta(days=7)
+        },
+        {
+            "id": str(uuid.uuid4()),
+            "week_start": week1_monday,
+            "asset_symbol": "CADUSD=X",
+            "asset_name": "Canadian Dollar",
+            "asset_type": "currency",
+            "current_price": 0.7245,
+            "direction": "down",
+            "predicted_change_percent": 1.8,
+            "predicted_target_price": 0.7115,
+            "confidence_level": 0.72,
+            "reasoning": "Bank of Canada's dovish stance and weakening oil prices pressuring CAD.",
+            "created_at": week1_monday,
+            # Results - CORRECT
+            "final_price": 0.7098,
+            "actual_change_percent": -2.03,
+            "was_correct": True,
+            "evaluated_at": week1_monday + timedelta(days=7)
+        },
+        {
+            "id": str(uuid.uuid4()),
+            "week_start": week1_monday,
+            "asset_symbol": "GC=F",
+            "asset_name": "Gold",
+            "asset_type": "metal",
+            "current_price": 3720.0,
+            "direction": "up",
+            "predicted_change_percent": 2.1,
+            "predicted_target_price": 3798.0,
+            "confidence_level": 0.85,
+            "reasoning": "Geopolitical tensions and inflation concerns driving safe-haven demand.",
+            "created_at": week1_monday,
+            # Results - CORRECT
+            "final_price": 3812.0,
+            "actual_change_percent": 2.47,
+            "was_correct": True,
+            "evaluated_at": week1_monday + timedelta(days=7)
+        }
+    ]
+
+    # Create Week 2 (1 week ago) - 2/3 correct predictions
+    week2_monday = current_monday - timedelta(days=7)
+    week2_predictions = [
+        {
+            "id": str(uuid.uuid4()),
+            "week_start": week2_monday,
+            "asset_symbol": "ETH",
+            "asset_name": "Ethereum",
+            "asset_type": "crypto",
+            "current_price": 4280.0,
+            "direction": "up",
+            "predicted_change_percent": 4.5,
+            "predicted_target_price": 4472.0,
+            "confidence_level": 0.68,
+            "reasoning": "Ethereum upgrade and DeFi growth creating bullish sentiment.",
+            "created_at": week2_monday,
+            # Results - CORRECT
+            "final_price": 4465.0,
+            "actual_change_percent": 4.32,
+            "was_correct": True,
+            "evaluated_at": week2_monday + timedelta(days=7)
+        },
+        {
+            "id": str(uuid.uuid4()),
+            "week_start": week2_monday,
+            "asset_symbol": "XRP",
+            "asset_name": "XRP",
+            "asset_type": "crypto",
+            "current_price": 3.15,
+            "direction": "down",
+            "predicted_change_percent": 2.8,
+            "predicted_target_price": 3.06,
+            "confidence_level": 0.61,
+            "reasoning": "SEC regulatory concerns and market uncertainty affecting XRP price.",
+            "created_at": week2_monday,
+            # Results - WRONG (went up instead of down)
+            "final_price": 3.28,
+            "actual_change_percent": 4.13,
+            "was_correct": False,
+            "evaluated_at": week2_monday + timedelta(days=7)
+        },
+        {
+            "id": str(uuid.uuid4()),
+            "week_start": week2_monday,
+            "asset_symbol": "SI=F",
+            "asset_name": "Silver",
+            "asset_type": "metal",
+            "current_price": 45.2,
+            "direction": "up",
+            "predicted_change_percent": 3.1,
+            "predicted_target_price": 46.6,
+            "confidence_level": 0.74,
+            "reasoning": "Industrial demand and precious metals rotation supporting silver.",
+            "created_at": week2_monday,
+            # Results - CORRECT
+            "final_price": 47.1,
+            "actual_change_percent": 4.20,
+            "was_correct": True,
+            "evaluated_at": week2_monday + timedelta(days=7)
+        }
+    ]
+
+    # Week 3 (This Week) - New Sunday Picks! 🔮
+    week3_monday = current_monday
+    week3_predictions = [
+        {
+            "id": str(uuid.uuid4()),
+            "week_start": week3_monday,
+            "asset_symbol": "BTC",
+            "asset_name": "Bitcoin",
+            "asset_type": "crypto",
+            "current_price": 125334.0,
+            "direction": "up",
+            "predicted_change_percent": 4.2,
+            "predicted_target_price": 130600.0,
+            "confidence_level": 0.82,
+            "reasoning": "Bitcoin's Sunday surge momentum + institutional buying pressure suggests strong weekly breakout above $130K resistance.",
+            "created_at": week3_monday,
+            # No results yet - predictions for this week
+            "final_price": None,
+            "actual_change_percent": None,
+            "was_correct": None,
+            "evaluated_at": None
+        },
+        {
+            "id": str(uuid.uuid4()),
+            "week_start": week3_monday,
+            "asset_symbol": "EURJPY=X",
+            "asset_name": "EUR/JPY",
+            "asset_type": "currency",
+            "current_price": 162.45,
+            "direction": "down",
+            "predicted_change_percent": 2.1,
+            "predicted_target_price": 159.04,
+            "confidence_level": 0.76,
+            "reasoning": "BOJ intervention signals + European economic uncertainty create perfect storm for EUR/JPY weekly decline.",
+            "created_at": week3_monday,
+            # No results yet
+            "final_price": None,
+            "actual_change_percent": None,
+            "was_correct": None,
+            "evaluated_at": None
+        },
+        {
+            "id": str(uuid.uuid4()),
+            "week_start": week3_monday,
+            "asset_symbol": "PL=F",
+            "asset_name": "Platinum",
+            "asset_type": "metal",
+            "current_price": 967.8,
+            "direction": "up",
+            "predicted_change_percent": 3.8,
+            "predicted_target_price": 1004.6,
+            "confidence_level": 0.71,
+            "reasoning": "Industrial demand surge + supply constraints in South Africa = platinum breakthrough week above $1000.",
+            "created_at": week3_monday,
+            # No results yet
+            "final_price": None,
+            "actual_change_percent": None,
+            "was_correct": None,
+            "evaluated_at": None
+        }
+    ]
+
+
+    # Historical predictions + this week's picks
+    all_predictions = week1_predictions + week2_predictions + week3_predictions
+    await insert_predictions(client, db, all_predictions)
+
+    logger.info("Betty's history initialized: Week 1 (3/3), Week 2 (2/3), Week 3 (NEW Sunday picks!)")
+    return {"seeded": len(all_predictions)}
+
+
+async def convert_prediction_dates(client, db) -> dict:
+    """Convert string week_start/created_at/evaluated_at values on predictions (older seed data) to dates"""
+    converted = {}
+    for field in ("week_start", "created_at", "evaluated_at"):
+        result = await db.betty_predictions.update_many(
+            {field: {"$type": "string"}},
+            [{"$set": {field: {"$toDate": f"${field}"}}}]
+        )
+        converted[field] = result.modified_count
+    return converted
+
+
+async def convert_expiry_dates(client, db) -> dict:
+    return await migrate_expiry_dates(db)
+
+
+async def rebuild_betty_stats(client, db) -> dict:
+    await rebuild_stats(db)
+    return {}
+
+
+async def dedupe_weekly_reports(client, db) -> dict:
+    """Keep one report per week_start, and only its predictions, so the unique index can be built"""
+    duplicate_weeks = await db.betty_reports.aggregate([
+        {"$group": {"_id": "$week_start", "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ]).to_list(None)
+
+    removed_reports = removed_predictions = 0
+    for week in duplicate_weeks:
+        reports = await db.betty_reports.find({"week_start": week["_id"]}).sort("created_at", 1).to_list(None)
+        # The earliest published report wins; a pending claim only if nothing was published
+        keep = next((report for report in reports if report.get("status") != "pending"), reports[0])
+        kept_ids = {pred.get("id") for pred in keep.get("predictions", [])}
+        losers = [report for report in reports if report["_id"] != keep["_id"]]
+
+        stray_ids = [pred["id"] for report in losers for pred in report.get("predictions", [])
+                     if pred.get("id") and pred["id"] not in kept_ids]
+        if stray_ids:
+            result = await db.betty_predictions.delete_many({"id": {"$in": stray_ids}})
+            removed_predictions += result.deleted_count
+            await db.betty_accuracy.delete_many({"prediction_id": {"$in": stray_ids}})
+        result = await db.betty_reports.delete_many({"_id": {"$in": [report["_id"] for report in losers]}})
+        removed_reports += result.deleted_count
+
+    if removed_predictions:
+        await rebuild_stats(db)
+    if removed_reports:
+        logger.info(f"Removed {removed_reports} duplicate weekly reports and {removed_predictions} of their predictions")
+    return {"reports": removed_reports, "predictions": removed_predictions}
+
+
+async def dedupe_accuracy_scores(client, db) -> dict:
+    """Keep the newest betty_accuracy score per prediction so the unique index can be built"""
+    duplicates = await db.betty_accuracy.aggregate([
+        {"$sort": {"_id": -1}},
+        {"$group": {"_id": "$prediction_id", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ]).to_list(None)
+    stale_ids = [doc_id for group in duplicates for doc_id in group["ids"][1:]]
+    removed = (await db.betty_accuracy.delete_many({"_id": {"$in": stale_ids}})).deleted_count if stale_ids else 0
+    if removed:
+        logger.info(f"Removed {removed} duplicate accuracy scores")
+    return {"removed": removed}
+
+
+# Append new steps with the next version; never renumber or remove applied ones
+MIGRATIONS: List[Tuple[int, str, Callable[..., Awaitable[dict]]]] = [
+    (1, "convert_expiry_dates", convert_expiry_dates),
+    (2, "seed_betty_history", seed_betty_history),
+    (3, "convert_prediction_dates", convert_prediction_dates),
+    (4, "rebuild_betty_stats", rebuild_betty_stats),
+    (5, "dedupe_weekly_reports", dedupe_weekly_reports),
+    (6, "dedupe_accuracy_scores", dedupe_accuracy_scores),
+]
+
+
+async def acquire_lock(db, owner: str, lease_seconds: float = MIGRATION_LOCK_SECONDS) -> bool:
+    """Take (or renew) the migration lock; False if another owner holds an unexpired lease"""
+    now = datetime.now(timezone.utc)
+    try:
+        await db.schema_migrations.find_one_and_update(
+            {"_id": LOCK_ID, "$or": [{"owner": owner}, {"expires_at": {"$lt": now}}]},
+            {"$set": {"owner": owner, "expires_at": now + timedelta(seconds=lease_seconds), "renewed_at": now}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        return False  # the lock document exists and isn't ours or expired
+
+
+async def release_lock(db, owner: str):
+    await db.schema_migrations.delete_one({"_id": LOCK_ID, "owner": owner})
+
+
+async def applied_versions(db) -> set:
+    docs = await db.schema_migrations.find({"version": {"$exists": True}}, {"version": 1}).to_list(None)
+    return {doc["version"] for doc in docs}
+
+
+async def run_migrations(client, db, migrations: List[Tuple[int, str, Callable]] = None,
+                         wait_seconds: float = MIGRATION_WAIT_SECONDS) -> List[str]:
+    """Apply pending migrations under the lock; returns the names applied by this process"""
+    migrations = sorted(migrations or MIGRATIONS, key=lambda migration: migration[0])
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    deadline = time.monotonic() + wait_seconds
+    while not await acquire_lock(db, owner):
+        if time.monotonic() >= deadline:
+            raise MigrationLockTimeout(f"Migration lock still held after {wait_seconds}s")
+        await asyncio.sleep(1)
+
+    applied = []
+    try:
+        done = await applied_versions(db)
+        for version, name, step in migrations:
+            if version in done:
+                continue
+            if not await acquire_lock(db, owner):
+                raise MigrationLockTimeout(f"Lost the migration lock before {name}")
+
+            started = time.monotonic()
+            result = await step(client, db)
+            duration_ms = round((time.monotonic() - started) * 1000, 1)
+            await db.schema_migrations.insert_one({
+                "_id": version,
+                "version": version,
+                "name": name,
+                "applied_at": datetime.now(timezone.utc),
+                "duration_ms": duration_ms,
+                "result": result or {}
+            })
+            logger.info(f"Applied migration {version} ({name}) in {duration_ms}ms: {result}")
+            applied.append(name)
+    finally:
+        await release_lock(db, owner)
+
+    return applied
+
+
+if __name__ == "__main__":
+    from pathlib import Path
+
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    load_dotenv(Path(__file__).parent / '.env')
+
+    async def main():
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+        try:
+            applied = await run_migrations(client, client[os.environ['DB_NAME']])
+            logger.info(f"Migrations complete ({len(applied)} applied)")
+        finally:
+            client.close()
+
+    asyncio.run(main())
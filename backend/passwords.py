@@ -0,0 +1,105 @@
+"""Password hashing service.
+
+Passwords are hashed with scrypt, which is deliberately slow (tens of
+milliseconds), so the work runs in a bounded process pool instead of on the
+event loop. A cap on queued jobs makes a login storm fail fast with
+PasswordHasherBusy rather than starving every other request.
+
+Stored format: scrypt$<n>$<r>$<p>$<base64 salt>$<base64 hash>. Hashes from
+before this format (unsalted SHA-256 hex digests) still verify and are
+reported as needing a rehash.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SCRYPT_DKLEN = 32
+SALT_BYTES = 16
+
+
+def hash_password(password: str) -> str:
+    salt = os.urandom(SALT_BYTES)
+    digest = hashlib.scrypt(password.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, dklen=SCRYPT_DKLEN)
+    return "$".join([
+        "scrypt", str(SCRYPT_N), str(SCRYPT_R), str(SCRYPT_P),
+        base64.b64encode(salt).decode(), base64.b64encode(digest).decode()
+    ])
+
+
+def _is_legacy_hash(stored: str) -> bool:
+    return len(stored) == 64 and all(c in "0123456789abcdef" for c in stored)
+
+
+def verify_password(password: str, stored: str) -> Tuple[bool, bool]:
+    """Return (matches, needs_rehash)"""
+    if _is_legacy_hash(stored):
+        legacy = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(legacy, stored), True
+
+    try:
+        scheme, n, r, p, salt, expected = stored.split("$")
+        if scheme != "scrypt":
+            return False, False
+        expected = base64.b64decode(expected)
+        digest = hashlib.scrypt(password.encode(), salt=base64.b64decode(salt),
+                                n=int(n), r=int(r), p=int(p), dklen=len(expected))
+    except ValueError:
+        return False, False
+
+    matches = hmac.compare_digest(digest, expected)
+    needs_rehash = (int(n), int(r), int(p)) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return matches, matches and needs_rehash
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing queue is full"""
+
+
+class PasswordHasher:
+    """Runs hash/verify in a bounded process pool with a queue limit"""
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 32):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._pending = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn rather than fork: the server process has a running loop and threads
+            self._executor = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    async def _run(self, fn, *args):
+        if self._pending >= self.max_pending:
+            raise PasswordHasherBusy("Too many password operations in progress")
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, password: str, stored: str) -> Tuple[bool, bool]:
+        return await self._run(verify_password, password, stored)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    max_workers=int(os.environ.get("PASSWORD_HASH_WORKERS", "2")),
+    max_pending=int(os.environ.get("PASSWORD_HASH_MAX_PENDING", "32")),
+)
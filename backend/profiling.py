@@ -0,0 +1,138 @@
+"""Event-loop lag monitoring and on-demand sampling profiling.
+
+LoopLagMonitor keeps a heartbeat coroutine on the event loop and a watchdog
+thread beside it. When the heartbeat is late by more than the threshold, the
+watchdog logs the loop thread's current stack, which is the code that's
+blocking it (a synchronous yfinance call, a pandas computation, etc).
+
+SamplingProfiler samples every thread's stack for a fixed duration and returns
+the result in collapsed-stack format ("frame;frame;frame count" per line),
+which flamegraph.pl and speedscope both read directly.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LoopLagMonitor:
+    """Detects and reports callbacks that block the event loop"""
+
+    def __init__(self, interval_ms: float = 50, threshold_ms: float = 100):
+        self.interval = interval_ms / 1000
+        self.threshold = threshold_ms / 1000
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = time.perf_counter()
+        self._reported_beat: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self.stats = {"samples": 0, "slow_callbacks": 0, "max_lag_ms": 0.0, "last_lag_ms": 0.0}
+
+    def start(self):
+        """Start monitoring the running event loop (call from inside it)"""
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.perf_counter()
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _heartbeat(self):
+        while True:
+            before = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            lag_ms = max(0.0, (now - before - self.interval) * 1000)
+            self._last_beat = now
+            self.stats["samples"] += 1
+            self.stats["last_lag_ms"] = round(lag_ms, 2)
+            if lag_ms > self.stats["max_lag_ms"]:
+                self.stats["max_lag_ms"] = round(lag_ms, 2)
+
+    def _watch(self):
+        # Poll faster than the threshold so the stack is captured while the loop is still blocked
+        poll = min(self.interval, self.threshold) / 2
+        while not self._stopped.wait(poll):
+            beat = self._last_beat
+            stalled_for = time.perf_counter() - beat
+            if stalled_for < self.interval + self.threshold or self._reported_beat == beat:
+                continue
+
+            self._reported_beat = beat
+            self.stats["slow_callbacks"] += 1
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else "<unavailable>"
+            blocked_ms = (stalled_for - self.interval) * 1000
+            logger.warning(f"Event loop blocked for {blocked_ms:.0f}ms+, loop thread stack:\n{stack}")
+
+
+class ProfilerBusy(Exception):
+    """Raised when a profile is requested while another one is running"""
+
+
+class SamplingProfiler:
+    """Statistical profiler producing flamegraph-compatible collapsed stacks"""
+
+    def __init__(self, interval_ms: float = 5):
+        self.interval = interval_ms / 1000
+        self._lock = threading.Lock()
+
+    def profile(self, seconds: float) -> str:
+        """Sample all threads for the given duration (blocking; run it off-loop)"""
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy("A profile is already being captured")
+        try:
+            stacks = self._sample(seconds)
+        finally:
+            self._lock.release()
+        return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()) + "\n"
+
+    def _sample(self, seconds: float) -> Counter:
+        own_thread = threading.get_ident()
+        thread_names: Dict[int, str] = {}
+        stacks: Counter = Counter()
+        deadline = time.perf_counter() + seconds
+
+        while time.perf_counter() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+                if thread_id not in thread_names:
+                    thread_names = {t.ident: t.name for t in threading.enumerate()}
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                frames.append(thread_names.get(thread_id, str(thread_id)))
+                stacks[";".join(reversed(frames))] += 1
+            time.sleep(self.interval)
+
+        return stacks
+
+
+loop_monitor = LoopLagMonitor(
+    interval_ms=float(os.environ.get("LOOP_LAG_INTERVAL_MS", "50")),
+    threshold_ms=float(os.environ.get("LOOP_LAG_THRESHOLD_MS", "100")),
+)
+profiler = SamplingProfiler(interval_ms=float(os.environ.get("PROFILER_INTERVAL_MS", "5")))
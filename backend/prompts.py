@@ -0,0 +1,263 @@
+"""Prompt building and token accounting for Betty's LLM calls.
+
+Market data goes into prompts as compact pipe-separated tables rather than
+indented JSON, with prices rounded to the precision that matters for each
+asset type. Every prompt is measured (tiktoken when available, a
+characters/4 estimate otherwise), logged and recorded per route, and
+fit_prompt() drops data rows until the prompt fits the route's token budget.
+
+Configuration (environment):
+    PROMPT_TOKEN_BUDGETS  per-route budgets, e.g. "betty_predictions=1200,predict=500"
+"""
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Sequence
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOKEN_BUDGETS = {
+    "betty_predictions": 1200,
+    "betty_narrative": 800,
+    "predict": 500,
+    "premium_insights": 400,
+}
+
+# Decimal places per asset type; crypto spans BTC to sub-cent coins, so it uses significant figures
+PRICE_DECIMALS = {"currency": 4, "metal": 2, "metals": 2}
+CRYPTO_SIGNIFICANT_FIGURES = 5
+
+ASSET_TABLE_HEADER = "symbol|name|type|price|change_24h_%"
+PICKS_TABLE_HEADER = "symbol|name|price|direction|predicted_change_%|confidence|momentum_z|reversion_z|weekly_vol_%"
+
+_encoding = None
+_encoding_failed = False
+
+_prompt_tokens = metrics.histogram("prompt_tokens", "Prompt tokens per LLM call, by route")
+_rows_trimmed = metrics.counter("prompt_rows_trimmed", "Data rows dropped to fit a prompt into its token budget")
+_budget_exceeded = metrics.counter("prompt_budget_exceeded", "Prompts still over budget with every data row dropped")
+
+
+class PromptBudgetExceeded(Exception):
+    """Raised when a prompt can't be made to fit its token budget"""
+
+
+def _parse_budgets(value: str) -> Dict[str, int]:
+    budgets = dict(DEFAULT_TOKEN_BUDGETS)
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        route, _, budget = item.partition("=")
+        budgets[route.strip()] = int(budget)
+    return budgets
+
+
+TOKEN_BUDGETS = _parse_budgets(os.environ.get("PROMPT_TOKEN_BUDGETS", ""))
+
+
+def count_tokens(text: str) -> int:
+    """GPT-4o token count via tiktoken, or a characters/4 estimate if it's unavailable"""
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:  # not installed, or the encoding can't be downloaded
+            logger.warning(f"tiktoken unavailable ({e}), estimating tokens from length")
+            _encoding_failed = True
+    if _encoding is not None:
+        return len(_encoding.encode(text or "", disallowed_special=()))
+    return max(1, len(text or "") // 4)
+
+
+def format_number(value: float) -> str:
+    """Shortest plain decimal for a rounded value (no exponent, no trailing zeros)"""
+    text = f"{value:.10f}".rstrip("0").rstrip(".")
+    return text if text not in ("", "-0") else "0"
+
+
+def round_price(price: float, asset_type: str) -> float:
+    decimals = PRICE_DECIMALS.get(asset_type)
+    if decimals is not None:
+        return round(price, decimals)
+    return float(f"{price:.{CRYPTO_SIGNIFICANT_FIGURES}g}")
+
+
+def format_price(price: float, asset_type: str) -> str:
+    return format_number(round_price(price, asset_type))
+
+
+def format_change(change_percent: float) -> str:
+    return f"{change_percent:+.2f}"
+
+
+def asset_table(assets: Sequence[dict]) -> str:
+    """Render {symbol, name, type, price, change_percent} dicts as a pipe-separated table"""
+    rows = [ASSET_TABLE_HEADER]
+    for asset in assets:
+        rows.append("|".join([
+            asset["symbol"], asset["name"], asset["type"],
+            format_price(asset["price"], asset["type"]), format_change(asset["change_percent"])
+        ]))
+    return "\n".join(rows)
+
+
+def parse_asset_table(text: str) -> List[dict]:
+    """Inverse of asset_table for the table embedded in a prompt"""
+    lines = text.splitlines()
+    start = lines.index(ASSET_TABLE_HEADER) + 1
+    assets = []
+    for line in lines[start:]:
+        fields = line.split("|")
+        if len(fields) != 5:
+            break
+        symbol, name, asset_type, price, change = fields
+        assets.append({"symbol": symbol, "name": name, "type": asset_type,
+                       "price": float(price), "change_percent": float(change)})
+    return assets
+
+
+def record_prompt(route: str, prompt: str) -> int:
+    """Count, log and record a prompt's tokens; returns the count"""
+    tokens = count_tokens(prompt)
+    _prompt_tokens.observe(tokens, route=route)
+    logger.info(f"Prompt for {route}: {tokens} tokens (budget {TOKEN_BUDGETS.get(route, 'none')})")
+    return tokens
+
+
+def fit_prompt(route: str, render: Callable[[list], str], rows: Sequence, budget: Optional[int] = None,
+               keep_last: bool = False) -> str:
+    """Render rows into a prompt, dropping rows until it fits the route's token budget.
+
+    Rows are dropped from the end, or from the start with keep_last (e.g. to
+    keep the most recent closes).
+    """
+    budget = budget or TOKEN_BUDGETS.get(route)
+    kept = list(rows)
+    prompt = render(kept)
+    tokens = count_tokens(prompt)
+    while budget and tokens > budget and kept:
+        kept = kept[1:] if keep_last else kept[:-1]
+        prompt = render(kept)
+        tokens = count_tokens(prompt)
+
+    if budget and tokens > budget:
+        _budget_exceeded.inc(route=route)
+        raise PromptBudgetExceeded(f"Prompt for {route} needs {tokens} tokens, budget is {budget}")
+    if len(kept) < len(rows):
+        _rows_trimmed.inc(len(rows) - len(kept), route=route)
+        logger.warning(f"Dropped {len(rows) - len(kept)} of {len(rows)} rows to fit the {route} prompt into {budget} tokens")
+
+    _prompt_tokens.observe(tokens, route=route)
+    logger.info(f"Prompt for {route}: {tokens} tokens (budget {budget})")
+    return prompt
+
+
+def build_weekly_predictions_prompt(assets: List[dict], avg_accuracy: float, difficulty_level: str) -> str:
+    def render(rows):
+        return f"""You are Betty Crystal, a friendly AI trading mentor. You need to make exactly 3 predictions for this week.
+
+Your current track record: {avg_accuracy:.1%} accuracy
+Recommended approach: {difficulty_level}
+
+Available assets for prediction:
+{asset_table(rows)}
+
+Rules:
+1. Pick exactly 3 different assets from the list
+2. Predict direction (up/down) and percentage change for the WEEK
+3. Be realistic - weekly changes are usually 2-15% for crypto, 0.5-5% for currencies/metals
+4. Give confidence level 0.1-1.0 based on your track record
+5. Provide friendly, mentor-like reasoning
+
+Respond in this JSON format:
+{{
+  "predictions": [
+    {{
+      "asset_symbol": "BTC",
+      "asset_name": "Bitcoin",
+      "asset_type": "crypto",
+      "current_price": 121000,
+      "direction": "up",
+      "predicted_change_percent": 5.2,
+      "confidence_level": 0.75,
+      "reasoning": "Betty's friendly explanation..."
+    }}
+  ]
+}}"""
+
+    return fit_prompt("betty_predictions", render, assets)
+
+
+def build_prediction_narrative_prompt(picks: List[dict], avg_accuracy: float) -> str:
+    """Ask for reasoning only; the picks themselves come from the quant model"""
+    def render(rows):
+        table = "\n".join([PICKS_TABLE_HEADER] + [
+            "|".join([
+                pick["symbol"], pick["name"], format_price(pick["price"], pick["type"]), pick["direction"],
+                format_number(pick["predicted_change_percent"]), format_number(pick["confidence_level"]),
+                format_change(pick["momentum"]), format_change(pick["reversion"]),
+                format_number(pick["weekly_volatility_percent"])
+            ])
+            for pick in rows
+        ])
+        return f"""You are Betty Crystal, a friendly AI trading mentor. Your quantitative model has made this week's 3 predictions:
+
+{table}
+
+Your current track record: {avg_accuracy:.1%} accuracy
+
+For each prediction write 2-3 friendly, mentor-like sentences explaining it to a beginner, based on the momentum (trend strength), reversion (stretch from the 5-day average) and volatility figures. Do not change the direction or numbers.
+
+Respond with ONLY a JSON object mapping each symbol exactly as written above to its explanation, e.g. {{"SYMBOL": "..."}}"""
+
+    return fit_prompt("betty_narrative", render, picks)
+
+
+def build_asset_analysis_prompt(symbol: str, asset_type: str, current_price: float, price_change: float,
+                                recent_closes: List[float]):
+    """Return (system message, prompt) for a single-asset weekly analysis"""
+    system_message = f"You are Betty Crystal, an AI trading expert analyzing {symbol}."
+    now = datetime.now(timezone.utc)
+
+    def render(closes):
+        return f"""You are Betty Crystal, the AI trading oracle who operates on weekly cycles. Today is {now.strftime('%A')} and I'm analyzing {symbol} ({asset_type}) for the upcoming week.
+
+Current price: ${format_price(current_price, asset_type)}
+Weekly change: {price_change:+.2f}%
+Recent daily closes (oldest first): {", ".join(format_price(close, asset_type) for close in closes)}
+
+WEEKLY ANALYSIS REQUIRED:
+1. **This Week's Outlook** (Monday-Sunday): Direction (UP/DOWN/SIDEWAYS) and expected percentage move
+2. **Weekly Price Target**: Specific price target by end of week
+3. **Key Weekly Drivers**: What will move this asset this week (earnings, news, technical levels)
+4. **Weekly Risk Level**: HIGH/MEDIUM/LOW and why
+5. **Betty's Weekly Confidence**: 1-100 rating for this week's prediction
+
+Remember: I am Betty Crystal and I make weekly predictions every Sunday for the upcoming trading week. Be specific about THIS WEEK only.
+Analysis generated on: {now.strftime('%A, %Y-%m-%d %H:%M UTC')}"""
+
+    return system_message, fit_prompt("predict", render, recent_closes, keep_last=True)
+
+
+def batch_asset_line(asset: dict) -> str:
+    asset_type = asset["asset_type"]
+    closes = ",".join(format_price(close, asset_type) for close in asset["recent_closes"])
+    return (f"- {asset['symbol']} ({asset_type}): price {format_price(asset['current_price'], asset_type)}, "
+            f"weekly change {format_change(asset['price_change'])}%, closes {closes}")
+
+
+def build_batch_analysis_prompt(assets: List[dict]) -> str:
+    asset_lines = "\n".join(batch_asset_line(asset) for asset in assets)
+    return f"""You are Betty Crystal, the AI trading oracle who operates on weekly cycles. Today is {datetime.now(timezone.utc).strftime('%A')} and I'm analyzing these assets for the upcoming week:
+
+{asset_lines}
+
+For EACH asset write a weekly analysis covering:
+1. **This Week's Outlook** (Monday-Sunday): Direction (UP/DOWN/SIDEWAYS) and expected percentage move
+2. **Weekly Price Target**: Specific price target by end of week
+3. **Key Weekly Drivers**: What will move this asset this week
+4. **Weekly Risk Level**: HIGH/MEDIUM/LOW and why
+5. **Betty's Weekly Confidence**: 1-100 rating for this week's prediction
+
+Respond with ONLY a JSON object mapping each symbol exactly as written above to its analysis as a markdown string, e.g. {{"SYMBOL": "**This Week's Outlook**: ..."}}"""
@@ -0,0 +1,131 @@
+"""Local quantitative baseline for Betty's weekly predictions.
+
+Scores every tracked asset in one vectorized NumPy pass over a matrix of
+daily closes (one row per asset, oldest close first):
+
+- momentum:       mean log return over MOMENTUM_WINDOW days, as a t-statistic
+                  against the EWMA volatility
+- volatility:     RiskMetrics-style EWMA of squared daily log returns
+- mean reversion: negative z-score of the last close against the mean of the
+                  last REVERSION_WINDOW closes
+
+The combined score is in units of "standard deviations of conviction": its
+sign is the predicted direction, its magnitude ranks assets, sets the
+expected weekly move (at most one weekly standard deviation) and the
+confidence level.
+"""
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+MOMENTUM_WINDOW = 20
+REVERSION_WINDOW = 5
+EWMA_LAMBDA = 0.94
+MOMENTUM_WEIGHT = 0.6
+REVERSION_WEIGHT = 0.4
+TRADING_DAYS_PER_WEEK = 5
+MIN_HISTORY_DAYS = REVERSION_WINDOW + 2
+MAX_SCORE = 2.0
+
+# Accuracy scoring: a % move this far from the prediction earns no closeness credit
+MAX_PRICE_ERROR_PERCENT = 20.0
+
+
+def ewma_volatility(returns: np.ndarray, lam: float = EWMA_LAMBDA) -> np.ndarray:
+    """Daily volatility per row; the most recent return gets the largest weight"""
+    weights = (1 - lam) * lam ** np.arange(returns.shape[1])[::-1]
+    weights /= weights.sum()
+    return np.sqrt((returns ** 2) @ weights)
+
+
+def score_assets(closes: np.ndarray, momentum_window: int = MOMENTUM_WINDOW,
+                 reversion_window: int = REVERSION_WINDOW, momentum_weight: float = MOMENTUM_WEIGHT,
+                 reversion_weight: float = REVERSION_WEIGHT) -> Dict[str, np.ndarray]:
+    """Signals for a (n_assets, n_days) close matrix with no missing values"""
+    closes = np.asarray(closes, dtype=float)
+    returns = np.diff(np.log(closes), axis=1)
+    momentum_window = min(momentum_window, returns.shape[1])
+    reversion_window = min(reversion_window, closes.shape[1])
+
+    volatility = ewma_volatility(returns)
+    safe_volatility = np.where(volatility > 0, volatility, np.inf)
+
+    momentum = returns[:, -momentum_window:].mean(axis=1) / safe_volatility * np.sqrt(momentum_window)
+
+    recent = closes[:, -reversion_window:]
+    spread = recent.std(axis=1)
+    reversion = -(closes[:, -1] - recent.mean(axis=1)) / np.where(spread > 0, spread, np.inf)
+
+    score = np.clip(momentum_weight * momentum + reversion_weight * reversion, -MAX_SCORE, MAX_SCORE)
+    weekly_volatility = volatility * np.sqrt(TRADING_DAYS_PER_WEEK)
+    return {
+        "score": score,
+        "momentum": momentum,
+        "reversion": reversion,
+        "volatility": weekly_volatility,
+        "expected_change": score / MAX_SCORE * weekly_volatility,
+        "confidence": 0.5 + 0.45 * np.tanh(np.abs(score)),
+    }
+
+
+def score_series(closes: Sequence[float]) -> Dict[str, float]:
+    """Signals for a single asset's closes"""
+    return {name: float(values[0]) for name, values in score_assets(np.asarray(closes, dtype=float)[None, :]).items()}
+
+
+def align_closes(histories: Dict[str, Sequence[float]]):
+    """Stack each symbol's most recent closes into one matrix of their common length.
+
+    NaNs are dropped per symbol and symbols with fewer than MIN_HISTORY_DAYS
+    closes are left out. Returns (symbols, matrix).
+    """
+    series = {}
+    for symbol, values in histories.items():
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values) & (values > 0)]
+        if len(values) >= MIN_HISTORY_DAYS:
+            series[symbol] = values
+    if not series:
+        return [], np.empty((0, 0))
+    length = min(len(values) for values in series.values())
+    return list(series), np.vstack([values[-length:] for values in series.values()])
+
+
+def select_predictions(symbols: Sequence[str], closes: np.ndarray, top_n: int = 3,
+                       confidence_scale: float = 1.0) -> List[dict]:
+    """Top assets by signal strength, strongest first"""
+    signals = score_assets(closes)
+    order = np.argsort(-np.abs(signals["score"]), kind="stable")[:top_n]
+    picks = []
+    for i in order:
+        expected_change = float(signals["expected_change"][i])
+        picks.append({
+            "symbol": symbols[i],
+            "direction": "up" if signals["score"][i] >= 0 else "down",
+            "predicted_change_percent": round(abs(expected_change) * 100, 2),
+            "confidence_level": round(float(np.clip(signals["confidence"][i] * confidence_scale, 0.1, 1.0)), 2),
+            "score": round(float(signals["score"][i]), 3),
+            "momentum": round(float(signals["momentum"][i]), 3),
+            "reversion": round(float(signals["reversion"][i]), 3),
+            "weekly_volatility_percent": round(float(signals["volatility"][i]) * 100, 2),
+        })
+    return picks
+
+
+def score_accuracy(entry_prices, final_prices, predicted_change_percent, predicted_up) -> Dict[str, np.ndarray]:
+    """Betty's accuracy formula over arrays of predictions.
+
+    Direction is half the score; the other half shrinks linearly as the
+    predicted % move misses the actual one, reaching 0 at MAX_PRICE_ERROR_PERCENT.
+    """
+    entry_prices = np.asarray(entry_prices, dtype=float)
+    actual_change = (np.asarray(final_prices, dtype=float) - entry_prices) / entry_prices * 100
+    was_direction_correct = np.asarray(predicted_up, dtype=bool) == (actual_change > 0)
+    price_difference = np.abs(np.asarray(predicted_change_percent, dtype=float) - np.abs(actual_change))
+    closeness = np.maximum(0.0, (MAX_PRICE_ERROR_PERCENT - price_difference) / MAX_PRICE_ERROR_PERCENT)
+    return {
+        "actual_change_percent": actual_change,
+        "was_direction_correct": was_direction_correct,
+        "price_difference_percent": price_difference,
+        "accuracy_score": np.where(was_direction_correct, 0.5, 0.0) + closeness * 0.5,
+    }
@@ -0,0 +1,115 @@
+"""Sliding-window rate limiting for expensive endpoints.
+
+Each client (authenticated user or IP) gets a budget of RATE_LIMIT_BUDGET cost units per
+RATE_LIMIT_WINDOW_SECONDS. Routes that trigger LLM calls are weighted by
+ROUTE_COSTS; routes not listed are free. The sliding window is approximated
+from the current and previous fixed windows (the previous one weighted by how
+much of it still overlaps the sliding window), which needs only two counters
+per client and works the same way in memory or in a shared MongoDB backend.
+"""
+import math
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import List, Optional, Pattern, Tuple
+
+from pymongo import ReturnDocument
+
+from metrics import metrics
+
+# (method, path pattern, cost units) - first match wins
+ROUTE_COSTS: List[Tuple[str, Pattern, int]] = [
+    ("GET", re.compile(r"^/api/betty/premium-insights(/stream)?$"), 10),
+    ("POST", re.compile(r"^/api/predict/batch$"), 20),
+    ("GET", re.compile(r"^/api/predict/[^/]+(/stream)?$"), 5),
+]
+
+
+def route_cost(method: str, path: str) -> Tuple[int, str]:
+    """Return (cost, matched pattern) for a request method and path"""
+    for route_method, pattern, cost in ROUTE_COSTS:
+        if method == route_method and pattern.match(path):
+            return cost, pattern.pattern
+    return 0, ""
+
+
+class InMemoryRateLimitBackend:
+    """Per-process window counters for at most max_keys clients, least recently seen evicted first"""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        # key -> [window index, current count, previous count], least recently used first
+        self._windows: "OrderedDict[str, List[int]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    async def add(self, key: str, window: int, amount: int) -> Tuple[int, int]:
+        """Add amount to the key's current window; returns (previous count, current count)"""
+        state = self._windows.get(key)
+        if state is None:
+            while len(self._windows) >= self.max_keys:
+                self._windows.popitem(last=False)
+            state = self._windows[key] = [window, 0, 0]
+        else:
+            self._windows.move_to_end(key)
+            if state[0] < window - 1:
+                state[:] = [window, 0, 0]
+            elif state[0] == window - 1:
+                state[:] = [window, 0, state[1]]
+
+        state[1] += amount
+        return state[2], state[1]
+
+
+class MongoRateLimitBackend:
+    """Window counters shared by all workers through a MongoDB collection"""
+
+    def __init__(self, collection, window_seconds: int):
+        self.collection = collection
+        self.window_seconds = window_seconds
+
+    async def add(self, key: str, window: int, amount: int) -> Tuple[int, int]:
+        expires_at = datetime.fromtimestamp((window + 2) * self.window_seconds, timezone.utc)
+        current = await self.collection.find_one_and_update(
+            {"_id": f"{key}:{window}"},
+            {"$inc": {"count": amount}, "$setOnInsert": {"expires_at": expires_at}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        previous = await self.collection.find_one({"_id": f"{key}:{window - 1}"})
+        return (previous or {}).get("count", 0), current["count"]
+
+
+class RateLimiter:
+    """Sliding-window limiter over a pluggable counter backend"""
+
+    def __init__(self, backend, budget: int, window_seconds: int):
+        self.backend = backend
+        self.budget = budget
+        self.window_seconds = window_seconds
+        self._allowed = metrics.counter("rate_limit_allowed", "Requests admitted by the rate limiter on costed routes")
+        self._rejected = metrics.counter("rate_limit_rejected", "Requests rejected with 429 by the rate limiter")
+
+    async def check(self, key: str, cost: int, route: str = "") -> Optional[int]:
+        """Charge cost to key; returns None if allowed, else Retry-After seconds"""
+        now = time.time()
+        window = int(now // self.window_seconds)
+        elapsed = now - window * self.window_seconds
+        previous, current = await self.backend.add(key, window, cost)
+
+        overlap = 1 - elapsed / self.window_seconds
+        used = previous * overlap + current
+        if used <= self.budget:
+            self._allowed.inc(route=route)
+            return None
+
+        # Refund the rejected request so retrying clients can't lock themselves out
+        await self.backend.add(key, window, -cost)
+        self._rejected.inc(route=route)
+
+        excess = used - self.budget
+        remaining = self.window_seconds - elapsed
+        wait = min(excess * self.window_seconds / previous, remaining) if previous else remaining
+        return max(1, math.ceil(wait))
@@ -1,8 +1,11 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, Response, Request, BackgroundTasks
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Response, Request, BackgroundTasks
 from fastapi.security import HTTPBearer
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReplaceOne, UpdateOne
+from pymongo.errors import DuplicateKeyError
 import os
 import logging
 from pathlib import Path
@@ -11,11 +14,31 @@ from typing import List, Dict, Optional
 import uuid
 from datetime import datetime, timezone, timedelta
 import yfinance as yf
+import pandas as pd
 import requests
 import asyncio
-from emergentintegrations.llm.chat import LlmChat, UserMessage
+import math
+import time
+from cachetools import TLRUCache
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.cron import CronTrigger
 import json
 from enum import Enum
+from tracing import tracer, parse_traceparent
+from profiling import loop_monitor, profiler, ProfilerBusy
+from metrics import metrics
+from db_indexes import ensure_indexes
+from passwords import password_hasher, PasswordHasherBusy
+from session_tokens import RevocationFilter, is_signed_token, sign_session_token, verify_session_token
+from rate_limit import InMemoryRateLimitBackend, MongoRateLimitBackend, RateLimiter, route_cost
+from llm_gateway import LLMNotConfigured, StubLLMBackend, gateway_from_env
+from prompts import (build_asset_analysis_prompt, build_batch_analysis_prompt, build_prediction_narrative_prompt,
+                     build_weekly_predictions_prompt, batch_asset_line, count_tokens, parse_asset_table, record_prompt,
+                     round_price, PICKS_TABLE_HEADER)
+from quant import align_closes, score_accuracy, score_series, select_predictions
+from backtest import LOOKBACK_DAYS, align_price_matrix, run_backtests, validate_grids
+from betty_stats import delete_predictions, get_stats, get_weekly_stats, insert_predictions, record_evaluations
+from migrations import run_migrations
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -25,6 +48,9 @@ mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
+# All GPT-4o calls go through the gateway (concurrency caps, deadlines, retries, metrics)
+llm_gateway = gateway_from_env()
+
 # Create the main app without a prefix
 app = FastAPI(title="Betty Crystal Financial Dashboard API", version="2.0.0")
 
@@ -154,6 +180,97 @@ data_cache = {
 
 CACHE_EXPIRY_MINUTES = 5  # Cache expires after 5 minutes
 
+# Session cache: session token -> resolved User
+SESSION_CACHE_SIZE = int(os.environ.get("SESSION_CACHE_SIZE", "10000"))
+SESSION_CACHE_TTL_SECONDS = int(os.environ.get("SESSION_CACHE_TTL_SECONDS", "300"))
+
+def as_utc(value: datetime) -> datetime:
+    """Treat naive datetimes (as returned by Mongo) as UTC"""
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+class SessionCache:
+    """Bounded TTL cache of resolved users, never outliving the session's expires_at"""
+    
+    def __init__(self, maxsize: int, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._cache = TLRUCache(maxsize=maxsize, ttu=self._time_to_use, timer=time.time)
+        self._hits = metrics.counter("session_cache_hits", "Authenticated requests resolved from the session cache")
+        self._misses = metrics.counter("session_cache_misses", "Authenticated requests that went to MongoDB")
+        self._saved = metrics.counter("session_cache_round_trips_saved", "MongoDB round trips avoided by the session cache")
+    
+    def _time_to_use(self, token, entry, now):
+        _, expires_at_ts = entry
+        return min(now + self.ttl_seconds, expires_at_ts)
+    
+    def get(self, session_token: str) -> Optional[User]:
+        entry = self._cache.get(session_token)
+        if entry is None:
+            self._misses.inc()
+            return None
+        self._hits.inc()
+        self._saved.inc()  # the session/user aggregation
+        return entry[0]
+    
+    def put(self, session_token: str, user: User, expires_at: datetime):
+        self._cache[session_token] = (user, as_utc(expires_at).timestamp())
+    
+    def invalidate_token(self, session_token: str):
+        self._cache.pop(session_token, None)
+    
+    def invalidate_user(self, user_id: str):
+        for token, (user, _) in list(self._cache.items()):
+            if user.id == user_id:
+                self._cache.pop(token, None)
+    
+    def stats(self):
+        hits, misses = self._hits.value(), self._misses.value()
+        return {
+            "size": self._cache.currsize,
+            "maxsize": self._cache.maxsize,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+            "round_trips_saved": self._saved.value()
+        }
+
+session_cache = SessionCache(SESSION_CACHE_SIZE, SESSION_CACHE_TTL_SECONDS)
+
+# Session token mode: "opaque" (random token looked up in user_sessions) or
+# "signed" (HMAC-signed claims verified without I/O, see session_tokens.py)
+SESSION_TOKEN_MODE = os.environ.get("SESSION_TOKEN_MODE", "opaque")
+SESSION_SIGNING_KEY = os.environ.get("SESSION_SIGNING_KEY", "").encode()
+REVOCATION_SYNC_SECONDS = float(os.environ.get("REVOCATION_SYNC_SECONDS", "5"))
+if SESSION_TOKEN_MODE == "signed" and not SESSION_SIGNING_KEY:
+    logging.error("SESSION_TOKEN_MODE=signed requires SESSION_SIGNING_KEY, using opaque sessions")
+    SESSION_TOKEN_MODE = "opaque"
+
+session_revocations = RevocationFilter()
+
+def issue_signed_session_token(user_doc: dict, expires_at: datetime) -> str:
+    """Sign the claims get_current_user needs to rebuild the User without a lookup"""
+    now = datetime.now(timezone.utc)
+    claims = {
+        "sub": user_doc["_id"],
+        "usr": user_doc.get("username", ""),
+        "eml": user_doc.get("email", ""),
+        "ver": bool(user_doc.get("email_verified", False)),
+        "trial": as_utc(user_doc.get("trial_ends_at", now + timedelta(days=30))).timestamp(),
+        "crt": as_utc(user_doc.get("created_at", now)).timestamp(),
+        "exp": expires_at.timestamp(),
+        "jti": uuid.uuid4().hex
+    }
+    return sign_session_token(claims, SESSION_SIGNING_KEY)
+
+def user_from_claims(claims: dict) -> User:
+    return User(
+        id=claims["sub"],
+        username=claims["usr"],
+        email=claims["eml"],
+        email_verified=claims["ver"],
+        trial_ends_at=datetime.fromtimestamp(claims["trial"], timezone.utc),
+        created_at=datetime.fromtimestamp(claims["crt"], timezone.utc)
+    )
+
 # Authentication Functions
 async def get_session_from_cookie(request: Request) -> Optional[str]:
     """Extract session token from httpOnly cookie"""
@@ -175,22 +292,65 @@ async def get_current_user(request: Request, credentials = Depends(security)) ->
     if not session_token:
         return None
     
-    # Check if session exists and is not expired
-    session_doc = await db.user_sessions.find_one({
-        "session_token": session_token,
-        "expires_at": {"$gt": datetime.now(timezone.utc)}
-    })
+    if SESSION_SIGNING_KEY and is_signed_token(session_token):
+        return await get_user_from_signed_token(session_token)
     
-    if not session_doc:
-        return None
+    cached_user = session_cache.get(session_token)
+    if cached_user is not None:
+        tracer.set_attribute("session_cache", "hit")
+        return cached_user
+    tracer.set_attribute("session_cache", "miss")
     
-    # Get user data
-    user_doc = await db.users.find_one({"_id": session_doc["user_id"]})
-    if not user_doc:
+    # Resolve the unexpired session and its user in a single round trip
+    with tracer.span("mongo.user_sessions.aggregate"):
+        session_docs = await db.user_sessions.aggregate([
+            {"$match": {
+                "session_token": session_token,
+                "expires_at": {"$gt": datetime.now(timezone.utc)}
+            }},
+            {"$limit": 1},
+            {"$lookup": {
+                "from": "users",
+                "localField": "user_id",
+                "foreignField": "_id",
+                "as": "user"
+            }},
+            {"$unwind": "$user"},
+            {"$project": {"_id": 0, "expires_at": 1, "user": 1}}
+        ]).to_list(1)
+    
+    if not session_docs:
         return None
     
+    session_doc = session_docs[0]
+    user_doc = session_doc["user"]
     user_doc["id"] = user_doc.pop("_id")  # Rename _id to id for Pydantic
-    return User(**user_doc)
+    user = User(**user_doc)
+    session_cache.put(session_token, user, session_doc["expires_at"])
+    return user
+
+async def get_user_from_signed_token(session_token: str) -> Optional[User]:
+    """Resolve a signed session token, touching Mongo only for unverified users"""
+    claims = verify_session_token(session_token, SESSION_SIGNING_KEY)
+    if not claims or session_revocations.is_revoked(claims["jti"]):
+        return None
+    
+    if claims["ver"]:
+        tracer.set_attribute("session_cache", "signed")
+        metrics.counter("signed_session_verifications", "Requests authenticated from signed claims with no I/O").inc()
+        return user_from_claims(claims)
+    
+    # verify_email can't update a token already issued, so re-check unverified users
+    cached_user = session_cache.get(session_token)
+    if cached_user is not None:
+        return cached_user
+    user_doc = await db.users.find_one({"_id": claims["sub"]})
+    if not user_doc:
+        return None
+    user_doc["id"] = user_doc.pop("_id")
+    user = User(**user_doc)
+    session_cache.put(session_token, user, datetime.fromtimestamp(claims["exp"], timezone.utc))
+    return user
 
 async def require_auth(user: User = Depends(get_current_user)) -> User:
     """Require authentication for protected endpoints"""
@@ -201,19 +361,25 @@ async def require_auth(user: User = Depends(get_current_user)) -> User:
 # Financial Data Fetchers (same as before)
 async def fetch_currencies():
     """Fetch top currencies including CAD"""
+    with tracer.span("provider.yfinance.currencies") as span:
+        currencies = await _fetch_currencies()
+        span.set_attribute("asset_count", len(currencies))
+        return currencies
+
+CURRENCY_PAIRS = {
+    "CADUSD=X": "Canadian Dollar",
+    "EURUSD=X": "Euro", 
+    "GBPUSD=X": "British Pound",
+    "JPYUSD=X": "Japanese Yen",
+    "AUDUSD=X": "Australian Dollar",
+    "CHFUSD=X": "Swiss Franc",
+    "NZDUSD=X": "New Zealand Dollar"
+}
+
+async def _fetch_currencies():
     try:
-        currency_pairs = {
-            "CADUSD=X": "Canadian Dollar",
-            "EURUSD=X": "Euro", 
-            "GBPUSD=X": "British Pound",
-            "JPYUSD=X": "Japanese Yen",
-            "AUDUSD=X": "Australian Dollar",
-            "CHFUSD=X": "Swiss Franc",
-            "NZDUSD=X": "New Zealand Dollar"
-        }
-        
         currencies = []
-        for symbol, name in currency_pairs.items():
+        for symbol, name in CURRENCY_PAIRS.items():
             try:
                 ticker = yf.Ticker(symbol)
                 hist = ticker.history(period="5d")
@@ -302,6 +468,12 @@ def get_fallback_crypto_data():
 
 async def fetch_crypto():
     """Fetch specific cryptocurrencies from CoinGecko (BTC, ETH, BNB, SOL, XRP, DOT, ADA, DOGE)"""
+    with tracer.span("provider.coingecko.markets") as span:
+        cryptos = await _fetch_crypto(span)
+        span.set_attribute("asset_count", len(cryptos))
+        return cryptos
+
+async def _fetch_crypto(span):
     try:
         # Get specific coins instead of top 7 by market cap
         coin_ids = "bitcoin,ethereum,binancecoin,solana,ripple,polkadot,cardano,dogecoin"
@@ -317,6 +489,7 @@ async def fetch_crypto():
         }
         
         response = requests.get(url, params=params, timeout=10)
+        span.set_attribute("http.status_code", response.status_code)
         if response.status_code == 200:
             data = response.json()
             cryptos = []
@@ -333,26 +506,35 @@ async def fetch_crypto():
             return cryptos
         elif response.status_code == 429:
             logging.warning("CoinGecko API rate limited (429), using fallback data")
+            span.set_attribute("fallback", True)
             return get_fallback_crypto_data()
         else:
             logging.error(f"CoinGecko API error: {response.status_code}, using fallback data")
+            span.set_attribute("fallback", True)
             return get_fallback_crypto_data()
     except Exception as e:
         logging.error(f"Error in fetch_crypto: {e}, using fallback data")
+        span.set_attribute("fallback", True)
         return get_fallback_crypto_data()
 
 async def fetch_metals():
     """Fetch precious metals prices"""
+    with tracer.span("provider.yfinance.metals") as span:
+        metals = await _fetch_metals()
+        span.set_attribute("asset_count", len(metals))
+        return metals
+
+METAL_SYMBOLS = {
+    "GC=F": "Gold",
+    "SI=F": "Silver", 
+    "PL=F": "Platinum",
+    "PA=F": "Palladium"
+}
+
+async def _fetch_metals():
     try:
-        metals_symbols = {
-            "GC=F": "Gold",
-            "SI=F": "Silver", 
-            "PL=F": "Platinum",
-            "PA=F": "Palladium"
-        }
-        
         metals = []
-        for symbol, name in metals_symbols.items():
+        for symbol, name in METAL_SYMBOLS.items():
             try:
                 ticker = yf.Ticker(symbol)
                 hist = ticker.history(period="5d")
@@ -379,6 +561,10 @@ async def fetch_metals():
         return []
 
 # Betty Crystal Functions
+
+# Matches published weekly reports (not in-progress generation claims)
+READY_REPORT = {"status": {"$ne": "pending"}}
+
 async def get_monday_of_week(date: datetime = None) -> datetime:
     """Get Monday of the current or specified week"""
     if date is None:
@@ -389,8 +575,14 @@ async def get_monday_of_week(date: datetime = None) -> datetime:
     monday = date - timedelta(days=days_since_monday)
     return monday.replace(hour=0, minute=0, second=0, microsecond=0)
 
-async def betty_generate_predictions() -> List[BettyPrediction]:
-    """Betty generates her 3 weekly predictions using AI"""
+async def betty_generate_predictions(week_start: datetime = None) -> List[BettyPrediction]:
+    """Betty generates her 3 weekly predictions using AI (for the current week by default)"""
+    with tracer.span("betty.generate_predictions") as span:
+        predictions = await _betty_generate_predictions(week_start)
+        span.set_attribute("prediction_count", len(predictions))
+        return predictions
+
+async def _betty_generate_predictions(week_start: datetime = None) -> List[BettyPrediction]:
     try:
         # Get current market data
         currencies = await fetch_currencies()
@@ -428,7 +620,9 @@ async def betty_generate_predictions() -> List[BettyPrediction]:
             })
         
         # Get Betty's previous accuracy to adjust confidence
-        previous_reports = await db.betty_reports.find().sort("week_start", -1).limit(3).to_list(3)
+        with tracer.span("mongo.betty_reports.find_recent") as span:
+            previous_reports = await db.betty_reports.find(READY_REPORT).sort("week_start", -1).limit(3).to_list(3)
+            span.set_attribute("report_count", len(previous_reports))
         avg_accuracy = 0.7  # Default
         if previous_reports:
             accuracies = [report.get("overall_accuracy", 0.7) for report in previous_reports]
@@ -442,160 +636,248 @@ async def betty_generate_predictions() -> List[BettyPrediction]:
         else:
             difficulty_level = "balanced - moderate risk predictions"
         
-        prompt = f"""You are Betty Crystal, a friendly AI trading mentor. You need to make exactly 3 predictions for this week.
-
-Your current track record: {avg_accuracy:.1%} accuracy
-Recommended approach: {difficulty_level}
-
-Available assets for prediction:
-{json.dumps(all_assets, indent=2)}
-
-Rules:
-1. Pick exactly 3 different assets from the list
-2. Predict direction (up/down) and percentage change for the WEEK
-3. Be realistic - weekly changes are usually 2-15% for crypto, 0.5-5% for currencies/metals
-4. Give confidence level 0.1-1.0 based on your track record
-5. Provide friendly, mentor-like reasoning
-
-Respond in this JSON format:
-{{
-  "predictions": [
-    {{
-      "asset_symbol": "BTC",
-      "asset_name": "Bitcoin",
-      "asset_type": "crypto",
-      "current_price": 121000,
-      "direction": "up",
-      "predicted_change_percent": 5.2,
-      "confidence_level": 0.75,
-      "reasoning": "Betty's friendly explanation..."
-    }}
-  ]
-}}"""
-        
-        # Get AI response
-        chat = LlmChat(
-            api_key=os.environ.get('EMERGENT_LLM_KEY'),
-            session_id=f"betty_predictions_{datetime.now().timestamp()}",
-            system_message="You are Betty Crystal, a friendly and approachable AI trading mentor who makes weekly market predictions."
-        ).with_model("openai", "gpt-4o")
-        
-        user_message = UserMessage(text=prompt)
-        response = await chat.send_message(user_message)
-        
-        # Parse response - handle markdown code blocks
-        try:
-            # Remove markdown code blocks if present
-            response_text = response.strip()
-            if response_text.startswith("```json"):
-                response_text = response_text[7:]  # Remove ```json
-            if response_text.endswith("```"):
-                response_text = response_text[:-3]  # Remove ```
-            response_text = response_text.strip()
-            
-            ai_data = json.loads(response_text)
-            predictions = []
-            
-            week_start = await get_monday_of_week()
-            
-            for pred_data in ai_data["predictions"][:3]:  # Ensure only 3
-                direction = PredictionDirection.UP if pred_data["direction"].lower() == "up" else PredictionDirection.DOWN
-                
-                # Calculate target price
-                current_price = pred_data["current_price"]
-                change_percent = pred_data["predicted_change_percent"]
-                if direction == PredictionDirection.DOWN:
-                    change_percent = -abs(change_percent)
-                
-                target_price = current_price * (1 + change_percent / 100)
-                
-                prediction = BettyPrediction(
-                    week_start=week_start,
-                    asset_symbol=pred_data["asset_symbol"],
-                    asset_name=pred_data["asset_name"],
-                    asset_type=AssetType(pred_data["asset_type"]),
-                    current_price=current_price,
-                    direction=direction,
-                    predicted_change_percent=abs(change_percent),
-                    predicted_target_price=round(target_price, 2),
-                    confidence_level=pred_data["confidence_level"],
-                    reasoning=pred_data["reasoning"]
-                )
-                predictions.append(prediction)
-            
+        week_start = week_start or await get_monday_of_week()
+        
+        # Pick with the local quant model; the LLM only writes the reasoning
+        histories = await fetch_weekly_histories(all_assets)
+        predictions, picks = quant_predictions(all_assets, histories, week_start, avg_accuracy)
+        if predictions:
+            await add_prediction_narratives(predictions, picks, avg_accuracy)
             return predictions
-            
-        except json.JSONDecodeError:
-            logging.error(f"Failed to parse Betty's AI response: {response}")
-            return []
+        
+        logging.warning("Not enough price history for the quant model, asking the LLM to pick")
+        return await llm_pick_predictions(all_assets, avg_accuracy, difficulty_level, week_start)
             
     except Exception as e:
         logging.error(f"Error generating Betty's predictions: {e}")
         return []
 
-async def betty_evaluate_accuracy(prediction: BettyPrediction) -> BettyAccuracy:
-    """Evaluate accuracy of Betty's prediction"""
+QUANT_HISTORY_PERIOD = "3mo"
+BETTY_NARRATIVE_TIMEOUT_SECONDS = float(os.environ.get("BETTY_NARRATIVE_TIMEOUT_SECONDS", "20"))
+
+async def download_daily_closes(tickers: List[str], **range_kwargs) -> pd.DataFrame:
+    """Daily closes for many tickers in one yfinance request (columns are tickers, index is naive dates)"""
+    with tracer.span("provider.yfinance.download", ticker_count=len(tickers)):
+        data = await asyncio.to_thread(
+            yf.download, tickers, interval="1d", progress=False, auto_adjust=True, threads=True, **range_kwargs
+        )
+    closes = data["Close"]
+    if isinstance(closes, pd.Series):
+        closes = closes.to_frame(tickers[0])
+    if closes.index.tz is not None:
+        closes.index = closes.index.tz_localize(None)
+    return closes
+
+async def fetch_weekly_histories(all_assets: List[dict]) -> Dict[str, List[float]]:
+    """Daily closes for every asset in one batched yfinance download, keyed by asset symbol"""
+    tickers = {prediction_ticker_symbol(asset["symbol"], asset["type"]): asset["symbol"] for asset in all_assets}
     try:
-        # Get current price for the asset
-        current_price = 0.0
-        
-        if prediction.asset_type == AssetType.CRYPTO:
-            crypto_data = await fetch_crypto()
-            asset = next((c for c in crypto_data if c.symbol == prediction.asset_symbol), None)
-        elif prediction.asset_type == AssetType.CURRENCY:
-            currency_data = await fetch_currencies()
-            asset = next((c for c in currency_data if prediction.asset_symbol in c.symbol), None)
-        else:  # METAL
-            metals_data = await fetch_metals()
-            asset = next((m for m in metals_data if prediction.asset_symbol in m.symbol), None)
-        
-        if asset:
-            current_price = asset.price
-        else:
-            logging.error(f"Could not find current price for {prediction.asset_symbol}")
-            current_price = prediction.current_price  # Fallback
-        
-        # Calculate actual change
-        actual_change_percent = ((current_price - prediction.current_price) / prediction.current_price) * 100
-        
-        # Check direction accuracy
-        predicted_direction_up = prediction.direction == PredictionDirection.UP
-        actual_direction_up = actual_change_percent > 0
-        was_direction_correct = predicted_direction_up == actual_direction_up
-        
-        # Calculate accuracy score (0.0 to 1.0)
-        # Direction correctness = 50% of score
-        direction_score = 0.5 if was_direction_correct else 0.0
-        
-        # Price accuracy = 50% of score (based on how close the percentage prediction was)
-        predicted_abs_change = prediction.predicted_change_percent
-        actual_abs_change = abs(actual_change_percent)
-        
-        price_diff = abs(predicted_abs_change - actual_abs_change)
-        # Score decreases as difference increases (max error of 20% = 0 score)
-        price_accuracy = max(0.0, (20.0 - price_diff) / 20.0) * 0.5
-        
-        accuracy_score = direction_score + price_accuracy
-        
-        return BettyAccuracy(
-            prediction_id=prediction.id,
-            actual_price=current_price,
-            actual_change_percent=round(actual_change_percent, 2),
-            accuracy_score=round(accuracy_score, 3),
-            was_direction_correct=was_direction_correct,
-            price_difference_percent=round(price_diff, 2)
+        closes = await download_daily_closes(list(tickers), period=QUANT_HISTORY_PERIOD)
+    except Exception as e:
+        logging.error(f"Error downloading price history for the quant model: {e}")
+        return {}
+    
+    return {symbol: closes[ticker].tolist() for ticker, symbol in tickers.items() if ticker in closes}
+
+def quant_reasoning(pick: dict, name: str) -> str:
+    trend = "upward" if pick["momentum"] >= 0 else "downward"
+    stretch = "stretched above" if pick["reversion"] < 0 else "below"
+    return (f"{name} has {trend} momentum ({pick['momentum']:+.2f} on my trend gauge) and is trading {stretch} "
+            f"its 5-day average, with weekly volatility around {pick['weekly_volatility_percent']:.1f}%. "
+            f"I expect it to move {pick['direction']} about {pick['predicted_change_percent']:.1f}% this week.")
+
+def quant_predictions(all_assets: List[dict], histories: Dict[str, List[float]], week_start: datetime,
+                      avg_accuracy: float):
+    """Betty's top 3 from the local quant model, confidence scaled by her recent accuracy.
+
+    Returns (predictions, picks) where picks carry the signals behind each prediction.
+    """
+    symbols, closes = align_closes(histories)
+    if len(symbols) < 3:
+        return [], []
+    
+    with tracer.span("quant.select_predictions", asset_count=len(symbols)):
+        picks = select_predictions(symbols, closes, top_n=3, confidence_scale=min(1.15, max(0.7, avg_accuracy / 0.7)))
+    
+    assets_by_symbol = {asset["symbol"]: asset for asset in all_assets}
+    predictions = []
+    for pick in picks:
+        asset = assets_by_symbol[pick["symbol"]]
+        change_percent = pick["predicted_change_percent"] if pick["direction"] == "up" else -pick["predicted_change_percent"]
+        predictions.append(BettyPrediction(
+            week_start=week_start,
+            asset_symbol=asset["symbol"],
+            asset_name=asset["name"],
+            asset_type=AssetType(asset["type"]),
+            current_price=asset["price"],
+            direction=PredictionDirection(pick["direction"]),
+            predicted_change_percent=pick["predicted_change_percent"],
+            predicted_target_price=round_price(asset["price"] * (1 + change_percent / 100), asset["type"]),
+            confidence_level=pick["confidence_level"],
+            reasoning=quant_reasoning(pick, asset["name"])
+        ))
+        pick.update(name=asset["name"], type=asset["type"], price=asset["price"])
+    return predictions, picks
+
+async def add_prediction_narratives(predictions: List[BettyPrediction], picks: List[dict], avg_accuracy: float):
+    """Replace the template reasoning with Betty's LLM narrative where we get one in time"""
+    try:
+        prompt = build_prediction_narrative_prompt(picks, avg_accuracy)
+        response = await llm_gateway.complete(
+            "betty_narrative",
+            "You are Betty Crystal, a friendly and approachable AI trading mentor who makes weekly market predictions.",
+            prompt,
+            timeout=BETTY_NARRATIVE_TIMEOUT_SECONDS
         )
-        
+        narratives = parse_symbol_map(response)
+    except Exception as e:
+        logging.warning(f"Keeping template reasoning for Betty's predictions: {e}")
+        return
+    
+    for prediction in predictions:
+        narrative = narratives.get(prediction.asset_symbol.upper())
+        if narrative:
+            prediction.reasoning = narrative
+
+async def llm_pick_predictions(all_assets: List[dict], avg_accuracy: float, difficulty_level: str,
+                               week_start: datetime) -> List[BettyPrediction]:
+    """Let the LLM choose the predictions (used when there's no price history for the quant model)"""
+    prompt = build_weekly_predictions_prompt(all_assets, avg_accuracy, difficulty_level)
+    
+    # Get AI response
+    response = await llm_gateway.complete(
+        "betty_predictions",
+        "You are Betty Crystal, a friendly and approachable AI trading mentor who makes weekly market predictions.",
+        prompt
+    )
+    
+    # Parse response - handle markdown code blocks
+    try:
+        # Remove markdown code blocks if present
+        response_text = response.strip()
+        if response_text.startswith("```json"):
+            response_text = response_text[7:]  # Remove ```json
+        if response_text.endswith("```"):
+            response_text = response_text[:-3]  # Remove ```
+        response_text = response_text.strip()
+        
+        ai_data = json.loads(response_text)
+        predictions = []
+        
+        for pred_data in ai_data["predictions"][:3]:  # Ensure only 3
+            direction = PredictionDirection.UP if pred_data["direction"].lower() == "up" else PredictionDirection.DOWN
+            
+            # Calculate target price
+            current_price = pred_data["current_price"]
+            change_percent = pred_data["predicted_change_percent"]
+            if direction == PredictionDirection.DOWN:
+                change_percent = -abs(change_percent)
+            
+            target_price = current_price * (1 + change_percent / 100)
+            
+            prediction = BettyPrediction(
+                week_start=week_start,
+                asset_symbol=pred_data["asset_symbol"],
+                asset_name=pred_data["asset_name"],
+                asset_type=AssetType(pred_data["asset_type"]),
+                current_price=current_price,
+                direction=direction,
+                predicted_change_percent=abs(change_percent),
+                predicted_target_price=round(target_price, 2),
+                confidence_level=pred_data["confidence_level"],
+                reasoning=pred_data["reasoning"]
+            )
+            predictions.append(prediction)
+        
+        return predictions
+        
+    except json.JSONDecodeError:
+        logging.error(f"Failed to parse Betty's AI response: {response}")
+        return []
+
+def prediction_week_end(prediction: BettyPrediction) -> datetime:
+    return as_utc(prediction.week_start) + timedelta(days=7)
+
+async def fetch_week_end_closes(predictions: List[BettyPrediction]) -> List[Optional[float]]:
+    """Each prediction's last close before its week ended, from one range download covering every week.
+
+    None where the source has no close inside the prediction's week.
+    """
+    if not predictions:
+        return []
+    tickers = [prediction_ticker_symbol(p.asset_symbol, p.asset_type.value) for p in predictions]
+    start = min(as_utc(p.week_start) for p in predictions)
+    end = max(prediction_week_end(p) for p in predictions)
+    try:
+        closes = await download_daily_closes(sorted(set(tickers)), start=start.date(), end=(end + timedelta(days=1)).date())
     except Exception as e:
-        logging.error(f"Error evaluating prediction accuracy: {e}")
-        return BettyAccuracy(
+        logging.error(f"Error downloading week-end closes: {e}")
+        return [None] * len(predictions)
+    
+    final_prices = []
+    for prediction, ticker in zip(predictions, tickers):
+        if ticker not in closes:
+            final_prices.append(None)
+            continue
+        series = closes[ticker].dropna()
+        week = series[(series.index >= pd.Timestamp(as_utc(prediction.week_start).date())) &
+                      (series.index < pd.Timestamp(prediction_week_end(prediction).date()))]
+        final_prices.append(float(week.iloc[-1]) if len(week) else None)
+    return final_prices
+
+async def betty_evaluate_predictions(predictions: List[BettyPrediction],
+                                     final_prices: List[Optional[float]]) -> List[BettyAccuracy]:
+    """Score predictions against their week-end closes in a single vectorized pass.
+
+    Predictions whose close is None are skipped (left pending) rather than
+    scored against a live price, so evaluation stays point-in-time and can be re-run.
+    """
+    for prediction, price in zip(predictions, final_prices):
+        if price is None:
+            logging.warning(f"No week-end close for {prediction.asset_symbol} "
+                            f"(week of {as_utc(prediction.week_start).date()}), leaving it pending")
+    scored = [(prediction, price) for prediction, price in zip(predictions, final_prices) if price is not None]
+    if not scored:
+        return []
+    predictions, final_prices = zip(*scored)
+    
+    scores = score_accuracy(
+        [prediction.current_price for prediction in predictions],
+        final_prices,
+        [prediction.predicted_change_percent for prediction in predictions],
+        [prediction.direction == PredictionDirection.UP for prediction in predictions]
+    )
+    return [
+        BettyAccuracy(
             prediction_id=prediction.id,
-            actual_price=prediction.current_price,
-            actual_change_percent=0.0,
-            accuracy_score=0.0,
-            was_direction_correct=False,
-            price_difference_percent=0.0
+            actual_price=final_prices[i],
+            actual_change_percent=round(float(scores["actual_change_percent"][i]), 2),
+            accuracy_score=round(float(scores["accuracy_score"][i]), 3),
+            was_direction_correct=bool(scores["was_direction_correct"][i]),
+            price_difference_percent=round(float(scores["price_difference_percent"][i]), 2)
         )
+        for i, prediction in enumerate(predictions)
+    ]
+
+async def save_evaluation(accuracy_scores: List[BettyAccuracy]):
+    """Record scores in betty_accuracy, results on the predictions and the stats deltas, in one transaction (safe to re-run)"""
+    evaluated_at = datetime.now(timezone.utc)
+    await record_evaluations(
+        client, db,
+        results={
+            accuracy.prediction_id: {
+                "final_price": accuracy.actual_price,
+                "actual_change_percent": accuracy.actual_change_percent,
+                "was_correct": accuracy.was_direction_correct,
+                "evaluated_at": evaluated_at
+            }
+            for accuracy in accuracy_scores
+        },
+        accuracy_writes=[
+            ReplaceOne({"prediction_id": accuracy.prediction_id}, accuracy.dict(), upsert=True)
+            for accuracy in accuracy_scores
+        ]
+    )
 
 # Helper function to check if cache is expired
 def is_cache_expired(last_updated):
@@ -622,9 +904,8 @@ async def register_user(register_request: RegisterRequest):
         if existing_user:
             raise HTTPException(status_code=400, detail="Username or email already exists")
         
-        # Hash password (in production, use proper password hashing)
-        import hashlib
-        password_hash = hashlib.sha256(password.encode()).hexdigest()
+        # Hash password with scrypt in the password worker pool
+        password_hash = await password_hasher.hash(password)
         
         # Create user with 30-day trial and email verification
         user_id = str(uuid.uuid4())
@@ -665,6 +946,8 @@ async def register_user(register_request: RegisterRequest):
         
     except HTTPException:
         raise
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Server busy, please try again", headers={"Retry-After": "1"})
     except Exception as e:
         logging.error(f"Error registering user: {e}")
         raise HTTPException(status_code=500, detail="Failed to create account")
@@ -686,7 +969,7 @@ async def verify_email(verification_token: str):
         if isinstance(expires_at, str):
             expires_at = datetime.fromisoformat(expires_at.replace('Z', '+00:00'))
         
-        if datetime.now(timezone.utc) > expires_at:
+        if datetime.now(timezone.utc) > as_utc(expires_at):
             raise HTTPException(status_code=400, detail="Verification token expired")
         
         # Check if already verified
@@ -704,6 +987,7 @@ async def verify_email(verification_token: str):
             {"_id": verification_doc["user_id"]},
             {"$set": {"email_verified": True}}
         )
+        session_cache.invalidate_user(verification_doc["user_id"])
         
         return {"message": "Email successfully verified! You can now access all features."}
         
@@ -724,28 +1008,35 @@ async def login_user(login_request: LoginRequest, response: Response):
         username = login_request.username
         password = login_request.password
         
-        # Hash password for comparison
-        import hashlib
-        password_hash = hashlib.sha256(password.encode()).hexdigest()
-        
-        # Find user
-        user_doc = await db.users.find_one({
-            "username": username,
-            "password_hash": password_hash
-        })
+        # Find user by (indexed) username, then verify the password off the event loop
+        user_doc = await db.users.find_one({"username": username})
+        if not user_doc or not user_doc.get("password_hash"):
+            raise HTTPException(status_code=401, detail="Invalid credentials")
         
-        if not user_doc:
+        password_ok, needs_rehash = await password_hasher.verify(password, user_doc["password_hash"])
+        if not password_ok:
             raise HTTPException(status_code=401, detail="Invalid credentials")
         
+        # Transparently upgrade legacy SHA-256 hashes
+        if needs_rehash:
+            await db.users.update_one(
+                {"_id": user_doc["_id"]},
+                {"$set": {"password_hash": await password_hasher.hash(password)}}
+            )
+        
         # Create session
-        session_token = str(uuid.uuid4())
-        session_doc = {
-            "user_id": user_doc["_id"],
-            "session_token": session_token,
-            "expires_at": datetime.now(timezone.utc) + timedelta(days=7),
-            "created_at": datetime.now(timezone.utc)
-        }
-        await db.user_sessions.insert_one(session_doc)
+        expires_at = datetime.now(timezone.utc) + timedelta(days=7)
+        if SESSION_TOKEN_MODE == "signed":
+            session_token = issue_signed_session_token(user_doc, expires_at)
+        else:
+            session_token = str(uuid.uuid4())
+            session_doc = {
+                "user_id": user_doc["_id"],
+                "session_token": session_token,
+                "expires_at": expires_at,
+                "created_at": datetime.now(timezone.utc)
+            }
+            await db.user_sessions.insert_one(session_doc)
         
         # Set httpOnly cookie
         response.set_cookie(
@@ -771,6 +1062,8 @@ async def login_user(login_request: LoginRequest, response: Response):
         
     except HTTPException:
         raise
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Server busy, please try again", headers={"Retry-After": "1"})
     except Exception as e:
         logging.error(f"Error logging in: {e}")
         raise HTTPException(status_code=500, detail="Login failed")
@@ -789,26 +1082,22 @@ async def create_session(session_data: dict, response: Response):
         if not all([user_id, email, name, session_token]):
             raise HTTPException(status_code=400, detail="Missing required fields")
         
-        # Check if user exists, if not create
-        existing_user = await db.users.find_one({"_id": user_id})
-        if not existing_user:
-            user_doc = {
-                "_id": user_id,
-                "email": email,
-                "name": name,
-                "picture": picture,
-                "created_at": datetime.now(timezone.utc)
-            }
-            await db.users.insert_one(user_doc)
-        
-        # Create session
-        session_doc = {
-            "user_id": user_id,
-            "session_token": session_token,
-            "expires_at": datetime.now(timezone.utc) + timedelta(days=7),
-            "created_at": datetime.now(timezone.utc)
-        }
-        await db.user_sessions.insert_one(session_doc)
+        now = datetime.now(timezone.utc)
+        try:
+            # Returning users keep their record; only new ones are created
+            await db.users.update_one(
+                {"_id": user_id},
+                {"$setOnInsert": {"email": email, "name": name, "picture": picture, "created_at": now}},
+                upsert=True
+            )
+            # Re-posting a session refreshes it; a token owned by another user hits the unique index
+            await db.user_sessions.update_one(
+                {"session_token": session_token, "user_id": user_id},
+                {"$set": {"expires_at": now + timedelta(days=7)}, "$setOnInsert": {"created_at": now}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            raise HTTPException(status_code=409, detail="Email or session already belongs to another account")
         
         # Set httpOnly cookie
         response.set_cookie(
@@ -823,6 +1112,8 @@ async def create_session(session_data: dict, response: Response):
         
         return {"message": "Session created successfully"}
         
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error creating session: {e}")
         raise HTTPException(status_code=500, detail="Failed to create session")
@@ -838,8 +1129,14 @@ async def get_current_user_info(user: User = Depends(get_current_user)):
 async def logout(request: Request, response: Response):
     """Logout user"""
     session_token = await get_session_from_cookie(request)
-    if session_token:
+    if session_token and SESSION_SIGNING_KEY and is_signed_token(session_token):
+        claims = verify_session_token(session_token, SESSION_SIGNING_KEY)
+        if claims:
+            await session_revocations.revoke(db.revoked_sessions, claims["jti"], claims["exp"])
+        session_cache.invalidate_token(session_token)
+    elif session_token:
         await db.user_sessions.delete_one({"session_token": session_token})
+        session_cache.invalidate_token(session_token)
     
     response.delete_cookie("session_token", path="/")
     return {"message": "Logged out successfully"}
@@ -892,6 +1189,7 @@ async def get_currencies():
     cache_key = "currencies"
     
     if is_cache_expired(data_cache[cache_key]["last_updated"]):
+        tracer.set_attribute("cache", "miss")
         currencies = await fetch_currencies()
         data_cache[cache_key] = {
             "data": currencies,
@@ -899,6 +1197,7 @@ async def get_currencies():
         }
         return currencies
     
+    tracer.set_attribute("cache", "hit")
     return data_cache[cache_key]["data"]
 
 @api_router.get("/crypto", response_model=List[AssetPrice])
@@ -907,6 +1206,7 @@ async def get_crypto():
     cache_key = "crypto"
     
     if is_cache_expired(data_cache[cache_key]["last_updated"]):
+        tracer.set_attribute("cache", "miss")
         crypto = await fetch_crypto()
         data_cache[cache_key] = {
             "data": crypto,
@@ -914,6 +1214,7 @@ async def get_crypto():
         }
         return crypto
     
+    tracer.set_attribute("cache", "hit")
     return data_cache[cache_key]["data"]
 
 @api_router.get("/metals", response_model=List[AssetPrice])
@@ -922,6 +1223,7 @@ async def get_metals():
     cache_key = "metals"
     
     if is_cache_expired(data_cache[cache_key]["last_updated"]):
+        tracer.set_attribute("cache", "miss")
         metals = await fetch_metals()
         data_cache[cache_key] = {
             "data": metals,
@@ -929,293 +1231,135 @@ async def get_metals():
         }
         return metals
     
+    tracer.set_attribute("cache", "hit")
     return data_cache[cache_key]["data"]
 
-# Initialize Betty's Historical Data
-async def initialize_betty_history():
-    """Create Betty's historical performance data if it doesn't exist"""
-    try:
-        # Check if we already have historical data
-        existing_predictions = await db.betty_predictions.find().to_list(1)
-        if existing_predictions:
-            return  # Already have data
-        
-        current_monday = await get_monday_of_week()
-        
-        # Create Week 1 (2 weeks ago) - 3/3 correct predictions
-        week1_monday = current_monday - timedelta(days=14)
-        week1_predictions = [
-            {
-                "id": str(uuid.uuid4()),
-                "week_start": week1_monday,
-                "asset_symbol": "BTC",
-                "asset_name": "Bitcoin",
-                "asset_type": "crypto",
-                "current_price": 118500.0,
-                "direction": "up",
-                "predicted_change_percent": 3.2,
-                "predicted_target_price": 122300.0,
-                "confidence_level": 0.78,
-                "reasoning": "Strong institutional adoption and ETF inflows creating upward pressure.",
-                "created_at": week1_monday,
-                # Results - CORRECT
-                "final_price": 123150.0,
-                "actual_change_percent": 3.92,
-                "was_correct": True,
-                "evaluated_at": week1_monday + timedelta(days=7)
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "week_start": week1_monday,
-                "asset_symbol": "CADUSD=X",
-                "asset_name": "Canadian Dollar",
-                "asset_type": "currency",
-                "current_price": 0.7245,
-                "direction": "down",
-                "predicted_change_percent": 1.8,
-                "predicted_target_price": 0.7115,
-                "confidence_level": 0.72,
-                "reasoning": "Bank of Canada's dovish stance and weakening oil prices pressuring CAD.",
-                "created_at": week1_monday,
-                # Results - CORRECT
-                "final_price": 0.7098,
-                "actual_change_percent": -2.03,
-                "was_correct": True,
-                "evaluated_at": week1_monday + timedelta(days=7)
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "week_start": week1_monday,
-                "asset_symbol": "GC=F",
-                "asset_name": "Gold",
-                "asset_type": "metal",
-                "current_price": 3720.0,
-                "direction": "up",
-                "predicted_change_percent": 2.1,
-                "predicted_target_price": 3798.0,
-                "confidence_level": 0.85,
-                "reasoning": "Geopolitical tensions and inflation concerns driving safe-haven demand.",
-                "created_at": week1_monday,
-                # Results - CORRECT
-                "final_price": 3812.0,
-                "actual_change_percent": 2.47,
-                "was_correct": True,
-                "evaluated_at": week1_monday + timedelta(days=7)
-            }
-        ]
-        
-        # Create Week 2 (1 week ago) - 2/3 correct predictions
-        week2_monday = current_monday - timedelta(days=7)
-        week2_predictions = [
-            {
-                "id": str(uuid.uuid4()),
-                "week_start": week2_monday,
-                "asset_symbol": "ETH",
-                "asset_name": "Ethereum",
-                "asset_type": "crypto",
-                "current_price": 4280.0,
-                "direction": "up",
-                "predicted_change_percent": 4.5,
-                "predicted_target_price": 4472.0,
-                "confidence_level": 0.68,
-                "reasoning": "Ethereum upgrade and DeFi growth creating bullish sentiment.",
-                "created_at": week2_monday,
-                # Results - CORRECT
-                "final_price": 4465.0,
-                "actual_change_percent": 4.32,
-                "was_correct": True,
-                "evaluated_at": week2_monday + timedelta(days=7)
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "week_start": week2_monday,
-                "asset_symbol": "XRP",
-                "asset_name": "XRP",
-                "asset_type": "crypto",
-                "current_price": 3.15,
-                "direction": "down",
-                "predicted_change_percent": 2.8,
-                "predicted_target_price": 3.06,
-                "confidence_level": 0.61,
-                "reasoning": "SEC regulatory concerns and market uncertainty affecting XRP price.",
-                "created_at": week2_monday,
-                # Results - WRONG (went up instead of down)
-                "final_price": 3.28,
-                "actual_change_percent": 4.13,
-                "was_correct": False,
-                "evaluated_at": week2_monday + timedelta(days=7)
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "week_start": week2_monday,
-                "asset_symbol": "SI=F",
-                "asset_name": "Silver",
-                "asset_type": "metal",
-                "current_price": 45.2,
-                "direction": "up",
-                "predicted_change_percent": 3.1,
-                "predicted_target_price": 46.6,
-                "confidence_level": 0.74,
-                "reasoning": "Industrial demand and precious metals rotation supporting silver.",
-                "created_at": week2_monday,
-                # Results - CORRECT
-                "final_price": 47.1,
-                "actual_change_percent": 4.20,
-                "was_correct": True,
-                "evaluated_at": week2_monday + timedelta(days=7)
-            }
-        ]
-        
-        # Week 3 (This Week) - New Sunday Picks! 🔮
-        week3_monday = current_monday
-        week3_predictions = [
-            {
-                "id": str(uuid.uuid4()),
-                "week_start": week3_monday,
-                "asset_symbol": "BTC",
-                "asset_name": "Bitcoin",
-                "asset_type": "crypto",
-                "current_price": 125334.0,
-                "direction": "up",
-                "predicted_change_percent": 4.2,
-                "predicted_target_price": 130600.0,
-                "confidence_level": 0.82,
-                "reasoning": "Bitcoin's Sunday surge momentum + institutional buying pressure suggests strong weekly breakout above $130K resistance.",
-                "created_at": week3_monday,
-                # No results yet - predictions for this week
-                "final_price": None,
-                "actual_change_percent": None,
-                "was_correct": None,
-                "evaluated_at": None
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "week_start": week3_monday,
-                "asset_symbol": "EURJPY=X",
-                "asset_name": "EUR/JPY",
-                "asset_type": "currency",
-                "current_price": 162.45,
-                "direction": "down",
-                "predicted_change_percent": 2.1,
-                "predicted_target_price": 159.04,
-                "confidence_level": 0.76,
-                "reasoning": "BOJ intervention signals + European economic uncertainty create perfect storm for EUR/JPY weekly decline.",
-                "created_at": week3_monday,
-                # No results yet
-                "final_price": None,
-                "actual_change_percent": None,
-                "was_correct": None,
-                "evaluated_at": None
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "week_start": week3_monday,
-                "asset_symbol": "PL=F",
-                "asset_name": "Platinum",
-                "asset_type": "metal",
-                "current_price": 967.8,
-                "direction": "up",
-                "predicted_change_percent": 3.8,
-                "predicted_target_price": 1004.6,
-                "confidence_level": 0.71,
-                "reasoning": "Industrial demand surge + supply constraints in South Africa = platinum breakthrough week above $1000.",
-                "created_at": week3_monday,
-                # No results yet
-                "final_price": None,
-                "actual_change_percent": None,
-                "was_correct": None,
-                "evaluated_at": None
+# Prediction fields returned by /betty/history
+HISTORY_PREDICTION_FIELDS = [
+    "id", "asset_symbol", "asset_name", "asset_type", "current_price", "direction", "predicted_change_percent",
+    "predicted_target_price", "confidence_level", "reasoning", "final_price", "actual_change_percent", "was_correct"
+]
+HISTORY_DEFAULT_WEEKS = 12
+HISTORY_MAX_WEEKS = 104
+
+def percent_of(part, whole) -> dict:
+    """Aggregation expression for part/whole as a percentage rounded to 1 decimal"""
+    return {"$round": [{"$multiply": [{"$divide": [part, whole]}, 100]}, 1]}
+
+def betty_history_pipeline(first_week: datetime, last_week: datetime, prior_correct: int = 0,
+                           prior_total: int = 0) -> List[dict]:
+    """Weekly buckets of evaluated predictions between two weeks, newest week first.
+    
+    Running accuracy starts from prior_correct/prior_total, the counts for weeks before first_week.
+    """
+    return [
+        {"$match": {"was_correct": {"$ne": None}, "week_start": {"$gte": first_week, "$lt": last_week + timedelta(days=7)}}},
+        {"$sort": {"week_start": 1}},
+        {"$project": {"_id": 0, "week_start": 1, **{field: 1 for field in HISTORY_PREDICTION_FIELDS}}},
+        {"$group": {
+            "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$week_start"}},
+            "predictions": {"$push": "$$ROOT"},
+            "correct_count": {"$sum": {"$cond": ["$was_correct", 1, 0]}},
+            "total_count": {"$sum": 1}
+        }},
+        {"$setWindowFields": {
+            "sortBy": {"_id": 1},
+            "output": {
+                "cumulative_correct": {"$sum": "$correct_count", "window": {"documents": ["unbounded", "current"]}},
+                "cumulative_total": {"$sum": "$total_count", "window": {"documents": ["unbounded", "current"]}}
             }
-        ]
-        
-        # Insert historical predictions + new weekly picks
-        all_predictions = week1_predictions + week2_predictions + week3_predictions
-        
-        # Convert datetime objects to strings for MongoDB
-        for pred in all_predictions:
-            if isinstance(pred.get('week_start'), datetime):
-                pred['week_start'] = pred['week_start'].isoformat()
-            if isinstance(pred.get('created_at'), datetime):
-                pred['created_at'] = pred['created_at'].isoformat()
-            if isinstance(pred.get('evaluated_at'), datetime):
-                pred['evaluated_at'] = pred['evaluated_at'].isoformat()
-        
-        await db.betty_predictions.insert_many(all_predictions)
-        
-        logging.info("Betty's history initialized: Week 1 (3/3), Week 2 (2/3), Week 3 (NEW Sunday picks!)")
-        
-    except Exception as e:
-        logging.error(f"Error initializing Betty's history: {e}")
+        }},
+        {"$sort": {"_id": -1}},
+        {"$project": {
+            "_id": 0,
+            "week_start": "$_id",
+            "predictions": 1,
+            "correct_count": 1,
+            "total_count": 1,
+            "week_accuracy": percent_of("$correct_count", "$total_count"),
+            "cumulative_accuracy": percent_of(
+                {"$add": ["$cumulative_correct", prior_correct]}, {"$add": ["$cumulative_total", prior_total]}
+            )
+        }}
+    ]
+
+def history_week_param(value: Optional[str], name: str) -> Optional[str]:
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value).strftime("%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be an ISO date")
 
 @api_router.get("/betty/history")
-async def get_betty_history():
-    """Get Betty's historical performance and accuracy"""
+async def get_betty_history(
+    limit: int = HISTORY_DEFAULT_WEEKS,
+    before_week: Optional[str] = None,
+    from_week: Optional[str] = Query(None, alias="from"),
+    to_week: Optional[str] = Query(None, alias="to"),
+    summary_only: bool = False
+):
+    """Get Betty's historical performance and accuracy, newest week first.
+    
+    Returns up to limit weeks within from/to (inclusive week starts); pass next_before_week
+    back as before_week for the next (older) page. summary_only leaves out the predictions.
+    """
+    if not 1 <= limit <= HISTORY_MAX_WEEKS:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {HISTORY_MAX_WEEKS}")
+    before_week = history_week_param(before_week, "before_week")
+    from_week = history_week_param(from_week, "from")
+    to_week = history_week_param(to_week, "to")
+    
     try:
-        # Get all evaluated predictions
-        predictions = await db.betty_predictions.find(
-            {"was_correct": {"$ne": None}}
-        ).sort("week_start", -1).to_list(None)
-        
-        if not predictions:
-            # Initialize history if none exists
-            await initialize_betty_history()
-            predictions = await db.betty_predictions.find(
-                {"was_correct": {"$ne": None}}
-            ).sort("week_start", -1).to_list(None)
-        
-        # Calculate weekly and cumulative accuracy
-        weeks = {}
-        for pred in predictions:
-            week_key = pred["week_start"].strftime("%Y-%m-%d")
-            if week_key not in weeks:
-                weeks[week_key] = {
-                    "week_start": pred["week_start"],
-                    "predictions": [],
-                    "correct_count": 0,
-                    "total_count": 0
-                }
-            
-            weeks[week_key]["predictions"].append(pred)
-            weeks[week_key]["total_count"] += 1
-            if pred["was_correct"]:
-                weeks[week_key]["correct_count"] += 1
-        
-        # Calculate accuracy for each week
-        weekly_results = []
-        total_correct = 0
-        total_predictions = 0
-        
-        for week_key in sorted(weeks.keys()):
-            week_data = weeks[week_key]
-            week_accuracy = (week_data["correct_count"] / week_data["total_count"]) * 100
-            
-            total_correct += week_data["correct_count"]
-            total_predictions += week_data["total_count"]
-            cumulative_accuracy = (total_correct / total_predictions) * 100
-            
-            # Clean predictions for JSON serialization
-            clean_predictions = []
-            for pred in week_data["predictions"]:
-                clean_pred = {k: v for k, v in pred.items() if k != "_id"}
-                # Convert datetime to ISO string
-                if "week_start" in clean_pred and hasattr(clean_pred["week_start"], "isoformat"):
-                    clean_pred["week_start"] = clean_pred["week_start"].isoformat()
-                clean_predictions.append(clean_pred)
-            
-            weekly_results.append({
-                "week_start": week_data["week_start"].strftime("%Y-%m-%d"),
-                "predictions": clean_predictions,
-                "correct_count": week_data["correct_count"],
-                "total_count": week_data["total_count"],
-                "week_accuracy": round(week_accuracy, 1),
-                "cumulative_accuracy": round(cumulative_accuracy, 1)
-            })
+        # Totals and per-week counts come from the materialized stats; only the page's predictions are read
+        stats = await get_weekly_stats(db)
+        
+        evaluated_weeks = sorted(key for key, week in stats["weeks"].items() if week["evaluated"])
+        in_range = [
+            key for key in evaluated_weeks
+            if (from_week is None or key >= from_week) and (to_week is None or key <= to_week)
+            and (before_week is None or key < before_week)
+        ]
+        page = in_range[-limit:][::-1]
+        has_more = len(in_range) > len(page)
+        
+        prior_correct = prior_total = 0
+        for key in evaluated_weeks:
+            if page and key < page[-1]:
+                prior_correct += stats["weeks"][key]["correct"]
+                prior_total += stats["weeks"][key]["evaluated"]
+        
+        if not page:
+            weekly_results = []
+        elif summary_only:
+            weekly_results, running_correct, running_total = [], prior_correct, prior_total
+            for key in reversed(page):
+                week = stats["weeks"][key]
+                running_correct += week["correct"]
+                running_total += week["evaluated"]
+                weekly_results.append({
+                    "week_start": key,
+                    "correct_count": week["correct"],
+                    "total_count": week["evaluated"],
+                    "week_accuracy": round(week["correct"] / week["evaluated"] * 100, 1),
+                    "cumulative_accuracy": round(running_correct / running_total * 100, 1)
+                })
+            weekly_results.reverse()
+        else:
+            first_week, last_week = (datetime.fromisoformat(key).replace(tzinfo=timezone.utc) for key in (page[-1], page[0]))
+            with tracer.span("mongo.betty_predictions.history_aggregate", weeks=len(page)):
+                weekly_results = await db.betty_predictions.aggregate(
+                    betty_history_pipeline(first_week, last_week, prior_correct, prior_total)
+                ).to_list(None)
         
+        total_predictions, total_correct = stats["evaluated"], stats["correct"]
         return {
             "total_predictions": total_predictions,
             "total_correct": total_correct,
             "overall_accuracy": round((total_correct / total_predictions) * 100, 1) if total_predictions > 0 else 0,
-            "weekly_results": weekly_results
+            "weekly_results": weekly_results,
+            "total_weeks": len(evaluated_weeks),  # numbers weeks from the oldest: the newest is week total_weeks
+            "next_before_week": page[-1] if has_more else None
         }
         
     except Exception as e:
@@ -1229,24 +1373,11 @@ async def get_betty_current_week():
     try:
         current_monday = await get_monday_of_week()
         
-        # Initialize Betty's history if it doesn't exist
-        await initialize_betty_history()
-        
-        # Simple accuracy calculation without complex serialization
-        total_predictions = await db.betty_predictions.count_documents({
-            "was_correct": {"$ne": None}
-        })
-        
-        correct_predictions = await db.betty_predictions.count_documents({
-            "was_correct": True
-        })
-        
-        overall_accuracy = round((correct_predictions / total_predictions) * 100, 1) if total_predictions > 0 else 0
-        
-        # Get current week's report (for checking if exists)
-        current_count = await db.betty_predictions.count_documents({
-            "week_start": current_monday
-        })
+        # One read of the materialized counters (kept up to date by every insert and evaluation)
+        stats = await get_stats(db, current_monday)
+        total_predictions = stats["evaluated"]
+        overall_accuracy = round((stats["correct"] / total_predictions) * 100, 1) if total_predictions > 0 else 0
+        current_count = stats["week"]["predictions"]
         
         return {
             "current_week_start": current_monday.isoformat(),
@@ -1260,6 +1391,125 @@ async def get_betty_current_week():
         logging.error(f"Error getting Betty's current week: {e}")
         raise HTTPException(status_code=500, detail="Failed to get Betty's status")
 
+# Weekly report generation (scheduled ahead of time, single-flight per week).
+# Reports are created through an upserted "pending" claim document on the
+# unique week_start index; only the claim holder generates and publishes.
+BETTY_PREGENERATE_HOUR = int(os.environ.get("BETTY_PREGENERATE_HOUR", "22"))  # Sunday, UTC
+BETTY_PREGENERATE_RETRIES = int(os.environ.get("BETTY_PREGENERATE_RETRIES", "5"))
+BETTY_PREGENERATE_RETRY_SECONDS = float(os.environ.get("BETTY_PREGENERATE_RETRY_SECONDS", "60"))
+
+REPORT_CLAIM_TIMEOUT_SECONDS = 300  # a pending claim older than this is assumed abandoned
+REPORT_WAIT_SECONDS = 120  # how long a losing caller waits for the winner's report
+
+_report_locks: Dict[str, asyncio.Lock] = {}
+_report_lock_users: Dict[str, int] = {}  # callers holding or waiting on each week's lock
+
+async def claim_weekly_report(week_start: datetime) -> Optional[str]:
+    """Atomically claim the right to generate a week's report; returns the claim id if we won"""
+    claim_id = str(uuid.uuid4())
+    now = datetime.now(timezone.utc)
+    try:
+        result = await db.betty_reports.update_one(
+            {"week_start": week_start},
+            {"$setOnInsert": {"week_start": week_start, "status": "pending", "claim_id": claim_id, "claimed_at": now}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        return None  # another worker's upsert won the race
+    if result.upserted_id is not None:
+        return claim_id
+    
+    # Take over a claim left behind by a generator that crashed
+    stale_claim = await db.betty_reports.find_one_and_update(
+        {"week_start": week_start, "status": "pending",
+         "claimed_at": {"$lt": now - timedelta(seconds=REPORT_CLAIM_TIMEOUT_SECONDS)}},
+        {"$set": {"claim_id": claim_id, "claimed_at": now}}
+    )
+    return claim_id if stale_claim else None
+
+async def wait_for_weekly_report(week_start: datetime) -> Optional[dict]:
+    """Poll for the report another worker is generating"""
+    deadline = time.monotonic() + REPORT_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        report = await db.betty_reports.find_one({"week_start": week_start, **READY_REPORT}, {"_id": 0})
+        if report:
+            return report
+        if not await db.betty_reports.find_one({"week_start": week_start}, {"_id": 1}):
+            return None  # the winner gave up and released its claim
+        await asyncio.sleep(1)
+    return None
+
+async def ensure_weekly_report(week_start: datetime) -> Optional[dict]:
+    """Return the week's report, generating it if needed; concurrent callers share one generation"""
+    week_key = week_start.strftime("%Y-%m-%d")
+    lock = _report_locks.setdefault(week_key, asyncio.Lock())
+    _report_lock_users[week_key] = _report_lock_users.get(week_key, 0) + 1
+    try:
+        async with lock:
+            existing_report = await db.betty_reports.find_one({"week_start": week_start, **READY_REPORT}, {"_id": 0})
+            if existing_report:
+                return existing_report
+            
+            claim_id = await claim_weekly_report(week_start)
+            if claim_id is None:
+                return await wait_for_weekly_report(week_start)
+            
+            predictions = await betty_generate_predictions(week_start)
+            if not predictions:
+                await db.betty_reports.delete_one({"week_start": week_start, "claim_id": claim_id, "status": "pending"})
+                return None
+            
+            # Save predictions first, so a published report always has its predictions stored
+            prediction_docs = [pred.dict() for pred in predictions]
+            await insert_predictions(client, db, prediction_docs)
+            
+            # Publish the report only if our claim is still the current one
+            report = BettyWeeklyReport(
+                week_start=week_start,
+                predictions=predictions
+            ).dict()
+            try:
+                result = await db.betty_reports.update_one(
+                    {"week_start": week_start, "claim_id": claim_id, "status": "pending"},
+                    {"$set": {**report, "status": "ready"}, "$unset": {"claim_id": "", "claimed_at": ""}}
+                )
+            except Exception:
+                await delete_predictions(client, db, [doc["id"] for doc in prediction_docs])
+                raise
+            if result.matched_count == 0:
+                # Our claim was taken over while we generated; the new claimant inserts its own predictions
+                await delete_predictions(client, db, [doc["id"] for doc in prediction_docs])
+                return await wait_for_weekly_report(week_start)
+            report["status"] = "ready"
+            return report
+    finally:
+        # Drop the week's lock once nobody holds or waits on it, whichever way we left
+        _report_lock_users[week_key] -= 1
+        if not _report_lock_users[week_key]:
+            del _report_lock_users[week_key]
+            _report_locks.pop(week_key, None)
+
+async def pregenerate_weekly_predictions(next_week: bool = True):
+    """Scheduled job: generate the coming week's predictions, retrying with backoff"""
+    week_start = await get_monday_of_week()
+    if next_week:
+        week_start += timedelta(days=7)
+    
+    for attempt in range(1, BETTY_PREGENERATE_RETRIES + 1):
+        try:
+            if await ensure_weekly_report(week_start):
+                logging.info(f"Betty's predictions ready for week of {week_start.date()}")
+                return
+            logging.warning(f"Betty's prediction generation returned nothing (attempt {attempt})")
+        except Exception as e:
+            logging.error(f"Error pre-generating Betty's predictions (attempt {attempt}): {e}")
+        if attempt < BETTY_PREGENERATE_RETRIES:
+            await asyncio.sleep(BETTY_PREGENERATE_RETRY_SECONDS * 2 ** (attempt - 1))
+    
+    logging.error(f"Giving up pre-generating Betty's predictions for week of {week_start.date()}")
+
+scheduler = AsyncIOScheduler(timezone=timezone.utc)
+
 # Premium authentication removed - using trial-based access instead
 
 @api_router.get("/betty/predictions", dependencies=[Depends(require_verified_user)])
@@ -1269,7 +1519,9 @@ async def get_betty_predictions(user: User = Depends(require_verified_user)):
         current_monday = await get_monday_of_week()
         
         # Check if predictions exist for this week
-        existing_report = await db.betty_reports.find_one({"week_start": current_monday})
+        with tracer.span("mongo.betty_reports.find_one") as span:
+            existing_report = await db.betty_reports.find_one({"week_start": current_monday, **READY_REPORT})
+            span.set_attribute("cache", "hit" if existing_report else "miss")
         
         if existing_report:
             # Remove MongoDB ObjectId for JSON serialization
@@ -1277,73 +1529,226 @@ async def get_betty_predictions(user: User = Depends(require_verified_user)):
                 del existing_report["_id"]
             return existing_report
         
-        # Generate new predictions
-        predictions = await betty_generate_predictions()
-        if not predictions:
+        # Safety net: the scheduler normally generates the week ahead of time
+        logging.warning(f"No pre-generated predictions for week of {current_monday.date()}, generating now")
+        report = await ensure_weekly_report(current_monday)
+        if not report:
             raise HTTPException(status_code=500, detail="Failed to generate predictions")
         
-        # Save predictions to database
-        prediction_docs = [pred.dict() for pred in predictions]
-        await db.betty_predictions.insert_many(prediction_docs)
-        
-        # Create weekly report
-        report = BettyWeeklyReport(
-            week_start=current_monday,
-            predictions=predictions
-        )
-        
-        await db.betty_reports.insert_one(report.dict())
-        
         return report
         
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error getting Betty's predictions: {e}")
         raise HTTPException(status_code=500, detail="Failed to get predictions")
 
+MAX_EVALUATION_WEEKS = 104
+
 @api_router.post("/betty/evaluate", dependencies=[Depends(require_auth)])
-async def evaluate_betty_accuracy():
-    """Evaluate Betty's accuracy for completed weeks (admin function)"""
+async def evaluate_betty_accuracy(week_start: Optional[str] = None, weeks: int = 1, force: bool = False):
+    """Evaluate Betty's accuracy for completed weeks against their week-end closes (admin function).
+    
+    Defaults to last week. week_start picks the most recent week to evaluate, weeks=N
+    backfills N weeks back from it, and force re-scores weeks that were already evaluated.
+    Predictions without a week-end close yet stay pending and are picked up by the next run.
+    """
+    if not 1 <= weeks <= MAX_EVALUATION_WEEKS:
+        raise HTTPException(status_code=400, detail=f"weeks must be between 1 and {MAX_EVALUATION_WEEKS}")
+    try:
+        anchor = await get_monday_of_week(as_utc(datetime.fromisoformat(week_start))) if week_start else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="week_start must be an ISO date")
+    
     try:
-        # Get last week's predictions that haven't been evaluated
-        last_monday = await get_monday_of_week() - timedelta(days=7)
+        anchor = anchor or await get_monday_of_week() - timedelta(days=7)
+        week_starts = [anchor - timedelta(days=7 * i) for i in range(weeks)]
+        now = datetime.now(timezone.utc)
         
-        report = await db.betty_reports.find_one({"week_start": last_monday})
-        if not report or report.get("accuracy_scores"):
+        # Only weeks that have ended can be scored against their week-end close
+        reports = await db.betty_reports.find(
+            {"week_start": {"$in": week_starts}, **READY_REPORT}
+        ).sort("week_start", -1).to_list(None)
+        reports = [
+            report for report in reports
+            if as_utc(report["week_start"]) + timedelta(days=7) <= now
+            and (force or len(report.get("accuracy_scores") or []) < len(report["predictions"]))
+        ]
+        if not reports:
             return {"message": "No predictions to evaluate or already evaluated"}
         
-        # Evaluate each prediction
-        accuracy_scores = []
-        predictions = [BettyPrediction(**pred) for pred in report["predictions"]]
-        
-        for prediction in predictions:
-            accuracy = await betty_evaluate_accuracy(prediction)
-            accuracy_scores.append(accuracy)
-            
-            # Save accuracy to database
-            await db.betty_accuracy.insert_one(accuracy.dict())
-        
-        # Calculate overall accuracy
-        overall_accuracy = sum(acc.accuracy_score for acc in accuracy_scores) / len(accuracy_scores)
-        
-        # Update report with accuracy scores
-        await db.betty_reports.update_one(
-            {"week_start": last_monday},
-            {"$set": {
-                "accuracy_scores": [acc.dict() for acc in accuracy_scores],
+        # One range download and one vectorized pass for every prediction in every week
+        predictions = [BettyPrediction(**pred) for report in reports for pred in report["predictions"]]
+        accuracy_scores = await betty_evaluate_predictions(predictions, await fetch_week_end_closes(predictions))
+        pending = len(predictions) - len(accuracy_scores)
+        if not accuracy_scores:
+            return {"message": "No week-end closes available yet", "pending": pending}
+        await save_evaluation(accuracy_scores)
+        
+        scores_by_id = {acc.prediction_id: acc for acc in accuracy_scores}
+        results, report_updates = [], []
+        for report in reports:
+            week_scores = [scores_by_id[pred["id"]] for pred in report["predictions"] if pred["id"] in scores_by_id]
+            if not week_scores:
+                continue
+            overall_accuracy = sum(acc.accuracy_score for acc in week_scores) / len(week_scores)
+            report_updates.append(UpdateOne({"_id": report["_id"]}, {"$set": {
+                "accuracy_scores": [acc.dict() for acc in week_scores],
                 "overall_accuracy": overall_accuracy
-            }}
-        )
+            }}))
+            results.append({
+                "week_start": as_utc(report["week_start"]).isoformat(),
+                "overall_accuracy": overall_accuracy,
+                "individual_scores": week_scores
+            })
+        await db.betty_reports.bulk_write(report_updates, ordered=False)
         
         return {
             "message": "Accuracy evaluated successfully",
-            "overall_accuracy": overall_accuracy,
-            "individual_scores": accuracy_scores
+            # Most recent week at the top level, as before backfills existed
+            "overall_accuracy": results[0]["overall_accuracy"],
+            "individual_scores": results[0]["individual_scores"],
+            "weeks": results,
+            "pending": pending
         }
         
     except Exception as e:
         logging.error(f"Error evaluating accuracy: {e}")
         raise HTTPException(status_code=500, detail="Failed to evaluate accuracy")
 
+# Backtests of Betty's strategies over years of daily closes (admin functions)
+BACKTEST_WORKERS = int(os.environ.get("BACKTEST_WORKERS", "0")) or None  # default: one per CPU
+BACKTEST_MAX_YEARS = 10
+_backtest_lock = asyncio.Lock()
+
+class BacktestRequest(BaseModel):
+    years: int = 3
+    lookback_days: int = LOOKBACK_DAYS
+    grids: Optional[Dict[str, Dict[str, list]]] = None  # strategy -> parameter -> values; default DEFAULT_GRIDS
+
+def backtest_tickers() -> List[str]:
+    """Every asset the dashboard tracks"""
+    crypto = [prediction_ticker_symbol(asset.symbol, "crypto") for asset in get_fallback_crypto_data()]
+    return crypto + list(CURRENCY_PAIRS) + list(METAL_SYMBOLS)
+
+@api_router.post("/betty/backtests", dependencies=[Depends(require_auth)])
+async def create_backtest(request: BacktestRequest = BacktestRequest()):
+    """Simulate Betty's strategies over a parameter grid and store the results (admin function)"""
+    if not 1 <= request.years <= BACKTEST_MAX_YEARS:
+        raise HTTPException(status_code=400, detail=f"years must be between 1 and {BACKTEST_MAX_YEARS}")
+    if request.grids is not None:
+        try:
+            validate_grids(request.grids)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    if _backtest_lock.locked():
+        raise HTTPException(status_code=409, detail="A backtest is already running")
+    
+    async with _backtest_lock:
+        start = datetime.now(timezone.utc) - timedelta(days=365 * request.years)
+        try:
+            closes = await download_daily_closes(backtest_tickers(), start=start.date())
+        except Exception as e:
+            logging.error(f"Error downloading backtest prices: {e}")
+            raise HTTPException(status_code=502, detail="Failed to load price history")
+        symbols, matrix, dates = align_price_matrix({ticker: closes[ticker].tolist() for ticker in closes}, closes.index.values)
+        if len(symbols) < 3:
+            raise HTTPException(status_code=502, detail="Not enough price history to backtest")
+        
+        try:
+            with tracer.span("backtest.run", asset_count=len(symbols), days=len(dates)):
+                results = await asyncio.to_thread(
+                    run_backtests, matrix, dates, request.grids, BACKTEST_WORKERS, request.lookback_days
+                )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    if not any(result["weeks"] for result in results):
+        raise HTTPException(status_code=400, detail="Not enough price history for the lookback window")
+    
+    backtest_id = str(uuid.uuid4())
+    summary = {
+        "backtest_id": backtest_id,
+        "created_at": datetime.now(timezone.utc),
+        "years": request.years,
+        "lookback_days": request.lookback_days,
+        "symbols": symbols,
+        "start": str(dates[0]),
+        "end": str(dates[-1]),
+    }
+    await db.betty_backtests.insert_many([{**summary, **result} for result in results])
+    
+    return {**summary, "runs": len(results), "best": results[:5]}
+
+@api_router.get("/betty/backtests", dependencies=[Depends(require_auth)])
+async def list_backtests(limit: int = 20):
+    """Recent backtests with their best run (admin function)"""
+    return await db.betty_backtests.aggregate([
+        {"$sort": {"mean_accuracy": -1}},
+        {"$group": {
+            "_id": "$backtest_id",
+            "created_at": {"$first": "$created_at"},
+            "years": {"$first": "$years"},
+            "start": {"$first": "$start"},
+            "end": {"$first": "$end"},
+            "runs": {"$sum": 1},
+            "best_strategy": {"$first": "$strategy"},
+            "best_params": {"$first": "$params"},
+            "best_mean_accuracy": {"$first": "$mean_accuracy"}
+        }},
+        {"$sort": {"created_at": -1}},
+        {"$limit": max(1, min(limit, 100))},
+        {"$project": {
+            "_id": 0, "backtest_id": "$_id", "created_at": 1, "years": 1, "start": 1, "end": 1, "runs": 1,
+            "best_strategy": 1, "best_params": 1, "best_mean_accuracy": 1
+        }}
+    ]).to_list(None)
+
+@api_router.get("/betty/backtests/{backtest_id}", dependencies=[Depends(require_auth)])
+async def get_backtest(backtest_id: str):
+    """Every run of one backtest, best mean accuracy first (admin function)"""
+    runs = await db.betty_backtests.find(
+        {"backtest_id": backtest_id}, {"_id": 0}
+    ).sort("mean_accuracy", -1).to_list(None)
+    if not runs:
+        raise HTTPException(status_code=404, detail="Backtest not found")
+    return runs
+
+# Diagnostics (admin functions)
+PROFILE_MAX_SECONDS = 60
+
+@api_router.get("/admin/metrics", dependencies=[Depends(require_auth)])
+async def get_metrics():
+    """Get in-process metrics"""
+    return {
+        "session_cache": session_cache.stats(),
+        "llm_gateway": llm_gateway.stats(),
+        "metrics": metrics.snapshot()
+    }
+
+@api_router.get("/admin/loop-lag", dependencies=[Depends(require_auth)])
+async def get_loop_lag():
+    """Get event-loop lag statistics"""
+    return {
+        "threshold_ms": loop_monitor.threshold * 1000,
+        **loop_monitor.stats
+    }
+
+@api_router.get("/admin/profile", dependencies=[Depends(require_auth)], response_class=PlainTextResponse)
+async def capture_profile(seconds: float = 10):
+    """Sample the live process and return collapsed stacks for flamegraph tools"""
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be between 0 and {PROFILE_MAX_SECONDS}")
+    try:
+        # Sample from a worker thread so the event loop keeps serving (and gets profiled)
+        collapsed = await asyncio.to_thread(profiler.profile, seconds)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    return PlainTextResponse(
+        collapsed,
+        headers={"Content-Disposition": f'attachment; filename="profile-{int(datetime.now(timezone.utc).timestamp())}.folded"'}
+    )
+
 @api_router.get("/historical/{symbol}")
 async def get_historical_data(symbol: str, asset_type: str):
     """Get historical price data for an asset"""
@@ -1406,142 +1811,405 @@ async def get_historical_data(symbol: str, asset_type: str):
         logging.error(f"Error fetching historical data for {symbol}: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch historical data")
 
+# Streaming LLM output (Server-Sent Events)
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+# Persistent cache of Betty's per-asset analyses, keyed by
+# (normalized symbol, asset type, ISO week, price bucket). Each entry keeps the
+# price snapshot it was generated from. Lookups always go through the key of
+# the asset's current price, so a move into another bucket is a miss: when the
+# dashboard's market data cache already has a fresh price the lookup needs no
+# fetch at all, otherwise the history is fetched first and only the LLM is skipped.
+PREDICTION_CACHE_TTL_HOURS = float(os.environ.get("PREDICTION_CACHE_TTL_HOURS", "6"))
+PREDICTION_PRICE_BUCKET_PERCENT = float(os.environ.get("PREDICTION_PRICE_BUCKET_PERCENT", "2"))
+PREDICTION_PRICE_SOURCES = {"crypto": "crypto", "currency": "currencies", "metals": "metals"}  # asset_type -> data_cache
+
+def prediction_cache_week(now: datetime = None) -> str:
+    iso_year, iso_week, _ = (now or datetime.now(timezone.utc)).isocalendar()
+    return f"{iso_year}-W{iso_week:02d}"
+
+def prediction_price_bucket(price: float) -> int:
+    """Prices within the same ~PREDICTION_PRICE_BUCKET_PERCENT band share a bucket"""
+    return math.floor(math.log(price) / math.log1p(PREDICTION_PRICE_BUCKET_PERCENT / 100)) if price > 0 else 0
+
+def prediction_cache_key(ticker_symbol: str, asset_type: str, price: float, now: datetime = None) -> str:
+    return f"{ticker_symbol.upper()}|{asset_type.lower()}|{prediction_cache_week(now)}|{prediction_price_bucket(price)}"
+
+def dashboard_price(ticker_symbol: str, asset_type: str) -> Optional[float]:
+    """The asset's price from the dashboard's market data cache, if that's still fresh (no I/O)"""
+    entry = data_cache.get(PREDICTION_PRICE_SOURCES.get(asset_type.lower(), ""))
+    if not entry or is_cache_expired(entry["last_updated"]):
+        return None
+    return next((asset.price for asset in entry["data"]
+                 if prediction_ticker_symbol(asset.symbol, asset_type).upper() == ticker_symbol.upper()), None)
+
+async def get_cached_prediction(ticker_symbol: str, asset_type: str, price: float) -> Optional[dict]:
+    """Unexpired analysis for the asset this week in the same price bucket, with its price snapshot"""
+    with tracer.span("mongo.prediction_cache.find_one"):
+        return await db.prediction_cache.find_one(
+            {
+                "_id": prediction_cache_key(ticker_symbol, asset_type, price),
+                "expires_at": {"$gt": datetime.now(timezone.utc)},
+                "recent_closes": {"$exists": True}
+            },
+            {"_id": 0, "analysis": 1, "current_price": 1, "price_change": 1, "recent_closes": 1}
+        )
+
+async def store_cached_analysis(cache_key: str, ticker_symbol: str, asset_type: str, analysis: str,
+                                current_price: float, price_change: float, recent_closes: List[float]):
+    """Best effort: a failed cache write is logged and the analysis is still served"""
+    now = datetime.now(timezone.utc)
+    try:
+        await db.prediction_cache.update_one(
+            {"_id": cache_key},
+            {"$set": {
+                "symbol": ticker_symbol.upper(),
+                "asset_type": asset_type.lower(),
+                "week": prediction_cache_week(now),
+                "analysis": analysis,
+                "current_price": current_price,
+                "price_change": price_change,
+                "recent_closes": recent_closes,
+                "created_at": now,
+                "expires_at": now + timedelta(hours=PREDICTION_CACHE_TTL_HOURS)
+            }},
+            upsert=True
+        )
+    except Exception as e:
+        logging.error(f"Error caching analysis for {ticker_symbol}: {e}")
+
+async def generate_asset_analysis(symbol: str, asset_type: str, current_price: float, price_change: float, recent_closes: List[float]) -> str:
+    """Ask Betty (GPT-4o) for a weekly analysis of one asset; raises if the LLM is unavailable"""
+    system_message, prompt = build_asset_analysis_prompt(symbol, asset_type, current_price, price_change, recent_closes)
+    return await llm_gateway.complete("predict", system_message, prompt, symbol=symbol)
+
+NEUTRAL_SIGNAL = {"score": 0.0, "momentum": 0.0, "reversion": 0.0, "volatility": 0.0, "expected_change": 0.0, "confidence": 0.5}
+
+def fallback_asset_analysis(symbol: str, current_price: float, price_change: float, closes: List[float]) -> str:
+    """Template analysis from the local quant signals, used when the LLM is unavailable"""
+    signal = score_series(closes) if len(closes) >= 3 else NEUTRAL_SIGNAL
+    expected_change = signal["expected_change"] * 100
+    weekly_volatility = signal["volatility"] * 100
+    outlook = "Upward" if expected_change > 0 else "Downward" if expected_change < 0 else "Sideways"
+    risk = "HIGH" if weekly_volatility > 5 else "MEDIUM" if weekly_volatility > 2 else "LOW"
+    return f"""Betty's Weekly Analysis for {symbol}:
+
+**This Week's Outlook**: {outlook} move expected, targeting {abs(expected_change):.1f}% by Friday close
+**Weekly Price Target**: ${current_price * (1 + expected_change / 100):,.2f}
+**Key Weekly Drivers**: 
+- Technical momentum from recent {price_change:+.2f}% movement (trend gauge {signal['momentum']:+.2f})
+- Price {'stretched above' if signal['reversion'] < 0 else 'below'} its 5-day average
+- Weekly volatility around {weekly_volatility:.1f}%
+
+**Weekly Risk Level**: {risk} - based on recent volatility
+**Betty's Weekly Confidence**: {signal['confidence'] * 100:.0f}%
+
+Generated by Betty Crystal on {datetime.now(timezone.utc).strftime('%A, %Y-%m-%d %H:%M UTC')}
+*Weekly predictions updated every Sunday*"""
+
+@api_router.delete("/predict/cache", dependencies=[Depends(require_auth)])
+async def invalidate_prediction_cache(symbol: Optional[str] = None):
+    """Drop cached analyses for one ticker symbol, or all of them (admin function)"""
+    query = {"symbol": symbol.upper()} if symbol else {}
+    result = await db.prediction_cache.delete_many(query)
+    return {"message": "Prediction cache invalidated", "deleted": result.deleted_count}
+
+def prediction_ticker_symbol(symbol: str, asset_type: str) -> str:
+    """Map a dashboard symbol to its yfinance ticker - symbol might already be complete"""
+    ticker_symbol = symbol
+    
+    # Only add suffixes if not already present
+    if asset_type == "currency" and not symbol.endswith("=X"):
+        ticker_symbol = f"{symbol}=X"
+    elif asset_type == "metals" and not symbol.endswith("=F"):
+        ticker_symbol = f"{symbol}=F"
+    elif asset_type == "crypto":
+        if symbol == "BTC" and not symbol.endswith("-USD"):
+            ticker_symbol = "BTC-USD"
+        elif symbol == "ETH" and not symbol.endswith("-USD"):
+            ticker_symbol = "ETH-USD"
+        elif not symbol.endswith("-USD"):
+            ticker_symbol = f"{symbol}-USD"
+    return ticker_symbol
+
+def fetch_prediction_history(symbol: str, ticker_symbol: str):
+    """Recent daily closes (enough for the quant signals) plus (current price, % change); raises 404 if there's no data"""
+    with tracer.span("provider.yfinance.history", symbol=ticker_symbol):
+        ticker = yf.Ticker(ticker_symbol)
+        hist = ticker.history(period=QUANT_HISTORY_PERIOD, interval="1d")
+    
+    if hist.empty:
+        raise HTTPException(status_code=404, detail=f"No data found for {symbol}")
+    
+    current_price = float(hist['Close'].iloc[-1])
+    prev_price = float(hist['Close'].iloc[-2]) if len(hist) > 1 else current_price
+    price_change = ((current_price - prev_price) / prev_price) * 100
+    return hist, current_price, price_change
+
+def build_prediction_response(symbol: str, asset_type: str, recent_closes: List[float], current_price: float,
+                              price_change: float, ai_analysis: str, analysis_cached: bool) -> dict:
+    # Calculate probability based on recent volatility
+    volatility = pd.Series(recent_closes, dtype=float).pct_change().std() * 100
+    volatility = 0.0 if pd.isna(volatility) else volatility
+    probability = max(50, min(95, 75 - volatility * 10))  # Scale 50-95%
+    
+    return {
+        "symbol": symbol,
+        "asset_type": asset_type,
+        "current_price": current_price,
+        "price_change_24h": price_change,
+        "prediction": {
+            "analysis": ai_analysis,
+            "probability": round(probability, 1),
+            "confidence": "Medium" if probability < 70 else "High",
+            "timeframes": {
+                "1_week": f"Expected {abs(price_change * 1.2):.1f}% {'increase' if price_change >= 0 else 'decrease'}",
+                "1_month": f"Potential {abs(price_change * 2.5):.1f}% movement",
+                "1_year": f"Long-term {abs(price_change * 8):.1f}% projection"
+            }
+        },
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "data_source": "yfinance + AI analysis",
+        "cached": analysis_cached
+    }
+
+# Batch predictions: several assets share one LLM round trip, packed up to a token limit
+PREDICT_BATCH_MAX_SYMBOLS = int(os.environ.get("PREDICT_BATCH_MAX_SYMBOLS", "20"))
+PREDICT_BATCH_TOKEN_LIMIT = int(os.environ.get("PREDICT_BATCH_TOKEN_LIMIT", "4000"))
+BATCH_ANALYSIS_TOKENS_PER_ASSET = 350  # expected completion size of one analysis
+
+class BatchPredictionAsset(BaseModel):
+    symbol: str
+    asset_type: str
+
+class BatchPredictionRequest(BaseModel):
+    assets: List[BatchPredictionAsset]
+
+def pack_batch_assets(assets: List[dict]) -> List[List[dict]]:
+    """Group assets so each prompt plus its expected answer fits PREDICT_BATCH_TOKEN_LIMIT"""
+    overhead = count_tokens(build_batch_analysis_prompt([]))
+    groups, current, used = [], [], overhead
+    for asset in assets:
+        cost = count_tokens(batch_asset_line(asset)) + BATCH_ANALYSIS_TOKENS_PER_ASSET
+        if current and used + cost > PREDICT_BATCH_TOKEN_LIMIT:
+            groups.append(current)
+            current, used = [], overhead
+        current.append(asset)
+        used += cost
+    if current:
+        groups.append(current)
+    return groups
+
+def parse_symbol_map(response: str) -> Dict[str, str]:
+    """Pull a {symbol: text} object out of the model's answer (tolerates code fences)"""
+    start, end = response.find("{"), response.rfind("}")
+    if start == -1 or end <= start:
+        raise ValueError("No JSON object in LLM response")
+    parsed = json.loads(response[start:end + 1])
+    if not isinstance(parsed, dict):
+        raise ValueError("LLM response is not a JSON object")
+    return {
+        str(symbol).upper(): analysis if isinstance(analysis, str) else json.dumps(analysis)
+        for symbol, analysis in parsed.items()
+    }
+
+async def generate_batch_analyses(assets: List[dict]) -> Dict[str, str]:
+    """One GPT-4o call for a group of assets; returns {SYMBOL: analysis}"""
+    prompt = build_batch_analysis_prompt(assets)
+    record_prompt("predict_batch", prompt)
+    response = await llm_gateway.complete(
+        "predict_batch",
+        "You are Betty Crystal, an AI trading expert. You answer in strict JSON.",
+        prompt,
+        assets=len(assets)
+    )
+    return parse_symbol_map(response)
+
+@api_router.post("/predict/batch")
+async def get_batch_predictions(request: BatchPredictionRequest):
+    """Predictions for several assets, sharing Yahoo fetches and LLM calls across them"""
+    requested = list({(a.symbol, a.asset_type): a for a in request.assets}.values())
+    if not requested:
+        raise HTTPException(status_code=400, detail="No assets requested")
+    if len(requested) > PREDICT_BATCH_MAX_SYMBOLS:
+        raise HTTPException(status_code=400, detail=f"At most {PREDICT_BATCH_MAX_SYMBOLS} assets per batch")
+    tracer.set_attribute("assets", len(requested))
+    
+    # Serve what's cached for the dashboard's fresh prices without touching market data
+    async def cached_at_dashboard_price(item: BatchPredictionAsset):
+        ticker_symbol = prediction_ticker_symbol(item.symbol, item.asset_type)
+        live_price = dashboard_price(ticker_symbol, item.asset_type)
+        cached = await get_cached_prediction(ticker_symbol, item.asset_type, live_price) if live_price else None
+        return cached and {**cached, "current_price": live_price}
+    
+    cached_predictions = await asyncio.gather(*(cached_at_dashboard_price(item) for item in requested))
+    predictions = [
+        build_prediction_response(item.symbol, item.asset_type, cached["recent_closes"], cached["current_price"],
+                                  cached["price_change"], cached["analysis"], True)
+        for item, cached in zip(requested, cached_predictions) if cached
+    ]
+    requested = [item for item, cached in zip(requested, cached_predictions) if not cached]
+    
+    # Fetch the remaining histories concurrently
+    async def fetch(item: BatchPredictionAsset):
+        ticker_symbol = prediction_ticker_symbol(item.symbol, item.asset_type)
+        hist, current_price, price_change = await asyncio.to_thread(fetch_prediction_history, item.symbol, ticker_symbol)
+        return {
+            "symbol": item.symbol, "asset_type": item.asset_type, "ticker_symbol": ticker_symbol,
+            "hist": hist, "current_price": current_price, "price_change": price_change,
+            "recent_closes": hist['Close'].tail(5).tolist(),
+            "cache_key": prediction_cache_key(ticker_symbol, item.asset_type, current_price)
+        }
+    
+    results = await asyncio.gather(*(fetch(item) for item in requested), return_exceptions=True)
+    assets, errors = [], []
+    for item, result in zip(requested, results):
+        if isinstance(result, Exception):
+            logging.error(f"Error fetching data for batch prediction of {item.symbol}: {result}")
+            detail = result.detail if isinstance(result, HTTPException) else "Failed to fetch price data"
+            errors.append({"symbol": item.symbol, "asset_type": item.asset_type, "detail": detail})
+        else:
+            assets.append(result)
+    
+    # The fetched prices may still land in a cached bucket
+    cached_analyses = await asyncio.gather(*(
+        get_cached_prediction(asset["ticker_symbol"], asset["asset_type"], asset["current_price"]) for asset in assets
+    ))
+    for asset, cached in zip(assets, cached_analyses):
+        if cached:
+            predictions.append(build_prediction_response(
+                asset["symbol"], asset["asset_type"], asset["recent_closes"], asset["current_price"],
+                asset["price_change"], cached["analysis"], True
+            ))
+    assets = [asset for asset, cached in zip(assets, cached_analyses) if not cached]
+    
+    # Generate the rest in as few prompts as fit the token limit
+    analyses = {}
+    groups = pack_batch_assets(assets) if assets else []
+    tracer.set_attribute("llm_calls", len(groups))
+    generated = await asyncio.gather(*(generate_batch_analyses(group) for group in groups), return_exceptions=True)
+    for group, group_analyses in zip(groups, generated):
+        if isinstance(group_analyses, Exception):
+            logging.warning(f"Batch LLM prediction failed: {group_analyses}")
+            continue
+        for asset in group:
+            analysis = group_analyses.get(asset["symbol"].upper())
+            if analysis:
+                analyses[asset["cache_key"]] = analysis
+                await store_cached_analysis(
+                    asset["cache_key"], asset["ticker_symbol"], asset["asset_type"], analysis,
+                    asset["current_price"], asset["price_change"], asset["recent_closes"]
+                )
+    
+    for asset in assets:
+        analysis = analyses.get(asset["cache_key"]) or fallback_asset_analysis(
+            asset["symbol"], asset["current_price"], asset["price_change"], asset["hist"]['Close'].tolist()
+        )
+        predictions.append(build_prediction_response(
+            asset["symbol"], asset["asset_type"], asset["recent_closes"], asset["current_price"], asset["price_change"],
+            analysis, False
+        ))
+    
+    return {"predictions": predictions, "errors": errors}
+
+@api_router.get("/predict/{symbol}/stream")
+async def stream_asset_prediction(symbol: str, asset_type: str):
+    """Stream Betty's analysis for an asset as Server-Sent Events (token, then done; error if the LLM fails)"""
+    def cached_response(cached: dict, current_price: float, price_change: float):
+        async def cached_events():
+            yield sse_event("token", {"text": cached["analysis"]})
+            yield sse_event("done", {"symbol": symbol, "asset_type": asset_type, "current_price": current_price,
+                                     "price_change_24h": price_change, "cached": True})
+        return StreamingResponse(cached_events(), media_type="text/event-stream", headers=SSE_HEADERS)
+    
+    ticker_symbol = prediction_ticker_symbol(symbol, asset_type)
+    live_price = dashboard_price(ticker_symbol, asset_type)
+    cached = await get_cached_prediction(ticker_symbol, asset_type, live_price) if live_price else None
+    if cached:
+        return cached_response(cached, live_price, cached["price_change"])
+    
+    try:
+        hist, current_price, price_change = await asyncio.to_thread(fetch_prediction_history, symbol, ticker_symbol)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error fetching data for streamed prediction of {symbol}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to generate prediction")
+    cached = await get_cached_prediction(ticker_symbol, asset_type, current_price)
+    if cached:
+        return cached_response(cached, current_price, price_change)
+    
+    cache_key = prediction_cache_key(ticker_symbol, asset_type, current_price)
+    recent_closes = hist['Close'].tail(5).tolist()
+    
+    async def events():
+        meta = {"symbol": symbol, "asset_type": asset_type, "current_price": current_price, "price_change_24h": price_change}
+        chunks = []
+        try:
+            system_message, prompt = build_asset_analysis_prompt(symbol, asset_type, current_price, price_change, recent_closes)
+            async for text in llm_gateway.stream("predict", system_message, prompt):
+                chunks.append(text)
+                yield sse_event("token", {"text": text})
+            await store_cached_analysis(cache_key, ticker_symbol, asset_type, "".join(chunks),
+                                        current_price, price_change, recent_closes)
+        except Exception as llm_error:
+            logging.error(f"Streamed LLM prediction for {symbol} failed: {llm_error}")
+            yield sse_event("error", {"detail": "Prediction stream failed"})
+            if not chunks:
+                yield sse_event("token", {"text": fallback_asset_analysis(symbol, current_price, price_change, hist['Close'].tolist())})
+        yield sse_event("done", {**meta, "cached": False})
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @api_router.get("/predict/{symbol}")
 async def get_asset_prediction(symbol: str, asset_type: str):
     """Get AI prediction for a specific asset"""
+    tracer.set_attribute("symbol", symbol)
     try:
-        # Get current price data - symbol might already be complete
-        ticker_symbol = symbol
-        
-        # Only add suffixes if not already present
-        if asset_type == "currency" and not symbol.endswith("=X"):
-            ticker_symbol = f"{symbol}=X"
-        elif asset_type == "metals" and not symbol.endswith("=F"):
-            ticker_symbol = f"{symbol}=F"
-        elif asset_type == "crypto":
-            if symbol == "BTC" and not symbol.endswith("-USD"):
-                ticker_symbol = "BTC-USD"
-            elif symbol == "ETH" and not symbol.endswith("-USD"):
-                ticker_symbol = "ETH-USD"
-            elif not symbol.endswith("-USD"):
-                ticker_symbol = f"{symbol}-USD"
-        
-        ticker = yf.Ticker(ticker_symbol)
-        hist = ticker.history(period="5d", interval="1d")
-        
-        if hist.empty:
-            raise HTTPException(status_code=404, detail=f"No data found for {symbol}")
-        
-        current_price = float(hist['Close'].iloc[-1])
-        prev_price = float(hist['Close'].iloc[-2]) if len(hist) > 1 else current_price
-        price_change = ((current_price - prev_price) / prev_price) * 100
+        # Reuse this week's analysis for the current price bucket - without any fetch if the dashboard has the price
+        ticker_symbol = prediction_ticker_symbol(symbol, asset_type)
+        live_price = dashboard_price(ticker_symbol, asset_type)
+        cached = await get_cached_prediction(ticker_symbol, asset_type, live_price) if live_price else None
+        if cached:
+            tracer.set_attribute("cache", "hit")
+            return build_prediction_response(symbol, asset_type, cached["recent_closes"], live_price,
+                                             cached["price_change"], cached["analysis"], True)
+        
+        # Get current price data
+        hist, current_price, price_change = await asyncio.to_thread(fetch_prediction_history, symbol, ticker_symbol)
+        recent_closes = hist['Close'].tail(5).tolist()
+        cached = await get_cached_prediction(ticker_symbol, asset_type, current_price)
+        tracer.set_attribute("cache", "hit" if cached else "miss")
+        if cached:
+            return build_prediction_response(symbol, asset_type, recent_closes, current_price, price_change,
+                                             cached["analysis"], True)
         
         # Generate AI prediction using LLM
         try:
-            llm_key = os.environ.get('EMERGENT_LLM_KEY')
-            if not llm_key:
-                raise ValueError("LLM key not configured")
-            
-            chat = LlmChat(
-                api_key=llm_key,
-                session_id=f"prediction_{symbol}_{datetime.now().timestamp()}",
-                system_message=f"You are Betty Crystal, an AI trading expert analyzing {symbol}."
-            ).with_model("openai", "gpt-4o")
-            
-            prompt = f"""You are Betty Crystal, the AI trading oracle who operates on weekly cycles. Today is {datetime.now(timezone.utc).strftime('%A')} and I'm analyzing {symbol} ({asset_type}) for the upcoming week.
-
-Current price: ${current_price:,.2f}
-Weekly change: {price_change:+.2f}%
-Weekly price data: {hist['Close'].tail(5).tolist()}
-
-WEEKLY ANALYSIS REQUIRED:
-1. **This Week's Outlook** (Monday-Sunday): Direction (UP/DOWN/SIDEWAYS) and expected percentage move
-2. **Weekly Price Target**: Specific price target by end of week
-3. **Key Weekly Drivers**: What will move this asset this week (earnings, news, technical levels)
-4. **Weekly Risk Level**: HIGH/MEDIUM/LOW and why
-5. **Betty's Weekly Confidence**: 1-100 rating for this week's prediction
-
-Remember: I am Betty Crystal and I make weekly predictions every Sunday for the upcoming trading week. Be specific about THIS WEEK only.
-Analysis generated on: {datetime.now(timezone.utc).strftime('%A, %Y-%m-%d %H:%M UTC')}"""
-
-            response = await chat.send_message(UserMessage(text=prompt))
-            ai_analysis = response
-            
+            ai_analysis = await generate_asset_analysis(symbol, asset_type, current_price, price_change, recent_closes)
         except Exception as llm_error:
             logging.warning(f"LLM prediction failed: {llm_error}")
-            # Fallback analysis
-            trend = "upward" if price_change >= 0 else "downward"
-            ai_analysis = f"""Betty's Weekly Analysis for {symbol}:
-
-**This Week's Outlook**: {trend.capitalize()} momentum expected, targeting {abs(price_change * 1.8):.1f}% move by Friday close
-**Weekly Price Target**: ${current_price * (1 + (price_change * 0.018 if price_change >= 0 else price_change * -0.018)):,.2f}
-**Key Weekly Drivers**: 
-- Technical momentum from recent {price_change:+.2f}% movement
-- Weekly support/resistance levels in focus
-- Market sentiment shifting {trend}
-
-**Weekly Risk Level**: MEDIUM - Standard volatility expected
-**Betty's Weekly Confidence**: 68%
-
-Generated by Betty Crystal on {datetime.now(timezone.utc).strftime('%A, %Y-%m-%d %H:%M UTC')}
-*Weekly predictions updated every Sunday*"""
-        
-        # Calculate probability based on recent volatility
-        volatility = hist['Close'].pct_change().std() * 100
-        probability = max(50, min(95, 75 - volatility * 10))  # Scale 50-95%
+            ai_analysis = fallback_asset_analysis(symbol, current_price, price_change, hist['Close'].tolist())
+        else:
+            await store_cached_analysis(prediction_cache_key(ticker_symbol, asset_type, current_price), ticker_symbol,
+                                        asset_type, ai_analysis, current_price, price_change, recent_closes)
         
-        return {
-            "symbol": symbol,
-            "asset_type": asset_type,
-            "current_price": current_price,
-            "price_change_24h": price_change,
-            "prediction": {
-                "analysis": ai_analysis,
-                "probability": round(probability, 1),
-                "confidence": "Medium" if probability < 70 else "High",
-                "timeframes": {
-                    "1_week": f"Expected {abs(price_change * 1.2):.1f}% {'increase' if price_change >= 0 else 'decrease'}",
-                    "1_month": f"Potential {abs(price_change * 2.5):.1f}% movement",
-                    "1_year": f"Long-term {abs(price_change * 8):.1f}% projection"
-                }
-            },
-            "generated_at": datetime.now(timezone.utc).isoformat(),
-            "data_source": "yfinance + AI analysis"
-        }
+        return build_prediction_response(symbol, asset_type, recent_closes, current_price, price_change, ai_analysis, False)
         
     except Exception as e:
         logging.error(f"Error generating prediction for {symbol}: {e}")
         raise HTTPException(status_code=500, detail="Failed to generate prediction")
 
-@api_router.get("/betty/premium-insights", dependencies=[Depends(require_verified_user)])
-async def get_betty_premium_insights(user: User = Depends(require_verified_user)):
-    """Get Betty's premium insights and advanced analysis (Premium only)"""
-    try:
-        # Generate premium content using LLM
-        llm_key = os.environ.get('EMERGENT_LLM_KEY')
-        if llm_key:
-            chat = LlmChat(
-                api_key=llm_key,
-                session_id=f"premium_insights_{user.id}_{datetime.now().timestamp()}",
-                system_message="You are Betty Crystal providing premium market insights."
-            ).with_model("openai", "gpt-4o")
-            
-            prompt = """You are Betty Crystal providing premium market insights. Generate exclusive content for premium subscribers including:
-
-1. Advanced Market Analysis (deeper than free version)
-2. Risk Assessment across multiple timeframes
-3. Portfolio Recommendations
-4. Market Sentiment Analysis
-5. Exclusive Trading Strategies
-6. Weekly Market Outlook with specific entry/exit points
+# Premium insights are the same for every verified user, so they are generated
+# once per time bucket in the background and served from betty_insights
+PREMIUM_INSIGHTS_BUCKET = os.environ.get("PREMIUM_INSIGHTS_BUCKET", "hourly")  # hourly | daily
+PREMIUM_INSIGHTS_RETENTION_DAYS = 7
+PREMIUM_INSIGHTS_CLAIM_TIMEOUT_SECONDS = 300  # a pending claim older than this is assumed abandoned
 
-Be detailed, professional, and provide actionable insights that justify premium access.
-Current date: {datetime.now(timezone.utc).strftime('%Y-%m-%d')}"""
-
-            response = await chat.send_message(UserMessage(text=prompt))
-            premium_content = response
-        else:
-            premium_content = """🔮 Betty's Premium Market Insights
+FALLBACK_PREMIUM_INSIGHTS = """🔮 Betty's Premium Market Insights
 
 PREMIUM MARKET ANALYSIS:
 • Advanced technical indicators suggest a potential breakout in crypto markets within 48-72 hours
@@ -1560,23 +2228,166 @@ WEEKLY OUTLOOK:
 
 Note: Premium analysis includes real-time alerts and personalized recommendations."""
 
+PREMIUM_FEATURES = [
+    "Advanced Technical Analysis",
+    "Risk Assessment Matrix", 
+    "Portfolio Optimization",
+    "Real-time Market Alerts",
+    "Personalized Recommendations"
+]
+
+def premium_insights_bucket(now: datetime = None) -> str:
+    now = now or datetime.now(timezone.utc)
+    return now.strftime("%Y-%m-%d" if PREMIUM_INSIGHTS_BUCKET == "daily" else "%Y-%m-%dT%H")
+
+PREMIUM_INSIGHTS_SYSTEM_MESSAGE = "You are Betty Crystal providing premium market insights."
+
+def build_premium_insights_prompt() -> str:
+    prompt = f"""You are Betty Crystal providing premium market insights. Generate exclusive content for premium subscribers including:
+
+1. Advanced Market Analysis (deeper than free version)
+2. Risk Assessment across multiple timeframes
+3. Portfolio Recommendations
+4. Market Sentiment Analysis
+5. Exclusive Trading Strategies
+6. Weekly Market Outlook with specific entry/exit points
+
+Be detailed, professional, and provide actionable insights that justify premium access.
+Current date: {datetime.now(timezone.utc).strftime('%Y-%m-%d')}"""
+    record_prompt("premium_insights", prompt)
+    return prompt
+
+async def generate_premium_insights() -> str:
+    """Ask Betty (GPT-4o) for this period's premium insights"""
+    try:
+        return await llm_gateway.complete("premium_insights", PREMIUM_INSIGHTS_SYSTEM_MESSAGE, build_premium_insights_prompt())
+    except LLMNotConfigured:
+        return FALLBACK_PREMIUM_INSIGHTS
+
+async def claim_premium_insights(bucket: str) -> Optional[str]:
+    """Insert the bucket's pending document; returns the claim id, or None if it's generated or being generated"""
+    claim_id = str(uuid.uuid4())
+    now = datetime.now(timezone.utc)
+    try:
+        await db.betty_insights.insert_one({
+            "_id": bucket,
+            "status": "pending",
+            "claim_id": claim_id,
+            "claimed_at": now,
+            "created_at": now,
+            "expires_at": now + timedelta(days=PREMIUM_INSIGHTS_RETENTION_DAYS)
+        })
+        return claim_id
+    except DuplicateKeyError:
+        pass
+    
+    # Take over a claim left behind by a generator that crashed
+    cutoff = now - timedelta(seconds=PREMIUM_INSIGHTS_CLAIM_TIMEOUT_SECONDS)
+    stale_claim = await db.betty_insights.find_one_and_update(
+        {"_id": bucket, "status": "pending", "$or": [
+            {"claimed_at": {"$lt": cutoff}},
+            {"claimed_at": {"$exists": False}, "created_at": {"$lt": cutoff}}
+        ]},
+        {"$set": {"claim_id": claim_id, "claimed_at": now}}
+    )
+    return claim_id if stale_claim else None
+
+async def publish_premium_insights(bucket: str, content: str):
+    await db.betty_insights.update_one(
+        {"_id": bucket},
+        {"$set": {"status": "ready", "content": content, "generated_at": datetime.now(timezone.utc)}}
+    )
+    logging.info(f"Premium insights generated for {bucket}")
+
+async def release_premium_insights(bucket: str, claim_id: str):
+    await db.betty_insights.delete_one({"_id": bucket, "status": "pending", "claim_id": claim_id})
+
+async def refresh_premium_insights():
+    """Generate the current bucket's insights unless they exist or another worker is on it"""
+    bucket = premium_insights_bucket()
+    claim_id = await claim_premium_insights(bucket)
+    if claim_id is None:
+        return
+    
+    try:
+        content = await generate_premium_insights()
+    except Exception as e:
+        logging.error(f"Error generating premium insights: {e}")
+        await release_premium_insights(bucket, claim_id)
+        return
+    
+    await publish_premium_insights(bucket, content)
+
+_premium_refresh_task: Optional[asyncio.Task] = None
+
+def refresh_premium_insights_in_background():
+    global _premium_refresh_task
+    if _premium_refresh_task is None or _premium_refresh_task.done():
+        _premium_refresh_task = asyncio.create_task(refresh_premium_insights())
+
+@api_router.get("/betty/premium-insights", dependencies=[Depends(require_verified_user)])
+async def get_betty_premium_insights(user: User = Depends(require_verified_user)):
+    """Get Betty's premium insights and advanced analysis (Premium only)"""
+    try:
+        with tracer.span("mongo.betty_insights.find_latest") as span:
+            insights = await db.betty_insights.find_one({"status": "ready"}, sort=[("generated_at", -1)])
+            span.set_attribute("cache", "hit" if insights else "miss")
+        
+        # Serve the latest insights and regenerate off the request path when they're stale
+        if not insights or insights["_id"] != premium_insights_bucket():
+            refresh_premium_insights_in_background()
+        
         return {
             "type": "premium_insights",
-            "content": premium_content,
-            "generated_at": datetime.now(timezone.utc).isoformat(),
-            "premium_features": [
-                "Advanced Technical Analysis",
-                "Risk Assessment Matrix", 
-                "Portfolio Optimization",
-                "Real-time Market Alerts",
-                "Personalized Recommendations"
-            ]
+            "content": insights["content"] if insights else FALLBACK_PREMIUM_INSIGHTS,
+            "generated_at": as_utc(insights["generated_at"]).isoformat() if insights else datetime.now(timezone.utc).isoformat(),
+            "premium_features": PREMIUM_FEATURES
         }
         
     except Exception as e:
-        logging.error(f"Error generating premium insights: {e}")
+        logging.error(f"Error getting premium insights: {e}")
         raise HTTPException(status_code=500, detail="Failed to generate premium insights")
 
+@api_router.get("/betty/premium-insights/stream", dependencies=[Depends(require_verified_user)])
+async def stream_betty_premium_insights(user: User = Depends(require_verified_user)):
+    """Stream Betty's premium insights as Server-Sent Events (token, then done; error if the LLM fails)"""
+    bucket = premium_insights_bucket()
+    insights = await db.betty_insights.find_one({"_id": bucket, "status": "ready"})
+    
+    async def events():
+        if insights:
+            yield sse_event("token", {"text": insights["content"]})
+            yield sse_event("done", {"generated_at": as_utc(insights["generated_at"]).isoformat(), "cached": True})
+            return
+        
+        # Another worker is already generating this bucket: serve the latest we have
+        claim_id = await claim_premium_insights(bucket) if llm_gateway.configured else None
+        if claim_id is None:
+            latest = await db.betty_insights.find_one({"status": "ready"}, sort=[("generated_at", -1)])
+            yield sse_event("token", {"text": latest["content"] if latest else FALLBACK_PREMIUM_INSIGHTS})
+            yield sse_event("done", {"cached": True})
+            return
+        
+        chunks, published = [], False
+        try:
+            async for text in llm_gateway.stream("premium_insights", PREMIUM_INSIGHTS_SYSTEM_MESSAGE, build_premium_insights_prompt()):
+                chunks.append(text)
+                yield sse_event("token", {"text": text})
+            await publish_premium_insights(bucket, "".join(chunks))
+            published = True
+        except Exception as e:
+            logging.error(f"Error streaming premium insights: {e}")
+            yield sse_event("error", {"detail": "Premium insights stream failed"})
+            if not chunks:
+                yield sse_event("token", {"text": FALLBACK_PREMIUM_INSIGHTS})
+        finally:
+            # Also runs when the client disconnects mid-stream (GeneratorExit / CancelledError)
+            if not published:
+                await asyncio.shield(release_premium_insights(bucket, claim_id))
+        yield sse_event("done", {"generated_at": datetime.now(timezone.utc).isoformat(), "cached": False})
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @api_router.get("/betty/portfolio-analysis", dependencies=[Depends(require_verified_user)])
 async def get_betty_portfolio_analysis(user: User = Depends(require_verified_user)):
     """Get Betty's advanced portfolio analysis (Premium only)"""
@@ -1612,9 +2423,105 @@ async def get_betty_portfolio_analysis(user: User = Depends(require_verified_use
         logging.error(f"Error generating portfolio analysis: {e}")
         raise HTTPException(status_code=500, detail="Failed to generate portfolio analysis")
 
+# Deterministic replies for LLM_BACKEND=stub, shaped like the JSON the real prompts ask for
+def stub_betty_predictions(prompt: str) -> str:
+    assets = parse_asset_table(prompt)
+    predictions = []
+    for i, asset in enumerate(assets[:3]):
+        predictions.append({
+            "asset_symbol": asset["symbol"],
+            "asset_name": asset["name"],
+            "asset_type": asset["type"],
+            "current_price": asset["price"],
+            "direction": "up" if asset["change_percent"] >= 0 else "down",
+            "predicted_change_percent": round(1 + i * 0.5, 1),
+            "confidence_level": 0.6,
+            "reasoning": f"Stub reasoning for {asset['symbol']}"
+        })
+    return json.dumps({"predictions": predictions})
+
+def stub_prediction_narratives(prompt: str) -> str:
+    rows = prompt.split(PICKS_TABLE_HEADER + "\n", 1)[1].split("\n\n", 1)[0].splitlines()
+    return json.dumps({row.split("|")[0]: f"Betty's stub narrative for {row.split('|')[1]}" for row in rows})
+
+def stub_batch_analyses(prompt: str) -> str:
+    symbols = [line[2:].split(" (")[0] for line in prompt.splitlines() if line.startswith("- ")]
+    return json.dumps({symbol: f"Betty's stub analysis for {symbol}" for symbol in symbols})
+
+if isinstance(llm_gateway.backend, StubLLMBackend):
+    llm_gateway.backend.responders.update(
+        betty_predictions=stub_betty_predictions,
+        betty_narrative=stub_prediction_narratives,
+        predict_batch=stub_batch_analyses
+    )
+
 # Include the router in the main app
 app.include_router(api_router)
 
+# Rate limiting for LLM-backed endpoints (costs per route in rate_limit.ROUTE_COSTS)
+RATE_LIMIT_BUDGET = int(os.environ.get("RATE_LIMIT_BUDGET", "60"))
+RATE_LIMIT_WINDOW_SECONDS = int(os.environ.get("RATE_LIMIT_WINDOW_SECONDS", "60"))
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "memory")  # memory | mongo
+# Only behind a reverse proxy: X-Forwarded-For is client-controlled except for the hops our proxies append
+TRUST_PROXY_HEADERS = os.environ.get("TRUST_PROXY_HEADERS", "false").lower() == "true"
+TRUSTED_PROXY_COUNT = int(os.environ.get("TRUSTED_PROXY_COUNT", "1"))
+
+rate_limiter = RateLimiter(
+    MongoRateLimitBackend(db.rate_limits, RATE_LIMIT_WINDOW_SECONDS) if RATE_LIMIT_BACKEND == "mongo"
+    else InMemoryRateLimitBackend(),
+    budget=RATE_LIMIT_BUDGET,
+    window_seconds=RATE_LIMIT_WINDOW_SECONDS
+)
+
+def client_ip(request: Request) -> str:
+    """The connecting client, or with TRUST_PROXY_HEADERS the address our proxy saw"""
+    forwarded_for = request.headers.get("x-forwarded-for")
+    if TRUST_PROXY_HEADERS and forwarded_for:
+        # Entries left of those appended by our own proxies are whatever the client sent
+        hops = [hop.strip() for hop in forwarded_for.split(",") if hop.strip()]
+        if len(hops) >= TRUSTED_PROXY_COUNT:
+            return hops[-TRUSTED_PROXY_COUNT]
+    return request.client.host if request.client else "unknown"
+
+async def rate_limit_key(request: Request) -> str:
+    """Key requests by authenticated user, otherwise by client IP (unverified tokens don't count)"""
+    try:
+        user = await get_current_user(request, await security(request))
+    except Exception as e:
+        logging.error(f"Error resolving user for rate limiting: {e}")
+        user = None
+    if user:
+        return f"user:{user.id}"
+    return f"ip:{client_ip(request)}"
+
+@app.middleware("http")
+async def rate_limit_requests(request: Request, call_next):
+    """Reject clients that exceed their budget on expensive routes with 429"""
+    cost, route = route_cost(request.method, request.url.path)
+    if cost:
+        retry_after = await rate_limiter.check(await rate_limit_key(request), cost, route=route)
+        if retry_after is not None:
+            tracer.set_attribute("rate_limited", True)
+            return JSONResponse(
+                status_code=429,
+                content={"detail": "Too many requests, please try again later"},
+                headers={"Retry-After": str(retry_after)}
+            )
+    return await call_next(request)
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Open the root span for each request; handler spans nest beneath it"""
+    trace_id, parent_id = parse_traceparent(request.headers.get("traceparent"))
+    with tracer.span(f"{request.method} {request.url.path}", trace_id=trace_id, parent_id=parent_id,
+                     **{"http.method": request.method, "http.path": request.url.path}) as span:
+        response = await call_next(request)
+        span.set_attribute("http.status_code", response.status_code)
+        route = request.scope.get("route")
+        if route is not None:
+            span.set_attribute("http.route", route.path)
+        return response
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -1630,17 +2537,54 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Long-running tasks started on startup and cancelled on shutdown
+background_tasks: List[asyncio.Task] = []
+
 @app.on_event("startup")
 async def startup_event():
-    """Initialize Betty's historical data on server startup"""
+    """Apply pending migrations (seed data included) and ensure indexes on server startup"""
+    try:
+        await run_migrations(client, db)
+    except Exception as e:
+        logging.error(f"Error running migrations on startup: {e}")
+    
     try:
-        await initialize_betty_history()
-        logging.info("Betty's historical data initialized on startup")
+        await ensure_indexes(db)
     except Exception as e:
-        logging.error(f"Error initializing Betty's data on startup: {e}")
+        logging.error(f"Error ensuring MongoDB indexes on startup: {e}")
+    
+    loop_monitor.start()
+    
+    # Sunday-night generation of next week's picks, plus a catch-up run for this week
+    scheduler.add_job(
+        pregenerate_weekly_predictions,
+        CronTrigger(day_of_week="sun", hour=BETTY_PREGENERATE_HOUR, timezone=timezone.utc),
+        id="betty_weekly_predictions", replace_existing=True, coalesce=True, misfire_grace_time=3600
+    )
+    scheduler.add_job(pregenerate_weekly_predictions, kwargs={"next_week": False}, id="betty_current_week_catchup")
+    
+    # Premium insights at the start of every bucket, plus one now
+    scheduler.add_job(
+        refresh_premium_insights,
+        CronTrigger(minute=0, hour=0 if PREMIUM_INSIGHTS_BUCKET == "daily" else "*", timezone=timezone.utc),
+        id="betty_premium_insights", replace_existing=True, coalesce=True
+    )
+    scheduler.add_job(refresh_premium_insights, id="betty_premium_insights_catchup")
+    scheduler.start()
+    
+    if SESSION_SIGNING_KEY:
+        background_tasks.append(asyncio.create_task(
+            session_revocations.run_sync_loop(db.revoked_sessions, REVOCATION_SYNC_SECONDS)
+        ))
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task in background_tasks:
+        task.cancel()
+    scheduler.shutdown(wait=False)
+    await loop_monitor.stop()
+    password_hasher.shutdown()
+    tracer.shutdown()
     client.close()
 
 if __name__ == "__main__":
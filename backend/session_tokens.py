@@ -0,0 +1,146 @@
+"""Stateless signed session tokens and a compact revocation filter.
+
+With SESSION_TOKEN_MODE=signed, login issues a token of the form
+
+    v1.<base64url(claims JSON)>.<base64url(HMAC-SHA256)>
+
+whose claims carry everything get_current_user needs (user id, username,
+email, verification flag, trial end and expiry), so verifying a request costs
+no database I/O. Logouts are recorded in the revoked_sessions collection and
+mirrored into every worker's RevocationFilter by a periodic sync: a Bloom
+filter answers "definitely not revoked" for almost every request, and an exact
+set confirms the rare positives.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import math
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PREFIX = "v1."
+
+# Re-read a little history each sync so revocations committed mid-sync aren't missed
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def is_signed_token(token: str) -> bool:
+    return token.startswith(TOKEN_PREFIX)
+
+
+def sign_session_token(claims: dict, key: bytes) -> str:
+    payload = _b64encode(json.dumps(claims, separators=(",", ":"), sort_keys=True).encode())
+    signature = hmac.new(key, f"{TOKEN_PREFIX}{payload}".encode(), hashlib.sha256).digest()
+    return f"{TOKEN_PREFIX}{payload}.{_b64encode(signature)}"
+
+
+def verify_session_token(token: str, key: bytes) -> Optional[dict]:
+    """Return the token's claims if the signature is valid and it hasn't expired"""
+    try:
+        payload, signature = token[len(TOKEN_PREFIX):].split(".")
+        expected = hmac.new(key, f"{TOKEN_PREFIX}{payload}".encode(), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, _b64decode(signature)):
+            return None
+        claims = json.loads(_b64decode(payload))
+    except (ValueError, json.JSONDecodeError):
+        return None
+
+    if claims.get("exp", 0) <= time.time():
+        return None
+    return claims
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter using double hashing over one blake2b digest"""
+
+    def __init__(self, capacity: int = 100_000, error_rate: float = 0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class RevocationFilter:
+    """Revoked token ids: Bloom filter for fast negatives backed by an exact set"""
+
+    def __init__(self, capacity: int = 100_000):
+        self.capacity = capacity
+        self._bloom = BloomFilter(capacity)
+        self._revoked: Dict[str, float] = {}  # jti -> token expiry (epoch seconds)
+        self._last_sync: Optional[datetime] = None
+
+    def add(self, jti: str, expires_at: float):
+        self._revoked[jti] = expires_at
+        self._bloom.add(jti)
+
+    def is_revoked(self, jti: str) -> bool:
+        return jti in self._bloom and jti in self._revoked
+
+    def prune(self):
+        """Forget revocations of tokens that have expired anyway, rebuilding the Bloom filter"""
+        now = time.time()
+        live = {jti: exp for jti, exp in self._revoked.items() if exp > now}
+        if len(live) == len(self._revoked):
+            return
+        self._revoked = live
+        self._bloom = BloomFilter(self.capacity)
+        for jti in live:
+            self._bloom.add(jti)
+
+    async def revoke(self, collection, jti: str, expires_at: float):
+        """Record a revocation locally and in the shared collection"""
+        self.add(jti, expires_at)
+        await collection.update_one(
+            {"_id": jti},
+            {"$setOnInsert": {
+                "expires_at": datetime.fromtimestamp(expires_at, timezone.utc),
+                "revoked_at": datetime.now(timezone.utc)
+            }},
+            upsert=True
+        )
+
+    async def sync(self, collection):
+        """Pull revocations recorded by other workers since the last sync"""
+        query = {"revoked_at": {"$gte": self._last_sync}} if self._last_sync else {}
+        sync_started = datetime.now(timezone.utc)
+        async for doc in collection.find(query, {"expires_at": 1}):
+            expires_at = doc["expires_at"]
+            if expires_at.tzinfo is None:
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            self.add(doc["_id"], expires_at.timestamp())
+        self._last_sync = sync_started - SYNC_OVERLAP
+        self.prune()
+
+    async def run_sync_loop(self, collection, interval_seconds: float):
+        while True:
+            try:
+                await self.sync(collection)
+            except Exception as e:
+                logger.error(f"Error syncing session revocations: {e}")
+            await asyncio.sleep(interval_seconds)
@@ -0,0 +1,232 @@
+"""Request tracing for the Betty Crystal API.
+
+Spans nest automatically through a context variable, so a span opened inside a
+request handler becomes a child of the request span, and a span opened inside
+that becomes its grandchild. Finished spans are handed to a pluggable exporter.
+
+Configuration (environment):
+    TRACE_EXPORTER  none | console | file | "package.module:ExporterClass"
+    TRACE_FILE      output path for the file exporter (default: traces.jsonl)
+"""
+import contextvars
+import importlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, Optional
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """A single timed operation within a trace"""
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self.start_time = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes):
+        self.attributes.update(attributes)
+
+    def record_exception(self, exc: BaseException):
+        self.status = "error"
+        self.error = f"{type(exc).__name__}: {exc}"
+
+    def end(self):
+        if self.duration_ms is None:
+            self.duration_ms = round((time.perf_counter() - self._start) * 1000, 3)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time.isoformat(),
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+# Exporters
+class SpanExporter:
+    """Base class for span exporters; subclasses override export()"""
+
+    def export(self, span: Span):
+        raise NotImplementedError
+
+    def shutdown(self):
+        pass
+
+
+class NoopSpanExporter(SpanExporter):
+    """Drops every span (tracing disabled)"""
+
+    def export(self, span: Span):
+        pass
+
+
+class ConsoleSpanExporter(SpanExporter):
+    """Writes each finished span as a JSON log line"""
+
+    def __init__(self, logger_name: str = "tracing"):
+        self.logger = logging.getLogger(logger_name)
+
+    def export(self, span: Span):
+        self.logger.info(json.dumps(span.to_dict(), default=str))
+
+
+class FileSpanExporter(SpanExporter):
+    """Appends finished spans to a JSON-lines file for offline analysis.
+
+    export() only queues the span; a background thread writes queued spans in
+    batches, so the event loop never waits on file I/O. Spans arriving while
+    the queue is full are dropped and counted.
+    """
+
+    def __init__(self, path: str = "traces.jsonl", flush_interval: float = 1.0, max_queue: int = 10000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue(max_queue)
+        self._thread = threading.Thread(target=self._run, name="trace-file-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span):
+        try:
+            self._queue.put_nowait(json.dumps(span.to_dict(), default=str))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            try:
+                lines = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while True:
+                try:
+                    lines.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in lines:
+                stopping = True
+                lines = [line for line in lines if line is not None]
+            if lines:
+                self._write(lines)
+
+    def _write(self, lines):
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+        except OSError as e:
+            logging.error(f"Error writing {len(lines)} spans to {self.path}: {e}")
+
+    def shutdown(self):
+        """Write every queued span and stop the writer thread"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+
+
+def exporter_from_env() -> SpanExporter:
+    """Build the exporter selected by TRACE_EXPORTER"""
+    choice = os.environ.get("TRACE_EXPORTER", "none").strip()
+    if choice in ("", "none"):
+        return NoopSpanExporter()
+    if choice == "console":
+        return ConsoleSpanExporter()
+    if choice == "file":
+        return FileSpanExporter(os.environ.get("TRACE_FILE", "traces.jsonl"))
+
+    # Custom exporter given as "module:ClassName"
+    try:
+        module_name, class_name = choice.split(":", 1)
+        exporter_cls = getattr(importlib.import_module(module_name), class_name)
+        return exporter_cls()
+    except Exception as e:
+        logging.error(f"Could not load trace exporter {choice!r}: {e}, tracing disabled")
+        return NoopSpanExporter()
+
+
+class Tracer:
+    """Creates spans and hands finished ones to the configured exporter"""
+
+    def __init__(self, exporter: Optional[SpanExporter] = None):
+        self.exporter = exporter or NoopSpanExporter()
+
+    def set_exporter(self, exporter: SpanExporter):
+        self.exporter.shutdown()
+        self.exporter = exporter
+
+    def shutdown(self):
+        self.exporter.shutdown()
+
+    @property
+    def enabled(self) -> bool:
+        return not isinstance(self.exporter, NoopSpanExporter)
+
+    def current_span(self) -> Optional[Span]:
+        return _current_span.get()
+
+    def set_attribute(self, key: str, value: Any):
+        """Set an attribute on the current span, if there is one"""
+        span = _current_span.get()
+        if span is not None:
+            span.set_attribute(key, value)
+
+    @contextmanager
+    def span(self, name: str, trace_id: Optional[str] = None, parent_id: Optional[str] = None, **attributes) -> Iterator[Span]:
+        """Open a child of the current span (or a new trace root)"""
+        parent = _current_span.get()
+        if parent is not None:
+            trace_id = trace_id or parent.trace_id
+            parent_id = parent_id or parent.span_id
+
+        span = Span(name, trace_id or uuid.uuid4().hex, parent_id, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            span.end()
+            _current_span.reset(token)
+            try:
+                self.exporter.export(span)
+            except Exception as e:
+                logging.error(f"Error exporting span {span.name}: {e}")
+
+
+def parse_traceparent(header: Optional[str]):
+    """Extract (trace_id, parent_span_id) from a W3C traceparent header"""
+    if not header:
+        return None, None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None, None
+    return parts[1], parts[2]
+
+
+tracer = Tracer(exporter_from_env())
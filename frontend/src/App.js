@@ -31,6 +31,7 @@ function App() {
   const [bettyCurrentWeek, setBettyCurrentWeek] = useState(null);
   const [bettyPredictions, setBettyPredictions] = useState(null);
   const [bettyHistory, setBettyHistory] = useState(null);
+  const [loadingOlderHistory, setLoadingOlderHistory] = useState(false);
   const [showBettyPredictions, setShowBettyPredictions] = useState(false);
   const [showBettyHistory, setShowBettyHistory] = useState(false);
   const [showPremiumModal, setShowPremiumModal] = useState(false);
@@ -205,6 +206,10 @@ function App() {
     }
   };
 
+  // History pages are newest first; number weeks from Betty's first evaluated week
+  const historyWeekNumber = (index) =>
+    (bettyHistory?.total_weeks ?? bettyHistory?.weekly_results.length ?? 0) - index;
+
   const fetchBettyHistory = async () => {
     try {
       const response = await axios.get(`${API}/betty/history`);
@@ -214,6 +219,25 @@ function App() {
     }
   };
 
+  // Append the next (older) page of weeks using the cursor from the last page
+  const fetchOlderBettyHistory = async () => {
+    if (!bettyHistory?.next_before_week) return;
+    setLoadingOlderHistory(true);
+    try {
+      const response = await axios.get(`${API}/betty/history`, {
+        params: { before_week: bettyHistory.next_before_week }
+      });
+      setBettyHistory(previous => ({
+        ...response.data,
+        weekly_results: [...previous.weekly_results, ...response.data.weekly_results]
+      }));
+    } catch (error) {
+      console.error('Error fetching older Betty history:', error);
+    } finally {
+      setLoadingOlderHistory(false);
+    }
+  };
+
   const fetchTrialInsights = async () => {
     if (!user?.trialActive || !user?.emailVerified) {
       setShowVerifyEmailModal(true);
@@ -692,11 +716,12 @@ function App() {
                           <div className="mb-4">
                             <h4 className="text-white font-semibold mb-3">📈 Historical Performance</h4>
                             <div className="space-y-3">
+                              {/* weekly_results is newest first: show the two most recent weeks */}
                               {bettyHistory.weekly_results.slice(0, 2).map((week, index) => (
                                 <div key={week.week_start} className="p-3 bg-slate-800/50 rounded-lg border border-slate-700">
                                   <div className="flex justify-between items-center mb-2">
                                     <span className="text-sm font-medium text-white">
-                                      Week {index === 0 ? '2' : '1'} ({new Date(week.week_start).toLocaleDateString()})
+                                      Week {historyWeekNumber(index)} ({new Date(week.week_start).toLocaleDateString()})
                                     </span>
                                     <span className={`text-sm font-bold ${week.week_accuracy >= 70 ? 'text-emerald-400' : 'text-yellow-400'}`}>
                                       {week.correct_count}/{week.total_count} ({week.week_accuracy}%)
@@ -1457,7 +1482,7 @@ function App() {
                         <div className="flex justify-between items-start mb-4">
                           <div>
                             <h4 className="font-semibold text-white">
-                              Week {bettyHistory.weekly_results.length - index} 
+                              Week {historyWeekNumber(index)} 
                               ({new Date(week.week_start).toLocaleDateString('en-US', { 
                                 month: 'short', day: 'numeric', year: 'numeric' 
                               })} - {new Date(new Date(week.week_start).getTime() + 6 * 24 * 60 * 60 * 1000).toLocaleDateString('en-US', { 
@@ -1515,6 +1540,19 @@ function App() {
                     </Card>
                   ))}
                 </div>
+                {bettyHistory.next_before_week && (
+                  <div className="mt-4 text-center">
+                    <Button
+                      onClick={fetchOlderBettyHistory}
+                      disabled={loadingOlderHistory}
+                      variant="outline"
+                      size="sm"
+                      className="border-slate-600 text-slate-300 hover:bg-slate-700"
+                    >
+                      {loadingOlderHistory ? 'Loading...' : 'Load older weeks'}
+                    </Button>
+                  </div>
+                )}
               </div>
             )}
 
@@ -0,0 +1,56 @@
+"""Shared fixtures: backend modules on sys.path, an in-memory MongoDB (mongomock-motor) and prediction factories."""
+import os
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "betty_test")
+os.environ.setdefault("LLM_BACKEND", "stub")
+
+WEEK = datetime(2026, 10, 5, tzinfo=timezone.utc)
+
+
+def prediction_doc(prediction_id, asset_type="crypto", was_correct=None, week_start=WEEK):
+    """A betty_predictions document with the fields the stats count"""
+    return {"id": prediction_id, "week_start": week_start, "asset_type": asset_type, "was_correct": was_correct}
+
+
+def betty_prediction(server, symbol, asset_type="crypto", price=100.0, direction="up", week_start=WEEK):
+    """A full BettyPrediction model"""
+    return server.BettyPrediction(
+        week_start=week_start, asset_symbol=symbol, asset_name=symbol, asset_type=asset_type,
+        current_price=price, direction=direction, predicted_change_percent=2.0,
+        predicted_target_price=price * 1.02, confidence_level=0.7, reasoning="test"
+    )
+
+
+@pytest.fixture
+def mongo_client():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    return mongomock_motor.AsyncMongoMockClient(tz_aware=True)
+
+
+@pytest.fixture
+def db(mongo_client):
+    return mongo_client["betty_test"]
+
+
+@pytest.fixture
+def server(monkeypatch, mongo_client, db):
+    """The API module wired to the in-memory database (startup hooks are not run)"""
+    import server as server_module
+    monkeypatch.setattr(server_module, "client", mongo_client)
+    monkeypatch.setattr(server_module, "db", db)
+    return server_module
+
+
+@pytest.fixture
+def api(server):
+    from fastapi.testclient import TestClient
+    return TestClient(server.app)
@@ -0,0 +1,85 @@
+"""Backtest grid and lookback validation, and a serial run over synthetic prices."""
+import numpy as np
+import pytest
+
+import backtest
+from backtest import run_backtests, validate_grids
+
+
+def price_matrix(n_assets=4, n_days=120, seed=0):
+    rng = np.random.default_rng(seed)
+    closes = 100 * np.cumprod(1 + rng.normal(0, 0.01, (n_assets, n_days)), axis=1)
+    dates = np.datetime64("2025-01-01") + np.arange(n_days)
+    return closes, dates
+
+
+@pytest.fixture
+def no_pool(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("process pool started")
+    monkeypatch.setattr(backtest, "ProcessPoolExecutor", fail)
+
+
+@pytest.mark.parametrize("grids, message", [
+    ({}, "No strategies"),
+    ({"nope": {"top_n": [3]}}, "Unknown strategies: nope"),
+    ({"momentum": {}}, "Grid for momentum is empty"),
+    ({"momentum": {"top_n": [3], "momentum_window": []}}, "momentum_window"),
+    ({"momentum": {"momentum_window": 10}}, "momentum_window"),
+])
+def test_invalid_grids_are_rejected_before_the_pool(grids, message, no_pool):
+    closes, dates = price_matrix()
+    with pytest.raises(ValueError, match=message):
+        run_backtests(closes, dates, grids, max_workers=4)
+
+
+@pytest.mark.parametrize("lookback_days", [1, 120, 500])
+def test_lookback_must_fit_the_series(lookback_days, no_pool):
+    closes, dates = price_matrix(n_days=120)
+    with pytest.raises(ValueError, match="lookback_days"):
+        run_backtests(closes, dates, {"momentum": {"top_n": [3]}}, max_workers=4, lookback_days=lookback_days)
+
+
+def test_serial_run_scores_every_combination():
+    closes, dates = price_matrix()
+    results = run_backtests(closes, dates, {"momentum": {"top_n": [2], "momentum_window": [5, 10]}},
+                            max_workers=1, lookback_days=20)
+    assert len(results) == 2
+    assert all(result["weeks"] > 0 and result["predictions"] == 2 * result["weeks"] for result in results)
+    assert results[0]["mean_accuracy"] >= results[1]["mean_accuracy"]
+
+
+def test_default_grids_are_valid():
+    validate_grids(backtest.DEFAULT_GRIDS)
+
+
+def test_endpoint_rejects_an_empty_grid_before_downloading(server, api, monkeypatch):
+    async def no_download(*args, **kwargs):
+        raise AssertionError("prices downloaded for an invalid grid")
+    monkeypatch.setattr(server, "download_daily_closes", no_download)
+    server.app.dependency_overrides[server.require_auth] = lambda: None
+    try:
+        response = api.post("/api/betty/backtests", json={"grids": {"quant": {"top_n": []}}})
+    finally:
+        server.app.dependency_overrides.clear()
+    assert response.status_code == 400
+    assert "top_n" in response.json()["detail"]
+
+
+def test_weekday_only_assets_survive_alignment_with_crypto():
+    dates = np.datetime64("2025-01-06") + np.arange(70)  # starts on a Monday
+    weekend = (dates.astype(np.int64) + 3) % 7 >= 5
+    crypto = 100 + np.arange(70, dtype=float)
+    fx = np.where(weekend, np.nan, 1.1)
+    gold = np.where(weekend, np.nan, 2000.0)
+    gold[10] = np.nan  # a market holiday
+    late_listing = np.where(np.arange(70) < 40, np.nan, 5.0)
+
+    symbols, closes, aligned = backtest.align_price_matrix(
+        {"BTC-USD": crypto, "EURUSD=X": fx, "GC=F": gold, "NEW-USD": late_listing}, dates
+    )
+    assert symbols == ["BTC-USD", "EURUSD=X", "GC=F"]
+    assert np.isfinite(closes).all()
+    assert closes.shape == (3, len(aligned)) and len(aligned) == 70
+    # weekend and holiday gaps are forward-filled from the last close
+    assert closes[1, 5] == 1.1 and closes[2, 10] == 2000.0
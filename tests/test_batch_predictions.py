@@ -0,0 +1,58 @@
+"""Batch predictions: one LLM call per packed group, per-asset fetch errors, cached assets skipped."""
+import asyncio
+import json
+import re
+
+import pandas as pd
+from fastapi import HTTPException
+
+from llm_gateway import LLMGateway, StubLLMBackend
+
+PRICES = {"BTC-USD": 121000.0, "ETH-USD": 4500.0}
+
+
+def fake_history(symbol, ticker_symbol):
+    if ticker_symbol not in PRICES:
+        raise HTTPException(status_code=404, detail=f"No data found for {symbol}")
+    price = PRICES[ticker_symbol]
+    hist = pd.DataFrame({"Close": [price * 0.98, price * 0.99, price]})
+    return hist, price, 1.01
+
+
+def batch(server, *symbols):
+    request = server.BatchPredictionRequest(assets=[{"symbol": symbol, "asset_type": "crypto"} for symbol in symbols])
+    return asyncio.run(server.get_batch_predictions(request))
+
+
+def test_batch_shares_one_llm_call_and_reports_missing_assets(server, monkeypatch):
+    prompts = []
+
+    def answer(prompt):
+        prompts.append(prompt)
+        symbols = re.findall(r"^- (\S+) \(", prompt, flags=re.MULTILINE)
+        return json.dumps({symbol: f"{symbol} looks strong" for symbol in symbols})
+
+    monkeypatch.setattr(server, "fetch_prediction_history", fake_history)
+    monkeypatch.setattr(server, "llm_gateway", LLMGateway(StubLLMBackend(responders={"predict_batch": answer})))
+
+    body = batch(server, "BTC", "ETH", "NOPE", "BTC")
+    assert len(prompts) == 1
+    assert {p["symbol"]: p["prediction"]["analysis"] for p in body["predictions"]} == {
+        "BTC": "BTC looks strong", "ETH": "ETH looks strong"
+    }
+    assert all(p["cached"] is False for p in body["predictions"])
+    assert body["errors"] == [{"symbol": "NOPE", "asset_type": "crypto", "detail": "No data found for NOPE"}]
+
+    again = batch(server, "BTC", "ETH")
+    assert len(prompts) == 1
+    assert all(p["cached"] is True for p in again["predictions"])
+
+
+def test_batch_falls_back_when_the_llm_answer_is_unusable(server, monkeypatch):
+    monkeypatch.setattr(server, "fetch_prediction_history", fake_history)
+    monkeypatch.setattr(server, "llm_gateway",
+                        LLMGateway(StubLLMBackend(responders={"predict_batch": lambda prompt: "no json here"})))
+
+    body = batch(server, "BTC")
+    assert body["predictions"][0]["prediction"]["analysis"].startswith("Betty's Weekly Analysis for BTC")
+    assert asyncio.run(server.db.prediction_cache.count_documents({})) == 0
@@ -0,0 +1,111 @@
+"""Materialized accuracy stats: increments, concurrent evaluations and the unique score index."""
+import asyncio
+
+import pytest
+from pymongo import ASCENDING, ReplaceOne
+from pymongo.errors import BulkWriteError
+
+from betty_stats import delete_predictions, get_stats, insert_predictions, rebuild_stats, record_evaluations
+from db_indexes import INDEX_SPECS, ensure_indexes
+from migrations import dedupe_accuracy_scores
+from tests.conftest import WEEK, prediction_doc
+
+
+def evaluate(mongo_client, db, outcomes):
+    """outcomes: {prediction_id: was_correct}"""
+    return record_evaluations(
+        mongo_client, db,
+        results={pid: {"was_correct": correct, "final_price": 1.0} for pid, correct in outcomes.items()},
+        accuracy_writes=[
+            ReplaceOne({"prediction_id": pid}, {"prediction_id": pid, "was_direction_correct": correct}, upsert=True)
+            for pid, correct in outcomes.items()
+        ]
+    )
+
+
+async def stored_stats(db):
+    doc = await db.betty_stats.find_one({})
+    doc.pop("updated_at")
+    return doc
+
+
+def test_insert_and_evaluate_update_every_breakdown(mongo_client, db):
+    async def scenario():
+        await insert_predictions(mongo_client, db, [prediction_doc("a"), prediction_doc("b"), prediction_doc("c", "metal")])
+        await evaluate(mongo_client, db, {"a": True, "b": False, "c": True})
+        return await get_stats(db, WEEK), await stored_stats(db)
+
+    stats, doc = asyncio.run(scenario())
+    assert stats == {"predictions": 3, "evaluated": 3, "correct": 2,
+                     "week": {"predictions": 3, "evaluated": 3, "correct": 2}}
+    assert doc["asset_types"] == {"crypto": {"predictions": 2, "evaluated": 2, "correct": 1},
+                                  "metal": {"predictions": 1, "evaluated": 1, "correct": 1}}
+
+
+def test_concurrent_evaluations_count_each_prediction_once(mongo_client, db):
+    async def scenario():
+        await insert_predictions(mongo_client, db, [prediction_doc("a"), prediction_doc("b")])
+        await asyncio.gather(*(evaluate(mongo_client, db, {"a": True, "b": True}) for _ in range(4)))
+        return await get_stats(db)
+
+    stats = asyncio.run(scenario())
+    assert (stats["evaluated"], stats["correct"]) == (2, 2)
+
+
+def test_re_evaluation_moves_the_correct_count(mongo_client, db):
+    async def scenario():
+        await insert_predictions(mongo_client, db, [prediction_doc("a")])
+        await evaluate(mongo_client, db, {"a": True})
+        await evaluate(mongo_client, db, {"a": False})
+        after_flip = await get_stats(db)
+        await evaluate(mongo_client, db, {"a": False})
+        return after_flip, await get_stats(db)
+
+    after_flip, after_repeat = asyncio.run(scenario())
+    assert (after_flip["evaluated"], after_flip["correct"]) == (1, 0)
+    assert after_repeat == after_flip
+
+
+def test_delete_and_rebuild_agree_with_increments(mongo_client, db):
+    async def scenario():
+        await insert_predictions(mongo_client, db, [prediction_doc("a"), prediction_doc("b", was_correct=True)])
+        await asyncio.gather(delete_predictions(mongo_client, db, ["b"]), delete_predictions(mongo_client, db, ["b"]))
+        incremental = await get_stats(db, WEEK)
+        await rebuild_stats(db)
+        return incremental, await get_stats(db, WEEK)
+
+    incremental, rebuilt = asyncio.run(scenario())
+    assert (incremental["predictions"], incremental["evaluated"], incremental["correct"]) == (1, 0, 0)
+    assert incremental == rebuilt
+
+
+def test_unique_score_index_after_dedupe(mongo_client, db):
+    specs = {"betty_accuracy": INDEX_SPECS["betty_accuracy"]}
+
+    async def scenario():
+        await db.betty_accuracy.create_index([("prediction_id", ASCENDING)], name="prediction_id")
+        await db.betty_accuracy.insert_many([{"prediction_id": "a", "n": 1}, {"prediction_id": "a", "n": 2},
+                                             {"prediction_id": "b", "n": 3}])
+        blocked = await ensure_indexes(db, specs)
+        removed = await dedupe_accuracy_scores(mongo_client, db)
+        built = await ensure_indexes(db, specs)
+        return blocked, removed, built, await db.betty_accuracy.find({}, {"_id": 0}).to_list(None)
+
+    blocked, removed, built, scores = asyncio.run(scenario())
+    assert blocked["betty_accuracy"]["created"] == []
+    assert removed == {"removed": 1}
+    assert built["betty_accuracy"] == {"created": ["prediction_id_unique"], "mismatched": [], "extra": []}
+    assert sorted((s["prediction_id"], s["n"]) for s in scores) == [("a", 2), ("b", 3)]
+
+
+def test_prediction_ids_are_unique(mongo_client, db):
+    async def scenario():
+        built = await ensure_indexes(db, {"betty_predictions": INDEX_SPECS["betty_predictions"]})
+        await insert_predictions(mongo_client, db, [prediction_doc("a")])
+        with pytest.raises(BulkWriteError):
+            await insert_predictions(mongo_client, db, [prediction_doc("a")])
+        return built, await get_stats(db)
+
+    built, stats = asyncio.run(scenario())
+    assert "id_unique" in built["betty_predictions"]["created"]
+    assert stats["predictions"] == 1
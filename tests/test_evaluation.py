@@ -0,0 +1,80 @@
+"""Point-in-time evaluation: predictions are scored only against closes inside their week."""
+import asyncio
+
+import pandas as pd
+import pytest
+
+from tests.conftest import WEEK, betty_prediction
+
+
+def closes(server, rows):
+    """rows: {(symbol, asset_type): {date: close}} as a download_daily_closes frame"""
+    return pd.DataFrame({
+        server.prediction_ticker_symbol(symbol, asset_type): pd.Series(
+            list(by_date.values()), index=pd.to_datetime(list(by_date))
+        )
+        for (symbol, asset_type), by_date in rows.items()
+    })
+
+
+@pytest.fixture
+def no_live_prices(server, monkeypatch):
+    async def fail():
+        raise AssertionError("evaluation fetched live prices")
+    for name in ("fetch_crypto", "fetch_currencies", "fetch_metals"):
+        monkeypatch.setattr(server, name, fail)
+
+
+def test_week_end_close_is_the_last_close_inside_the_week(server, monkeypatch):
+    frame = closes(server, {
+        ("BTC", "crypto"): {"2026-10-09": 101.0, "2026-10-11": 103.0, "2026-10-13": 110.0},
+        ("ETH", "crypto"): {"2026-10-13": 50.0},
+    })
+
+    async def download(tickers, **range_kwargs):
+        return frame
+    monkeypatch.setattr(server, "download_daily_closes", download)
+
+    final = asyncio.run(server.fetch_week_end_closes([betty_prediction(server, "BTC"), betty_prediction(server, "ETH")]))
+    assert final == [103.0, None]
+
+
+def test_missing_close_leaves_the_prediction_pending(server, no_live_prices):
+    predictions = [betty_prediction(server, "BTC"), betty_prediction(server, "ETH")]
+    scores = asyncio.run(server.betty_evaluate_predictions(predictions, [103.0, None]))
+    assert [score.prediction_id for score in scores] == [predictions[0].id]
+    assert scores[0].was_direction_correct is True
+    assert asyncio.run(server.betty_evaluate_predictions(predictions, [None, None])) == []
+
+
+def test_evaluate_endpoint_scores_what_it_can_and_reruns_the_rest(server, api, db, monkeypatch, no_live_prices):
+    btc, eth = betty_prediction(server, "BTC"), betty_prediction(server, "ETH", price=50.0, direction="down")
+    asyncio.run(db.betty_reports.insert_one({
+        "week_start": WEEK, "status": "ready", "predictions": [btc.dict(), eth.dict()]
+    }))
+    asyncio.run(db.betty_predictions.insert_many([btc.dict(), eth.dict()]))
+    server.app.dependency_overrides[server.require_auth] = lambda: None
+    available = {("BTC", "crypto"): {"2026-10-10": 104.0}}
+
+    async def download(tickers, **range_kwargs):
+        return closes(server, available)
+    monkeypatch.setattr(server, "download_daily_closes", download)
+
+    try:
+        first = api.post("/api/betty/evaluate", params={"week_start": "2026-10-05"}).json()
+        assert first["pending"] == 1
+        assert [s["prediction_id"] for s in first["individual_scores"]] == [btc.id]
+        stored = {p["id"]: p for p in asyncio.run(db.betty_predictions.find({}).to_list(None))}
+        assert stored[btc.id]["final_price"] == 104.0
+        assert stored[eth.id]["was_correct"] is None
+
+        # The ETH close shows up later; the partially evaluated week is picked up again
+        available[("ETH", "crypto")] = {"2026-10-11": 48.0}
+        second = api.post("/api/betty/evaluate", params={"week_start": "2026-10-05"}).json()
+        assert second["pending"] == 0
+        report = asyncio.run(db.betty_reports.find_one({"week_start": WEEK}))
+        assert len(report["accuracy_scores"]) == 2
+        stored = {p["id"]: p for p in asyncio.run(db.betty_predictions.find({}).to_list(None))}
+        assert stored[eth.id]["was_correct"] is True
+    finally:
+        server.app.dependency_overrides.clear()
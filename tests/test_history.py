@@ -0,0 +1,34 @@
+"""Betty's history pages: newest week first, week numbering and the before_week cursor."""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from betty_stats import insert_predictions
+
+FIRST_WEEK = datetime(2026, 9, 14, tzinfo=timezone.utc)
+
+
+def seed_weeks(mongo_client, db, correct_per_week):
+    """One week per entry, each with three evaluated predictions"""
+    predictions = [
+        {"id": f"{week}-{i}", "week_start": FIRST_WEEK + timedelta(days=7 * week),
+         "asset_type": "crypto", "was_correct": i < correct}
+        for week, correct in enumerate(correct_per_week) for i in range(3)
+    ]
+    asyncio.run(insert_predictions(mongo_client, db, predictions))
+
+
+def test_summary_pages_are_newest_first_with_week_numbers(mongo_client, db, api):
+    seed_weeks(mongo_client, db, [3, 2, 1])
+
+    first = api.get("/api/betty/history", params={"summary_only": True, "limit": 2}).json()
+    assert [week["week_start"] for week in first["weekly_results"]] == ["2026-09-28", "2026-09-21"]
+    assert first["total_weeks"] == 3
+    assert [week["cumulative_accuracy"] for week in first["weekly_results"]] == [66.7, 83.3]
+    assert first["next_before_week"] == "2026-09-21"
+
+    second = api.get("/api/betty/history", params={
+        "summary_only": True, "limit": 2, "before_week": first["next_before_week"]
+    }).json()
+    assert [week["week_start"] for week in second["weekly_results"]] == ["2026-09-14"]
+    assert second["next_before_week"] is None
+    assert (second["total_predictions"], second["total_correct"]) == (9, 6)
@@ -0,0 +1,86 @@
+"""LLM gateway: retries, deadlines and the per-route and global concurrency caps."""
+import asyncio
+
+import pytest
+
+from llm_gateway import LLMError, LLMGateway, LLMTimeout, StubLLMBackend
+
+
+class FlakyBackend(StubLLMBackend):
+    """Fails the first `failures` attempts, then hangs (or answers if hang is False)"""
+
+    def __init__(self, failures, hang=True):
+        super().__init__()
+        self.failures, self.hang, self.attempts = failures, hang, 0
+
+    async def complete(self, route, system_message, prompt):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise ConnectionError("provider unavailable")
+        if self.hang:
+            await asyncio.sleep(10)
+        return await super().complete(route, system_message, prompt)
+
+
+class CountingBackend(StubLLMBackend):
+    """Records the most calls in flight at once"""
+
+    def __init__(self):
+        super().__init__(latency_ms=20)
+        self.in_flight = self.peak = 0
+
+    async def complete(self, route, system_message, prompt):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            return await super().complete(route, system_message, prompt)
+        finally:
+            self.in_flight -= 1
+
+
+def test_retries_recover_from_transient_errors():
+    backend = FlakyBackend(failures=2, hang=False)
+    gateway = LLMGateway(backend, max_retries=2, retry_base_seconds=0)
+    assert asyncio.run(gateway.complete("predict", "system", "prompt")).startswith("Betty's predict analysis")
+    assert backend.attempts == 3
+
+
+def test_exhausted_retries_raise_llm_error():
+    backend = FlakyBackend(failures=10)
+    gateway = LLMGateway(backend, max_retries=2, retry_base_seconds=0)
+    with pytest.raises(LLMError) as raised:
+        asyncio.run(gateway.complete("predict", "system", "prompt"))
+    assert not isinstance(raised.value, LLMTimeout)
+    assert backend.attempts == 3
+
+
+def test_retry_that_outlives_the_deadline_raises_timeout():
+    backend = FlakyBackend(failures=1)
+    gateway = LLMGateway(backend, timeout_seconds=0.1, max_retries=2, retry_base_seconds=0)
+    with pytest.raises(LLMTimeout):
+        asyncio.run(gateway.complete("predict", "system", "prompt"))
+    assert backend.attempts == 2
+
+
+def test_route_limit_caps_concurrency():
+    backend = CountingBackend()
+    gateway = LLMGateway(backend, max_concurrency=8, route_limits={"predict": 2})
+
+    async def scenario():
+        await asyncio.gather(*(gateway.complete("predict", "system", f"prompt {i}") for i in range(6)))
+
+    asyncio.run(scenario())
+    assert backend.peak == 2
+
+
+def test_global_limit_caps_concurrency_across_routes():
+    backend = CountingBackend()
+    gateway = LLMGateway(backend, max_concurrency=3, route_limits={"predict": 3, "premium_insights": 3})
+
+    async def scenario():
+        await asyncio.gather(*(gateway.complete(route, "system", f"prompt {i}")
+                               for route in ("predict", "premium_insights") for i in range(4)))
+
+    asyncio.run(scenario())
+    assert backend.peak == 3
+    assert gateway.stats()["in_flight"] == {}
@@ -0,0 +1,78 @@
+"""Migration runner: each step runs once, concurrent runners serialize, failures resume."""
+import asyncio
+
+import pytest
+
+import migrations
+from betty_stats import get_stats
+from migrations import MIGRATIONS, acquire_lock, run_migrations
+
+# $toDate pipeline updates aren't supported by mongomock
+MONGOMOCK_STEPS = [migration for migration in MIGRATIONS if migration[1] not in
+                   ("convert_expiry_dates", "convert_prediction_dates")]
+
+
+def counting_steps(calls, fail_at=None):
+    def step(name):
+        async def run(client, db):
+            if name == fail_at:
+                raise RuntimeError(f"{name} failed")
+            calls.append(name)
+            return {"step": name}
+        return run
+    return [(1, "first", step("first")), (2, "second", step("second")), (3, "third", step("third"))]
+
+
+def test_steps_run_once(mongo_client, db):
+    calls = []
+
+    async def scenario():
+        first = await run_migrations(mongo_client, db, counting_steps(calls))
+        second = await run_migrations(mongo_client, db, counting_steps(calls))
+        return first, second, await db.schema_migrations.find({}, {"_id": 1}).to_list(None)
+
+    first, second, records = asyncio.run(scenario())
+    assert first == ["first", "second", "third"]
+    assert second == []
+    assert calls == ["first", "second", "third"]
+    assert sorted(record["_id"] for record in records) == [1, 2, 3]  # the lock was released
+
+
+def test_concurrent_runners_apply_each_step_once(mongo_client, db):
+    calls = []
+
+    async def scenario():
+        return await asyncio.gather(*(run_migrations(mongo_client, db, counting_steps(calls)) for _ in range(3)))
+
+    results = asyncio.run(scenario())
+    assert calls == ["first", "second", "third"]
+    assert sorted(len(applied) for applied in results) == [0, 0, 3]
+
+
+def test_failed_step_is_retried_from_where_it_stopped(mongo_client, db):
+    calls = []
+    with pytest.raises(RuntimeError):
+        asyncio.run(run_migrations(mongo_client, db, counting_steps(calls, fail_at="second")))
+    assert asyncio.run(run_migrations(mongo_client, db, counting_steps(calls))) == ["second", "third"]
+    assert calls == ["first", "second", "third"]
+
+
+def test_lock_held_by_another_owner_times_out(mongo_client, db):
+    assert asyncio.run(acquire_lock(db, "other-worker"))
+    with pytest.raises(migrations.MigrationLockTimeout):
+        asyncio.run(run_migrations(mongo_client, db, counting_steps([]), wait_seconds=0))
+
+
+def test_seed_and_data_fixes_are_idempotent(mongo_client, db):
+    async def scenario():
+        await run_migrations(mongo_client, db, MONGOMOCK_STEPS)
+        after_first = (await db.betty_predictions.count_documents({}), await get_stats(db))
+        # Forget the records, as if every step ran again from scratch
+        await db.schema_migrations.delete_many({})
+        await run_migrations(mongo_client, db, MONGOMOCK_STEPS)
+        return after_first, (await db.betty_predictions.count_documents({}), await get_stats(db))
+
+    after_first, after_second = asyncio.run(scenario())
+    assert after_first[0] == 9
+    assert after_first == after_second
+    assert (after_first[1]["evaluated"], after_first[1]["correct"]) == (6, 5)
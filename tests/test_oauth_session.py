@@ -0,0 +1,49 @@
+import asyncio
+
+from db_indexes import INDEX_SPECS, ensure_indexes
+
+
+def oauth_payload(**overrides):
+    payload = {"id": "user-1", "email": "amy@example.com", "name": "Amy", "picture": None, "session_token": "tok-1"}
+    payload.update(overrides)
+    return payload
+
+
+def create_indexes(db):
+    # mongomock ignores partialFilterExpression, so leave out the username index
+    specs = {
+        "users": [spec for spec in INDEX_SPECS["users"] if spec["name"] == "email_unique"],
+        "user_sessions": INDEX_SPECS["user_sessions"],
+    }
+    asyncio.run(ensure_indexes(db, specs))
+
+
+def test_returning_user_gets_a_new_session(api, db):
+    create_indexes(db)
+    assert api.post("/api/auth/session", json=oauth_payload()).status_code == 200
+    assert api.post("/api/auth/session", json=oauth_payload(session_token="tok-2")).status_code == 200
+
+    assert asyncio.run(db.users.count_documents({})) == 1
+    assert asyncio.run(db.user_sessions.count_documents({"user_id": "user-1"})) == 2
+
+
+def test_reposting_a_session_refreshes_it(api, db):
+    create_indexes(db)
+    assert api.post("/api/auth/session", json=oauth_payload()).status_code == 200
+    assert api.post("/api/auth/session", json=oauth_payload()).status_code == 200
+
+    assert asyncio.run(db.user_sessions.count_documents({"session_token": "tok-1"})) == 1
+
+
+def test_conflicting_email_or_token_is_rejected(api, db):
+    create_indexes(db)
+    assert api.post("/api/auth/session", json=oauth_payload()).status_code == 200
+
+    duplicate_email = api.post("/api/auth/session", json=oauth_payload(id="user-2", session_token="tok-9"))
+    assert duplicate_email.status_code == 409
+    stolen_token = api.post("/api/auth/session", json=oauth_payload(id="user-3", email="bob@example.com"))
+    assert stolen_token.status_code == 409
+
+
+def test_missing_fields_are_a_bad_request(api):
+    assert api.post("/api/auth/session", json={"id": "user-1"}).status_code == 400
@@ -0,0 +1,40 @@
+import asyncio
+import hashlib
+
+import pytest
+
+import passwords
+from passwords import PasswordHasher, PasswordHasherBusy, hash_password, verify_password
+
+
+def test_hash_round_trip_with_random_salt():
+    stored = hash_password("hunter2")
+    assert stored.startswith("scrypt$")
+    assert hash_password("hunter2") != stored
+    assert verify_password("hunter2", stored) == (True, False)
+    assert verify_password("hunter3", stored) == (False, False)
+
+
+def test_legacy_sha256_hashes_verify_and_need_rehash():
+    legacy = hashlib.sha256(b"hunter2").hexdigest()
+    assert verify_password("hunter2", legacy) == (True, True)
+    assert verify_password("wrong", legacy) == (False, True)
+
+
+def test_old_cost_parameters_need_rehash(monkeypatch):
+    monkeypatch.setattr(passwords, "SCRYPT_N", 2 ** 12)
+    stored = hash_password("hunter2")
+    monkeypatch.setattr(passwords, "SCRYPT_N", 2 ** 14)
+    assert verify_password("hunter2", stored) == (True, True)
+
+
+@pytest.mark.parametrize("stored", ["", "bcrypt$1$2$3$c2FsdA==$aGFzaA==", "scrypt$x$8$1$c2FsdA==$aGFzaA=="])
+def test_malformed_hashes_never_match(stored):
+    assert verify_password("anything", stored) == (False, False)
+
+
+def test_hasher_rejects_work_beyond_the_queue_limit():
+    hasher = PasswordHasher(max_workers=1, max_pending=0)
+    with pytest.raises(PasswordHasherBusy):
+        asyncio.run(hasher.hash("hunter2"))
+    hasher.shutdown()
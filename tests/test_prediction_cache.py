@@ -0,0 +1,90 @@
+"""Per-asset prediction cache: hits skip market data, price moves miss, failed writes don't lose the analysis."""
+import asyncio
+from datetime import datetime, timezone
+
+import pandas as pd
+
+
+def fake_history(symbol, ticker_symbol):
+    hist = pd.DataFrame({"Close": [100.0, 101.0, 102.0, 101.5, 103.0]})
+    return hist, 103.0, 1.48
+
+
+def dashboard_prices(server, monkeypatch, price):
+    monkeypatch.setitem(server.data_cache, "crypto", {
+        "data": [server.AssetPrice(symbol="BTC", name="Bitcoin", price=price, change_24h=0.0, change_percent=0.0)],
+        "last_updated": datetime.now(timezone.utc)
+    })
+
+
+def cache_analysis(server, price):
+    asyncio.run(server.store_cached_analysis(
+        server.prediction_cache_key("BTC-USD", "crypto", price), "BTC-USD", "crypto",
+        "cached analysis", price, 1.48, [100.0, 101.0, 102.0, 101.5, price]
+    ))
+
+
+def no_llm(*args, **kwargs):
+    raise AssertionError("analysis generated on a cache hit")
+
+
+def test_cache_hit_skips_market_data(server, api, monkeypatch):
+    cache_analysis(server, 103.0)
+    dashboard_prices(server, monkeypatch, 103.5)
+
+    def no_fetch(*args):
+        raise AssertionError("market data fetched on a cache hit")
+    monkeypatch.setattr(server, "fetch_prediction_history", no_fetch)
+
+    response = api.get("/api/predict/BTC", params={"asset_type": "crypto"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["cached"] is True
+    assert body["current_price"] == 103.5
+    assert body["prediction"]["analysis"] == "cached analysis"
+
+
+def test_price_move_beyond_the_bucket_is_a_miss(server, api, monkeypatch):
+    cache_analysis(server, 80.0)
+    dashboard_prices(server, monkeypatch, 103.0)
+    monkeypatch.setattr(server, "fetch_prediction_history", fake_history)
+
+    body = api.get("/api/predict/BTC", params={"asset_type": "crypto"}).json()
+    assert body["cached"] is False
+    assert body["current_price"] == 103.0
+    assert body["prediction"]["analysis"] != "cached analysis"
+
+
+def test_cache_checked_after_fetch_without_a_dashboard_price(server, api, monkeypatch):
+    cache_analysis(server, 103.0)
+    monkeypatch.setattr(server, "fetch_prediction_history", fake_history)
+    monkeypatch.setattr(server, "generate_asset_analysis", no_llm)
+
+    body = api.get("/api/predict/BTC", params={"asset_type": "crypto"}).json()
+    assert body["cached"] is True
+    assert body["prediction"]["analysis"] == "cached analysis"
+
+
+def test_cache_miss_generates_and_stores(server, api, monkeypatch):
+    monkeypatch.setattr(server, "fetch_prediction_history", fake_history)
+
+    first = api.get("/api/predict/BTC", params={"asset_type": "crypto"}).json()
+    assert first["cached"] is False
+
+    monkeypatch.setattr(server, "generate_asset_analysis", no_llm)
+    second = api.get("/api/predict/BTC", params={"asset_type": "crypto"}).json()
+    assert second["cached"] is True
+    assert second["prediction"]["analysis"] == first["prediction"]["analysis"]
+
+
+def test_failed_cache_write_still_returns_analysis(server, api, monkeypatch):
+    monkeypatch.setattr(server, "fetch_prediction_history", fake_history)
+
+    async def broken_write(*args, **kwargs):
+        raise RuntimeError("write concern timeout")
+    monkeypatch.setattr(server.db.prediction_cache, "update_one", broken_write)
+
+    response = api.get("/api/predict/BTC", params={"asset_type": "crypto"})
+    assert response.status_code == 200
+    assert response.json()["cached"] is False
+    assert response.json()["prediction"]["analysis"]
@@ -0,0 +1,92 @@
+"""Premium insights buckets: one claim per bucket, stale claims taken over, streams release theirs."""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+
+def age_claim(db, bucket, seconds):
+    past = datetime.now(timezone.utc) - timedelta(seconds=seconds)
+    asyncio.run(db.betty_insights.update_one({"_id": bucket}, {"$set": {"claimed_at": past, "created_at": past}}))
+
+
+def test_only_one_claim_per_bucket(server):
+    first = asyncio.run(server.claim_premium_insights("2026-10-19T10"))
+    assert first is not None
+    assert asyncio.run(server.claim_premium_insights("2026-10-19T10")) is None
+
+
+def test_stale_claim_is_taken_over(server, db):
+    bucket = "2026-10-19T10"
+    crashed = asyncio.run(server.claim_premium_insights(bucket))
+    age_claim(db, bucket, server.PREMIUM_INSIGHTS_CLAIM_TIMEOUT_SECONDS + 1)
+
+    takeover = asyncio.run(server.claim_premium_insights(bucket))
+    assert takeover not in (None, crashed)
+
+    # The crashed generator's late release must not drop the new claim
+    asyncio.run(server.release_premium_insights(bucket, crashed))
+    assert asyncio.run(db.betty_insights.find_one({"_id": bucket}))["claim_id"] == takeover
+
+
+def test_refresh_regenerates_a_bucket_left_pending(server, db, monkeypatch):
+    bucket = server.premium_insights_bucket()
+    asyncio.run(server.claim_premium_insights(bucket))
+    age_claim(db, bucket, server.PREMIUM_INSIGHTS_CLAIM_TIMEOUT_SECONDS + 1)
+
+    async def generate():
+        return "fresh insights"
+    monkeypatch.setattr(server, "generate_premium_insights", generate)
+
+    asyncio.run(server.refresh_premium_insights())
+    doc = asyncio.run(db.betty_insights.find_one({"_id": bucket}))
+    assert (doc["status"], doc["content"]) == ("ready", "fresh insights")
+
+
+def test_stream_closed_early_releases_its_claim(server, db):
+    async def scenario():
+        events = (await server.stream_betty_premium_insights(user=None)).body_iterator
+        first = await events.__anext__()
+        await events.aclose()  # client went away
+        return first, await db.betty_insights.find_one({"_id": server.premium_insights_bucket()})
+
+    first, doc = asyncio.run(scenario())
+    assert first.startswith("event: token")
+    assert doc is None
+    assert asyncio.run(server.claim_premium_insights(server.premium_insights_bucket())) is not None
+
+
+def test_stream_cancelled_mid_generation_releases_its_claim(server, db, monkeypatch):
+    class SlowStreamBackend:
+        configured = True
+
+        async def stream(self, route, system_message, prompt):
+            yield "Betty"
+            await asyncio.sleep(10)
+            yield " sees"
+
+    monkeypatch.setattr(server.llm_gateway, "backend", SlowStreamBackend())
+
+    async def scenario():
+        events = (await server.stream_betty_premium_insights(user=None)).body_iterator
+
+        async def consume():
+            async for _ in events:
+                pass
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await asyncio.sleep(0)  # let the shielded release finish
+        return await db.betty_insights.find_one({"_id": server.premium_insights_bucket()})
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_completed_stream_publishes_the_bucket(server, db):
+    async def scenario():
+        events = (await server.stream_betty_premium_insights(user=None)).body_iterator
+        names = [event.split("\n", 1)[0] async for event in events]
+        return names, await db.betty_insights.find_one({"_id": server.premium_insights_bucket()})
+
+    names, doc = asyncio.run(scenario())
+    assert names[-1] == "event: done" and "event: error" not in names
+    assert doc["status"] == "ready"
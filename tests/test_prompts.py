@@ -0,0 +1,67 @@
+"""Prompt builders: compact tables, per-type price precision and token budgets."""
+import pytest
+
+from prompts import (TOKEN_BUDGETS, PromptBudgetExceeded, asset_table, build_asset_analysis_prompt,
+                     build_batch_analysis_prompt, build_weekly_predictions_prompt, count_tokens, fit_prompt,
+                     format_price, parse_asset_table)
+
+ASSETS = [
+    {"symbol": "BTC", "name": "Bitcoin", "type": "crypto", "price": 121034.567, "change_percent": 2.345},
+    {"symbol": "EURUSD=X", "name": "EUR/USD", "type": "currency", "price": 1.08567891, "change_percent": -0.1},
+    {"symbol": "GC=F", "name": "Gold", "type": "metals", "price": 2412.3456, "change_percent": 0.0},
+]
+
+
+def test_prices_keep_the_precision_that_matters():
+    assert format_price(121034.567, "crypto") == "121030"
+    assert format_price(0.000123456, "crypto") == "0.00012346"
+    assert format_price(1.08567891, "currency") == "1.0857"
+    assert format_price(2412.3456, "metals") == "2412.35"
+
+
+def test_asset_table_round_trips():
+    parsed = parse_asset_table(asset_table(ASSETS))
+    assert [asset["symbol"] for asset in parsed] == ["BTC", "EURUSD=X", "GC=F"]
+    assert [asset["price"] for asset in parsed] == [121030.0, 1.0857, 2412.35]
+    assert [asset["change_percent"] for asset in parsed] == [2.35, -0.1, 0.0]
+
+
+def test_weekly_prompt_embeds_every_asset_within_budget():
+    prompt = build_weekly_predictions_prompt(ASSETS, 0.625, "balanced")
+    assert parse_asset_table(prompt) == parse_asset_table(asset_table(ASSETS))
+    assert "62.5% accuracy" in prompt
+
+
+def test_fit_prompt_drops_rows_until_it_fits():
+    def render(rows):
+        return "Assets to analyze this week:\n" + "\n".join(rows)
+    rows = [f"row {i} " * 10 for i in range(20)]
+    budget = count_tokens(render(rows[:5]))
+
+    assert fit_prompt("test", render, rows, budget=budget) == render(rows[:5])
+    newest = fit_prompt("test", render, rows, budget=budget, keep_last=True).splitlines()[1:]
+    assert newest == rows[-len(newest):] and 0 < len(newest) < len(rows)
+    with pytest.raises(PromptBudgetExceeded):
+        fit_prompt("test", render, rows, budget=1)
+
+
+def test_asset_analysis_prompt_keeps_the_latest_closes():
+    closes = [1000.0 + i for i in range(600)]
+    system_message, prompt = build_asset_analysis_prompt("BTC", "crypto", 1599.0, 1.5, closes)
+    assert "BTC" in system_message
+    assert "Current price: $1599" in prompt and "+1.50%" in prompt
+    closes_line = next(line for line in prompt.splitlines() if line.startswith("Recent daily closes"))
+    assert closes_line.endswith(", 1598, 1599")  # trimmed from the oldest end
+    assert "1000, 1001" not in closes_line
+    assert count_tokens(prompt) <= TOKEN_BUDGETS["predict"]
+
+
+def test_batch_prompt_lists_each_asset():
+    assets = [
+        {"symbol": symbol, "asset_type": asset_type, "current_price": price, "price_change": 1.0,
+         "recent_closes": [price, price]}
+        for symbol, asset_type, price in [("BTC", "crypto", 121000.0), ("EURUSD=X", "currency", 1.0857)]
+    ]
+    prompt = build_batch_analysis_prompt(assets)
+    assert "- BTC (crypto): price 121000, weekly change +1.00%, closes 121000,121000" in prompt
+    assert "- EURUSD=X (currency): price 1.0857" in prompt
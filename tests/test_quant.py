@@ -0,0 +1,49 @@
+"""Quant signals on synthetic series: trend signs, ranking and history alignment."""
+import numpy as np
+
+from quant import MIN_HISTORY_DAYS, align_closes, score_assets, score_series, select_predictions
+
+DAYS = 30
+
+
+def trend(daily_return, noise=0.002):
+    """Closes compounding at daily_return with small alternating noise"""
+    return 100 * np.exp(np.cumsum(daily_return + noise * np.where(np.arange(DAYS) % 2, 1.0, -1.0)))
+
+
+def test_momentum_follows_the_trend():
+    signals = score_assets(np.vstack([trend(0.01), trend(-0.01)]))
+    assert signals["momentum"][0] > 0 > signals["momentum"][1]
+    assert signals["score"][0] > 0 > signals["score"][1]
+    assert signals["expected_change"][0] > 0 > signals["expected_change"][1]
+
+
+def test_reversion_leans_against_a_spike():
+    closes = np.full(DAYS, 100.0) + np.where(np.arange(DAYS) % 2, 0.5, -0.5)
+    closes[-1] = 110.0
+    assert score_series(closes)["reversion"] < 0
+
+
+def test_flat_series_is_neutral():
+    signals = score_series(np.full(DAYS, 100.0))
+    assert signals["score"] == 0.0
+    assert signals["confidence"] == 0.5
+
+
+def test_select_predictions_ranks_by_strength_with_directions():
+    closes = np.vstack([trend(0.001), trend(-0.02), trend(0.02)])
+    picks = select_predictions(["FLAT", "DOWN", "UP"], closes, top_n=2)
+    assert sorted(pick["symbol"] for pick in picks) == ["DOWN", "UP"]
+    assert {pick["symbol"]: pick["direction"] for pick in picks} == {"DOWN": "down", "UP": "up"}
+    assert abs(picks[0]["score"]) >= abs(picks[1]["score"])
+
+
+def test_align_closes_drops_short_and_invalid_histories():
+    symbols, matrix = align_closes({
+        "LONG": list(range(1, 21)),
+        "GAPPY": [1.0, float("nan"), 2.0, 3.0, 0.0, 4.0, 5.0, 6.0, 7.0, 8.0],
+        "SHORT": [1.0] * (MIN_HISTORY_DAYS - 1),
+    })
+    assert symbols == ["LONG", "GAPPY"]
+    assert matrix.shape == (2, 8)
+    assert matrix[0, -1] == 20.0
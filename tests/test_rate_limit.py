@@ -0,0 +1,81 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from starlette.requests import Request
+
+from rate_limit import InMemoryRateLimitBackend, RateLimiter, route_cost
+
+
+def make_request(headers=None, cookies=None, client=("10.0.0.1", 1234)):
+    raw = [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+    if cookies:
+        raw.append((b"cookie", "; ".join(f"{k}={v}" for k, v in cookies.items()).encode()))
+    return Request({"type": "http", "method": "GET", "path": "/api/predict/BTC", "headers": raw, "client": client})
+
+
+@pytest.mark.parametrize("method, path, cost", [
+    ("GET", "/api/predict/BTC", 5),
+    ("GET", "/api/predict/BTC/stream", 5),
+    ("POST", "/api/predict/batch", 20),
+    ("GET", "/api/betty/premium-insights", 10),
+    ("GET", "/api/betty/premium-insights/stream", 10),
+    ("DELETE", "/api/predict/cache", 0),
+    ("OPTIONS", "/api/predict/BTC", 0),
+    ("GET", "/api/predict/BTC/extra", 0),
+    ("GET", "/api/betty/premium-insights-admin", 0),
+])
+def test_route_costs(method, path, cost):
+    assert route_cost(method, path)[0] == cost
+
+
+def test_limiter_rejects_over_budget_and_refunds():
+    limiter = RateLimiter(InMemoryRateLimitBackend(), budget=10, window_seconds=60)
+    assert asyncio.run(limiter.check("ip:a", 5)) is None
+    assert asyncio.run(limiter.check("ip:a", 5)) is None
+    assert asyncio.run(limiter.check("ip:a", 5)) >= 1
+    assert asyncio.run(limiter.check("ip:b", 5)) is None
+
+
+def test_in_memory_backend_is_bounded_lru():
+    backend = InMemoryRateLimitBackend(max_keys=3)
+    for key in ["a", "b", "c"]:
+        asyncio.run(backend.add(key, 1, 1))
+    asyncio.run(backend.add("a", 1, 1))  # touch a, so b is now least recently used
+    for i in range(100):
+        asyncio.run(backend.add(f"flood-{i}", 1, 1))
+    assert len(backend) == 3
+
+    backend = InMemoryRateLimitBackend(max_keys=3)
+    for key in ["a", "b", "c"]:
+        asyncio.run(backend.add(key, 1, 1))
+    asyncio.run(backend.add("a", 1, 1))
+    asyncio.run(backend.add("d", 1, 1))
+    assert asyncio.run(backend.add("a", 1, 0)) == (0, 2)  # a survived with its count
+    assert asyncio.run(backend.add("b", 1, 0)) == (0, 0)  # b was evicted
+
+
+def test_unverified_tokens_and_spoofed_headers_fall_back_to_the_client_ip(server):
+    for token in ["random-1", "random-2"]:
+        request = make_request(headers={"X-Forwarded-For": f"203.0.113.{len(token)}"}, cookies={"session_token": token})
+        assert asyncio.run(server.rate_limit_key(request)) == "ip:10.0.0.1"
+    bearer = make_request(headers={"Authorization": "Bearer made-up"})
+    assert asyncio.run(server.rate_limit_key(bearer)) == "ip:10.0.0.1"
+
+
+def test_trusted_proxy_hop_is_taken_from_the_right(server, monkeypatch):
+    monkeypatch.setattr(server, "TRUST_PROXY_HEADERS", True)
+    monkeypatch.setattr(server, "TRUSTED_PROXY_COUNT", 1)
+    request = make_request(headers={"X-Forwarded-For": "1.1.1.1, 198.51.100.7"})
+    assert asyncio.run(server.rate_limit_key(request)) == "ip:198.51.100.7"
+
+
+def test_valid_session_is_keyed_by_user(server, db):
+    asyncio.run(db.users.insert_one({"_id": "user-1", "username": "amy", "email": "amy@example.com"}))
+    asyncio.run(db.user_sessions.insert_one({
+        "session_token": "good-token", "user_id": "user-1",
+        "expires_at": datetime.now(timezone.utc) + timedelta(days=1)
+    }))
+    server.session_cache.invalidate_token("good-token")
+    request = make_request(cookies={"session_token": "good-token"}, client=("10.0.0.2", 1))
+    assert asyncio.run(server.rate_limit_key(request)) == "user:user-1"
@@ -0,0 +1,49 @@
+import asyncio
+import time
+
+from session_tokens import (BloomFilter, RevocationFilter, is_signed_token, sign_session_token,
+                            verify_session_token)
+
+KEY = b"k" * 32
+
+
+def test_signed_token_round_trip():
+    claims = {"sub": "user-1", "jti": "abc", "exp": time.time() + 60}
+    token = sign_session_token(claims, KEY)
+    assert is_signed_token(token)
+    assert verify_session_token(token, KEY) == claims
+
+
+def test_tampered_wrong_key_and_expired_tokens_are_rejected():
+    token = sign_session_token({"sub": "user-1", "exp": time.time() + 60}, KEY)
+    prefix, payload, signature = token.split(".")
+    forged = sign_session_token({"sub": "admin", "exp": time.time() + 60}, b"other key").split(".")[1]
+
+    assert verify_session_token(f"{prefix}.{forged}.{signature}", KEY) is None
+    assert verify_session_token(token, b"other key") is None
+    assert verify_session_token(f"{prefix}.{payload}", KEY) is None
+    assert verify_session_token(sign_session_token({"sub": "user-1", "exp": time.time() - 1}, KEY), KEY) is None
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000)
+    items = [f"jti-{i}" for i in range(1000)]
+    for item in items:
+        bloom.add(item)
+    assert all(item in bloom for item in items)
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives < 100
+
+
+def test_revocations_sync_between_workers_and_expire(db):
+    issuer, other_worker = RevocationFilter(capacity=100), RevocationFilter(capacity=100)
+    asyncio.run(issuer.revoke(db.revoked_sessions, "live", time.time() + 60))
+    asyncio.run(other_worker.sync(db.revoked_sessions))
+
+    assert other_worker.is_revoked("live")
+    assert not other_worker.is_revoked("never-revoked")
+
+    other_worker.add("expired", time.time() - 1)
+    other_worker.prune()
+    assert not other_worker.is_revoked("expired")
+    assert other_worker.is_revoked("live")
@@ -0,0 +1,87 @@
+"""SSE prediction stream: a failing LLM stream is reported, not silently replaced."""
+import asyncio
+import sys
+
+import pandas as pd
+import pytest
+
+import llm_gateway
+from llm_gateway import EmergentLLMBackend, LLMError
+
+
+class FailingStreamBackend:
+    configured = True
+
+    async def complete(self, route, system_message, prompt):
+        raise AssertionError("stream fell back to complete()")
+
+    async def stream(self, route, system_message, prompt):
+        raise LLMError("provider unavailable")
+        yield  # pragma: no cover
+
+
+def sse_events(body: str):
+    return [block.split("\n", 1)[0].removeprefix("event: ") for block in body.strip().split("\n\n")]
+
+
+def test_emergent_stream_raises_instead_of_completing(monkeypatch):
+    backend = EmergentLLMBackend("key", api_base="https://llm-proxy.invalid/v1")
+
+    async def no_complete(*args):
+        raise AssertionError("stream fell back to complete()")
+    monkeypatch.setattr(backend, "complete", no_complete)
+    monkeypatch.setitem(sys.modules, "litellm", None)  # import fails
+
+    async def consume():
+        return [text async for text in backend.stream("predict", "system", "prompt")]
+
+    with pytest.raises(LLMError):
+        asyncio.run(consume())
+
+
+def test_emergent_stream_without_api_base_sends_one_chunk(monkeypatch):
+    backend = EmergentLLMBackend("key")
+    assert not backend.streaming
+
+    async def complete(route, system_message, prompt):
+        return "whole answer"
+    monkeypatch.setattr(backend, "complete", complete)
+    monkeypatch.setitem(sys.modules, "litellm", None)  # never imported
+
+    async def consume():
+        return [text async for text in backend.stream("predict", "system", "prompt")]
+
+    assert asyncio.run(consume()) == ["whole answer"]
+
+
+def test_missing_api_base_is_logged_at_startup(monkeypatch, caplog):
+    monkeypatch.setenv("LLM_BACKEND", "emergent")
+    monkeypatch.setenv("EMERGENT_LLM_KEY", "sk-emergent-test")
+    monkeypatch.delenv("LLM_API_BASE", raising=False)
+    assert not llm_gateway.gateway_from_env().backend.streaming
+    assert "LLM_API_BASE is not set" in caplog.text
+
+    caplog.clear()
+    monkeypatch.setenv("LLM_API_BASE", "https://llm-proxy.invalid/v1")
+    assert llm_gateway.gateway_from_env().backend.streaming
+    assert "LLM_API_BASE" not in caplog.text
+
+
+def test_prediction_stream_emits_error_event(server, api, monkeypatch):
+    hist = pd.DataFrame({"Close": [100.0, 101.0, 102.0]})
+    monkeypatch.setattr(server, "fetch_prediction_history", lambda *args: (hist, 102.0, 0.99))
+    monkeypatch.setattr(server.llm_gateway, "backend", FailingStreamBackend())
+
+    response = api.get("/api/predict/BTC/stream", params={"asset_type": "crypto"})
+    assert response.status_code == 200
+    assert sse_events(response.text) == ["error", "token", "done"]
+
+
+def test_prediction_stream_forwards_tokens(server, api, monkeypatch):
+    hist = pd.DataFrame({"Close": [100.0, 101.0, 102.0]})
+    monkeypatch.setattr(server, "fetch_prediction_history", lambda *args: (hist, 102.0, 0.99))
+
+    events = sse_events(api.get("/api/predict/BTC/stream", params={"asset_type": "crypto"}).text)
+    assert events[-1] == "done"
+    assert "error" not in events
+    assert events.count("token") > 1
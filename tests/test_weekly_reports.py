@@ -0,0 +1,143 @@
+"""Weekly report claim/publish, the unique week_start index and the dedupe migration."""
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from pymongo import DESCENDING
+
+from betty_stats import get_stats, insert_predictions
+from db_indexes import INDEX_SPECS, ensure_indexes
+from migrations import dedupe_weekly_reports
+from tests.conftest import WEEK, betty_prediction, prediction_doc
+
+REPORT_INDEXES = {"betty_reports": INDEX_SPECS["betty_reports"]}
+
+
+def make_predictions(server, count=3):
+    return [betty_prediction(server, f"SYM{i}") for i in range(count)]
+
+
+@pytest.fixture
+def reports_db(server, db):
+    asyncio.run(ensure_indexes(db, REPORT_INDEXES))
+    return db
+
+
+def test_only_one_claim_wins(server, reports_db):
+    async def scenario():
+        return await asyncio.gather(*(server.claim_weekly_report(WEEK) for _ in range(5)))
+
+    claims = asyncio.run(scenario())
+    assert sum(claim is not None for claim in claims) == 1
+
+
+def test_predictions_are_stored_before_the_report_is_published(server, reports_db, monkeypatch):
+    generations = []
+
+    async def generate(week_start):
+        generations.append(week_start)
+        return make_predictions(server)
+
+    async def insert_while_pending(client, db, docs):
+        report = await db.betty_reports.find_one({"week_start": WEEK})
+        assert report["status"] == "pending"
+        await insert_predictions(client, db, docs)
+
+    monkeypatch.setattr(server, "betty_generate_predictions", generate)
+    monkeypatch.setattr(server, "insert_predictions", insert_while_pending)
+
+    async def scenario():
+        return await asyncio.gather(server.ensure_weekly_report(WEEK), server.ensure_weekly_report(WEEK))
+
+    first, second = asyncio.run(scenario())
+    assert len(generations) == 1
+    assert first["status"] == second["status"] == "ready"
+    assert [p["id"] for p in first["predictions"]] == [p["id"] for p in second["predictions"]]
+    assert asyncio.run(reports_db.betty_predictions.count_documents({})) == 3
+    assert asyncio.run(reports_db.betty_reports.count_documents({})) == 1
+
+
+def test_lost_claim_withdraws_its_predictions(server, reports_db, monkeypatch):
+    async def generate(week_start):
+        # Another worker takes the claim over while we are generating
+        await reports_db.betty_reports.update_one({"week_start": WEEK}, {"$set": {"claim_id": "someone-else"}})
+        return make_predictions(server)
+
+    async def no_wait(week_start):
+        return None
+
+    monkeypatch.setattr(server, "betty_generate_predictions", generate)
+    monkeypatch.setattr(server, "wait_for_weekly_report", no_wait)
+
+    assert asyncio.run(server.ensure_weekly_report(WEEK)) is None
+    assert asyncio.run(reports_db.betty_predictions.count_documents({})) == 0
+    assert asyncio.run(get_stats(reports_db))["predictions"] == 0
+
+
+def test_report_locks_are_dropped_on_every_exit(server, reports_db, monkeypatch):
+    async def no_predictions(week_start):
+        return []
+
+    async def failing(week_start):
+        raise RuntimeError("market data unavailable")
+
+    monkeypatch.setattr(server, "betty_generate_predictions", no_predictions)
+    assert asyncio.run(server.ensure_weekly_report(WEEK)) is None
+    assert server._report_locks == {}
+
+    monkeypatch.setattr(server, "betty_generate_predictions", failing)
+    with pytest.raises(RuntimeError):
+        asyncio.run(server.ensure_weekly_report(WEEK))
+    assert server._report_locks == {}
+
+    asyncio.run(reports_db.betty_reports.update_one({"week_start": WEEK}, {"$set": {"status": "ready"}}, upsert=True))
+    assert asyncio.run(server.ensure_weekly_report(WEEK))["status"] == "ready"
+    assert server._report_locks == server._report_lock_users == {}
+
+
+def test_unique_index_replaces_old_index_once_built(db):
+    async def scenario():
+        await db.betty_reports.create_index([("week_start", DESCENDING)], name="week_start")
+        await db.betty_reports.insert_one({"week_start": WEEK})
+        await ensure_indexes(db, REPORT_INDEXES)
+        return await db.betty_reports.index_information()
+
+    indexes = asyncio.run(scenario())
+    assert "week_start_unique" in indexes
+    assert "week_start" not in indexes
+
+
+def test_old_index_kept_when_duplicates_block_the_unique_index(db):
+    async def scenario():
+        await db.betty_reports.create_index([("week_start", DESCENDING)], name="week_start")
+        await db.betty_reports.insert_many([{"week_start": WEEK}, {"week_start": WEEK}])
+        await ensure_indexes(db, REPORT_INDEXES)
+        return await db.betty_reports.index_information()
+
+    indexes = asyncio.run(scenario())
+    assert "week_start" in indexes
+    assert "week_start_unique" not in indexes
+
+
+def test_dedupe_keeps_the_published_report_and_its_predictions(mongo_client, db):
+    def report(ids, status, created_at):
+        return {"week_start": WEEK, "status": status, "created_at": created_at,
+                "predictions": [{"id": i} for i in ids]}
+
+    async def scenario():
+        await db.betty_reports.insert_many([
+            report(["a1", "a2"], "ready", datetime(2026, 10, 5, 1, tzinfo=timezone.utc)),
+            report(["b1", "b2"], "ready", datetime(2026, 10, 5, 2, tzinfo=timezone.utc)),
+        ])
+        await insert_predictions(mongo_client, db, [prediction_doc(i) for i in ("a1", "a2", "b1", "b2")])
+        first = await dedupe_weekly_reports(mongo_client, db)
+        second = await dedupe_weekly_reports(mongo_client, db)
+        ids = sorted(doc["id"] for doc in await db.betty_predictions.find({}).to_list(None))
+        return first, second, ids, await get_stats(db)
+
+    first, second, ids, stats = asyncio.run(scenario())
+    assert first == {"reports": 1, "predictions": 2}
+    assert second == {"reports": 0, "predictions": 0}
+    assert ids == ["a1", "a2"]
+    assert stats["predictions"] == 2
+    assert "week_start_unique" in asyncio.run(ensure_indexes(db, REPORT_INDEXES))["betty_reports"]["created"]